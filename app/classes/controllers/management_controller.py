@@ -2,20 +2,22 @@ import logging
 
 from app.classes.models.management import HelpersManagement
 from app.classes.models.servers import HelperServers
+from app.classes.shared.command_bus import CommandBus
 
 logger = logging.getLogger(__name__)
 
 
 class ManagementController:
-    def __init__(self, management_helper):
+    def __init__(self, management_helper, command_bus):
         self.management_helper = management_helper
+        self.command_bus: CommandBus = command_bus
 
     # **********************************************************************************
     #                                   Host_Stats Methods
     # **********************************************************************************
     @staticmethod
-    def get_latest_hosts_stats():
-        return HelpersManagement.get_latest_hosts_stats()
+    def get_host_stats_history(start, end, raw_max_age):
+        return HelpersManagement.get_host_stats_history(start, end, raw_max_age)
 
     @staticmethod
     def set_crafty_api_key(key):
@@ -42,7 +44,7 @@ class ManagementController:
             server_id,
             remote_ip,
         )
-        HelpersManagement.add_command(server_id, user_id, remote_ip, command)
+        self.command_bus.add_command(server_id, user_id, remote_ip, command)
 
     @staticmethod
     def mark_command_complete(command_id=None):
@@ -52,8 +54,15 @@ class ManagementController:
     #                                   Audit_Log Methods
     # **********************************************************************************
     @staticmethod
-    def get_actity_log():
-        return HelpersManagement.get_actity_log()
+    def get_actity_log(limit=100, before=None, user_id=None, server_id=None, text=None):
+        return HelpersManagement.get_actity_log(limit, before, user_id, server_id, text)
+
+    def prune_audit_log(self):
+        try:
+            return self.management_helper.prune_audit_log()
+        except Exception as e:
+            logger.error(f"Unable to prune the audit log: {e}")
+            return 0
 
     def add_to_audit_log(self, user_id, log_msg, server_id=None, source_ip=None):
         return self.management_helper.add_to_audit_log(
@@ -135,11 +144,20 @@ class ManagementController:
         backup_path: str = None,
         max_backups: int = None,
         excluded_dirs: list = None,
-        compress: bool = False,
-        shutdown: bool = False,
+        compress: bool = None,
+        shutdown: bool = None,
+        incremental: bool = None,
+        live: bool = None,
     ):
         return self.management_helper.set_backup_config(
-            server_id, backup_path, max_backups, excluded_dirs, compress, shutdown
+            server_id,
+            backup_path,
+            max_backups,
+            excluded_dirs,
+            compress,
+            shutdown,
+            incremental,
+            live,
         )
 
     @staticmethod
@@ -9,9 +9,10 @@ logger = logging.getLogger(__name__)
 
 
 class RolesController:
-    def __init__(self, users_helper, roles_helper):
+    def __init__(self, users_helper, roles_helper, authentication):
         self.users_helper = users_helper
         self.roles_helper = roles_helper
+        self.authentication = authentication
 
     @staticmethod
     def get_all_roles():
@@ -160,6 +161,8 @@ class RolesController:
         role_data = RolesController.get_role_with_servers(role_id)
         PermissionsServers.delete_roles_permissions(role_id, role_data["servers"])
         self.users_helper.remove_roles_from_role_id(role_id)
+        # any number of users may have had the role
+        self.authentication.invalidate_all()
         return self.roles_helper.remove_role(role_id)
 
     @staticmethod
@@ -1,9 +1,11 @@
 import os
 import logging
 import time
+import datetime
 import json
 import pathlib
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
 
 from app.classes.controllers.roles_controller import RolesController
 from app.classes.shared.file_helpers import FileHelpers
@@ -15,6 +17,7 @@ from app.classes.shared.helpers import Helpers
 from app.classes.shared.main_models import DatabaseShortcuts
 
 from app.classes.minecraft.stats import Stats
+from app.classes.minecraft.mc_ping import ping_many
 
 from app.classes.models.servers import HelperServers
 from app.classes.models.users import HelperUsers, ApiKeys
@@ -28,6 +31,8 @@ logger = logging.getLogger(__name__)
 
 class ServersController(metaclass=Singleton):
     servers_list: ServerInstance
+    # Realtime stats of all running servers share this many worker threads
+    stats_workers = 8
 
     def __init__(self, helper, servers_helper, management_helper, file_helper):
         self.helper: Helpers = helper
@@ -36,6 +41,10 @@ class ServersController(metaclass=Singleton):
         self.management_helper = management_helper
         self.servers_list = []
         self.stats = Stats(self.helper, self)
+        self.stats_executor = ThreadPoolExecutor(
+            max_workers=self.stats_workers, thread_name_prefix="server_stats"
+        )
+        self.stats_in_flight = {}
 
     # **********************************************************************************
     #                                   Generic Servers Methods
@@ -261,19 +270,9 @@ class ServersController(metaclass=Singleton):
     def get_all_servers_stats(self):
         server_data = []
         try:
-            for server in self.servers_list:
-                srv: ServerInstance = ServersController().get_server_instance_by_id(
-                    server.get("server_id")
-                )
-                latest = srv.stats_helper.get_latest_server_stats()
+            for server in list(self.servers_list):
                 server_data.append(
-                    {
-                        "server_data": DatabaseShortcuts.get_data_obj(
-                            srv.server_object
-                        ),
-                        "stats": latest,
-                        "user_command_permission": True,
-                    }
+                    ServersController._get_server_state(server["server_obj"], True)
                 )
         except IndexError as ex:
             logger.error(
@@ -281,6 +280,17 @@ class ServersController(metaclass=Singleton):
             )
         return server_data
 
+    @staticmethod
+    def _get_server_state(srv: ServerInstance, user_command_permission: bool):
+        # read from the server's instance and stats helper, not the databases
+        server_data = DatabaseShortcuts.get_data_obj(srv.server_object)
+        stats = srv.stats_helper.get_latest_server_stats(server_data)
+        return {
+            "server_data": server_data,
+            "stats": stats,
+            "user_command_permission": user_command_permission,
+        }
+
     @staticmethod
     def get_authorized_servers_stats_api_key(api_key: ApiKeys):
         server_data = []
@@ -309,26 +319,21 @@ class ServersController(metaclass=Singleton):
 
     @staticmethod
     def get_authorized_servers_stats(user_id):
+        permissions = PermissionsServers.get_user_id_servers_permissions(user_id)
         server_data = []
-        authorized_servers = ServersController.get_authorized_servers(user_id)
-
-        for server in authorized_servers:
-            srv: ServerInstance = server
-            latest = srv.stats_helper.get_latest_server_stats()
-            # TODO
-            user_permissions = PermissionsServers.get_user_id_permissions_list(
-                user_id, server.server_id
+        for server in list(ServersController().servers_list):
+            srv: ServerInstance = server["server_obj"]
+            permissions_mask = permissions.masks.get(int(srv.server_id))
+            if permissions_mask is None:
+                continue
+            user_command_permission = (
+                permissions.superuser
+                or PermissionsServers.has_permission(
+                    permissions_mask, EnumPermissionsServer.COMMANDS
+                )
             )
-            if EnumPermissionsServer.COMMANDS in user_permissions:
-                user_command_permission = True
-            else:
-                user_command_permission = False
             server_data.append(
-                {
-                    "server_data": DatabaseShortcuts.get_data_obj(srv.server_object),
-                    "stats": latest,
-                    "user_command_permission": user_command_permission,
-                }
+                ServersController._get_server_state(srv, user_command_permission)
             )
 
         return server_data
@@ -391,6 +396,75 @@ class ServersController(metaclass=Singleton):
 
         return running_servers
 
+    def collect_servers_stats(self):
+        # Pings all running servers concurrently in one event loop, then fans
+        # the rest of the stats probes out over the worker pool. A server whose
+        # previous probe has not finished yet is skipped for this tick instead
+        # of delaying the others.
+        servers_to_probe = []
+        for server in list(self.servers_list):
+            srv_obj: ServerInstance = server["server_obj"]
+            if not srv_obj.check_running():
+                continue
+
+            in_flight = self.stats_in_flight.get(srv_obj.server_id)
+            if in_flight is not None and not in_flight.done():
+                logger.debug(
+                    f"Stats for server {srv_obj.name} are still being collected. "
+                    f"Skipping this tick"
+                )
+                continue
+            servers_to_probe.append(srv_obj)
+
+        try:
+            pings = ping_many([srv.get_ping_target() for srv in servers_to_probe])
+        except Exception as e:
+            # each server falls back to pinging itself
+            logger.error(f"Unable to ping servers in parallel: {e}")
+            pings = [None] * len(servers_to_probe)
+
+        for srv_obj, int_mc_ping in zip(servers_to_probe, pings):
+            self.stats_in_flight[srv_obj.server_id] = self.stats_executor.submit(
+                ServersController._try_realtime_stats, srv_obj, int_mc_ping
+            )
+
+    @staticmethod
+    def _try_realtime_stats(srv_obj: ServerInstance, int_mc_ping=None):
+        try:
+            srv_obj.realtime_stats(int_mc_ping)
+        except Exception as e:
+            logger.error(
+                f"Collecting stats for server {srv_obj.name} failed with error: {e}"
+            )
+
+    def flush_servers_stats(self):
+        for server in list(self.servers_list):
+            server["server_obj"].stats_helper.flush_server_stats()
+
+    def rollup_servers_stats(self):
+        for server in list(self.servers_list):
+            srv_obj: ServerInstance = server["server_obj"]
+            try:
+                # flushes the buffered rows before rolling them up
+                srv_obj.stats_helper.rollup_server_stats()
+            except Exception as e:
+                logger.error(f"Unable to roll up stats of server {srv_obj.name}: {e}")
+
+    def prune_servers_stats(self):
+        max_age = self.helper.get_setting("history_max_age")
+        now = datetime.datetime.now()
+        minimum_to_exist = now - datetime.timedelta(days=max_age)
+
+        for server in list(self.servers_list):
+            srv_obj: ServerInstance = server["server_obj"]
+            try:
+                srv_obj.stats_helper.remove_old_stats(minimum_to_exist)
+                srv_obj.stats_helper.remove_old_rollups()
+            except Exception as e:
+                logger.error(
+                    f"Unable to delete old stats of server {srv_obj.name}: {e}"
+                )
+
     def stop_all_servers(self):
         servers = self.list_running_servers()
         logger.info(f"Found {len(servers)} running server(s)")
@@ -116,9 +116,10 @@ class UsersController:
     def get_user_by_id(user_id):
         return HelperUsers.get_user(user_id)
 
-    @staticmethod
-    def update_server_order(user_id, user_server_order):
+    def update_server_order(self, user_id, user_server_order):
         HelperUsers.update_server_order(user_id, user_server_order)
+        # the panel reads the order from the token's user
+        self.authentication.invalidate_user(user_id)
 
     @staticmethod
     def get_server_order(user_id):
@@ -128,9 +129,10 @@ class UsersController:
     def user_query(user_id):
         return HelperUsers.user_query(user_id)
 
-    @staticmethod
-    def set_support_path(user_id, support_path):
+    def set_support_path(self, user_id, support_path):
         HelperUsers.set_support_path(user_id, support_path)
+        # the support logs download reads the path from the token's user
+        self.authentication.invalidate_user(user_id)
 
     def update_user(self, user_id: str, user_data=None, user_crafty_data=None):
         if user_crafty_data is None:
@@ -193,6 +195,7 @@ class UsersController:
         self.users_helper.delete_user_roles(user_id, removed_roles)
 
         self.users_helper.update_user(user_id, up_data)
+        self.invalidate_user_auth(user_id)
 
     def raw_update_user(self, user_id: int, up_data: t.Optional[t.Dict[str, t.Any]]):
         """Directly passes the data to the model helper.
@@ -202,6 +205,12 @@ class UsersController:
             up_data (t.Optional[t.Dict[str, t.Any]]): Update data.
         """
         self.users_helper.update_user(user_id, up_data)
+        self.invalidate_user_auth(user_id)
+
+    def invalidate_user_auth(self, user_id):
+        # drop the cached token checks before the sockets re-validate
+        self.authentication.invalidate_user(user_id)
+        self.helper.websocket_helper.invalidate_user_auth(user_id)
 
     def add_user(
         self,
@@ -236,19 +245,24 @@ class UsersController:
         )
 
     def remove_user(self, user_id):
-        return self.users_helper.remove_user(user_id)
+        result = self.users_helper.remove_user(user_id)
+        self.invalidate_user_auth(user_id)
+        return result
 
     @staticmethod
     def user_id_exists(user_id):
         return HelperUsers.user_id_exists(user_id)
 
-    @staticmethod
-    def set_prepare(user_id):
-        return HelperUsers.set_prepare(user_id)
+    def set_prepare(self, user_id):
+        result = HelperUsers.set_prepare(user_id)
+        # package_support_logs checks the token's user for a running package
+        self.authentication.invalidate_user(user_id)
+        return result
 
-    @staticmethod
-    def stop_prepare(user_id):
-        return HelperUsers.stop_prepare(user_id)
+    def stop_prepare(self, user_id):
+        result = HelperUsers.stop_prepare(user_id)
+        self.authentication.invalidate_user(user_id)
+        return result
 
     def get_user_id_by_api_token(self, token: str) -> str:
         token_data = self.authentication.check_no_iat(token)
@@ -275,7 +289,9 @@ class UsersController:
         return HelperUsers.get_user_roles_names(user_id)
 
     def add_role_to_user(self, user_id, role_id):
-        return self.users_helper.add_role_to_user(user_id, role_id)
+        result = self.users_helper.add_role_to_user(user_id, role_id)
+        self.invalidate_user_auth(user_id)
+        return result
 
     def add_user_roles(self, user):
         return self.users_helper.add_user_roles(user)
@@ -309,7 +325,11 @@ class UsersController:
         )
 
     def delete_user_api_keys(self, user_id: str):
-        return self.users_helper.delete_user_api_keys(user_id)
+        result = self.users_helper.delete_user_api_keys(user_id)
+        self.authentication.invalidate_user(user_id)
+        return result
 
     def delete_user_api_key(self, key_id: str):
-        return self.users_helper.delete_user_api_key(key_id)
+        result = self.users_helper.delete_user_api_key(key_id)
+        self.authentication.invalidate_api_key(key_id)
+        return result
@@ -1,4 +1,6 @@
 from contextlib import redirect_stderr
+import asyncio
+import logging
 import os
 import socket
 import time
@@ -8,6 +10,8 @@ from app.classes.shared.null_writer import NullWriter
 with redirect_stderr(NullWriter()):
     import psutil
 
+logger = logging.getLogger(__name__)
+
 
 class BedrockPing:
     magic = b"\x00\xff\xff\x00\xfe\xfe\xfe\xfe\xfd\xfd\xfd\xfd\x12\x34\x56\x78"
@@ -88,16 +92,14 @@ class BedrockPing:
         # return time.time_ns() // 1000000
         return time.perf_counter_ns() // 1000000
 
-    def __sendping(self):
+    @staticmethod
+    def build_ping(guid_bytes):
         pack_id = BedrockPing.__byter(0x01, "byte")
         now = BedrockPing.__byter(BedrockPing.__get_time(), "ulong")
-        guid = self.guid_bytes
-        d2s = pack_id + now + BedrockPing.magic + guid
-        # print("S:", d2s)
-        self.sock.sendto(d2s, (self.addr, self.port))
+        return pack_id + now + BedrockPing.magic + guid_bytes
 
-    def __recvpong(self):
-        data = self.sock.recv(4096)
+    @staticmethod
+    def parse_pong(data):
         if data[0] == 0x1C:
             ret = {}
             sliced = BedrockPing.__slice(
@@ -122,6 +124,14 @@ class BedrockPing:
             return ret
         raise ValueError(f"Incorrect packet type ({data[0]} detected")
 
+    def __sendping(self):
+        d2s = BedrockPing.build_ping(self.guid_bytes)
+        # print("S:", d2s)
+        self.sock.sendto(d2s, (self.addr, self.port))
+
+    def __recvpong(self):
+        return BedrockPing.parse_pong(self.sock.recv(4096))
+
     def ping(self, retries=3):
         rtr = retries
         while rtr > 0:
@@ -129,7 +139,40 @@ class BedrockPing:
                 self.__sendping()
                 return self.__recvpong()
             except ValueError as e:
-                print(
+                logger.debug(
                     f"E: {e}, checking next packet. Retries remaining: {rtr}/{retries}"
                 )
             rtr -= 1
+
+    @staticmethod
+    async def async_ping(
+        bedrock_addr, bedrock_port, client_guid=0, timeout=5, retries=3
+    ):
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            _PongProtocol, remote_addr=(bedrock_addr, bedrock_port)
+        )
+        guid_bytes = client_guid.to_bytes(8, BedrockPing.byte_order)
+        try:
+            rtr = retries
+            while rtr > 0:
+                transport.sendto(BedrockPing.build_ping(guid_bytes))
+                data = await asyncio.wait_for(protocol.packets.get(), timeout)
+                try:
+                    return BedrockPing.parse_pong(data)
+                except ValueError as e:
+                    logger.debug(
+                        f"E: {e}, checking next packet. "
+                        f"Retries remaining: {rtr}/{retries}"
+                    )
+                rtr -= 1
+        finally:
+            transport.close()
+
+
+class _PongProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.packets = asyncio.Queue()
+
+    def datagram_received(self, data, addr):
+        self.packets.put_nowait(data)
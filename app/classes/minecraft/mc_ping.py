@@ -1,3 +1,4 @@
+import asyncio
 import struct
 import socket
 import base64
@@ -116,7 +117,7 @@ def get_code_format(format_name):
 
 
 # For the rest of requests see wiki.vg/Protocol
-def ping(ip, port):
+def ping(ip, port, timeout=5):
     def read_var_int():
         i = 0
         j = 0
@@ -133,6 +134,8 @@ def ping(ip, port):
                 return i
 
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # a hung server must not hold up the stats collector forever
+    sock.settimeout(timeout)
     try:
         sock.connect((ip, port))
 
@@ -140,15 +143,7 @@ def ping(ip, port):
         return False
 
     try:
-        host = ip.encode("utf-8")
-        data = b""  # wiki.vg/Server_List_Ping
-        data += b"\x00"  # packet ID
-        data += b"\x04"  # protocol variant
-        data += struct.pack(">b", len(host)) + host
-        data += struct.pack(">H", port)
-        data += b"\x01"  # next state
-        data = struct.pack(">b", len(data)) + data
-        sock.sendall(data + b"\x01\x00")  # handshake + status ping
+        sock.sendall(build_status_request(ip, port))
         length = read_var_int()  # full packet length
         if length < 10:
             return not length < 0
@@ -167,21 +162,118 @@ def ping(ip, port):
             return Server(json.loads(data))
         except KeyError:
             return {}
+    except socket.timeout:
+        logger.debug(f"Ping to {ip}:{port} timed out after {timeout} seconds")
+        return False
     finally:
         sock.close()
 
 
+def build_status_request(ip, port):
+    host = ip.encode("utf-8")
+    data = b""  # wiki.vg/Server_List_Ping
+    data += b"\x00"  # packet ID
+    data += b"\x04"  # protocol variant
+    data += struct.pack(">b", len(host)) + host
+    data += struct.pack(">H", port)
+    data += b"\x01"  # next state
+    data = struct.pack(">b", len(data)) + data
+    return data + b"\x01\x00"  # handshake + status ping
+
+
 # For the rest of requests see wiki.vg/Protocol
-def ping_bedrock(ip, port):
+def ping_bedrock(ip, port, timeout=5):
+    try:
+        brp = BedrockPing(ip, port, get_client_guid(), timeout)
+        return brp.ping()
+    except:
+        logger.debug("Unable to get RakNet stats")
+
+
+def get_client_guid():
     rand = random.Random()
     try:
         # pylint: disable=consider-using-f-string
         rand.seed("".join(re.findall("..", "%012x" % uuid.getnode())))
-        client_guid = uuid.UUID(int=rand.getrandbits(32)).int
+        return uuid.UUID(int=rand.getrandbits(32)).int
     except:
-        client_guid = 0
+        return 0
+
+
+async def async_ping(ip, port, timeout=5):
     try:
-        brp = BedrockPing(ip, port, client_guid)
-        return brp.ping()
+        return await asyncio.wait_for(_async_java_status(ip, port), timeout)
+    except asyncio.TimeoutError:
+        logger.debug(f"Ping to {ip}:{port} timed out after {timeout} seconds")
+    except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+        logger.debug(f"Ping to {ip}:{port} failed: {e}")
+    return False
+
+
+async def _async_java_status(ip, port):
+    async def read_var_int():
+        i = 0
+        j = 0
+        while True:
+            k = await reader.read(1)
+            if not k:
+                return 0
+            k = k[0]
+            i |= (k & 0x7F) << (j * 7)
+            j += 1
+            if j > 5:
+                raise ValueError("var_int too big")
+            if not k & 0x80:
+                return i
+
+    reader, writer = await asyncio.open_connection(ip, port)
+    try:
+        writer.write(build_status_request(ip, port))
+        await writer.drain()
+        length = await read_var_int()  # full packet length
+        if length < 10:
+            return not length < 0
+
+        await reader.readexactly(1)  # packet type, 0 for pings
+        length = await read_var_int()  # string length
+        data = await reader.readexactly(length)
+        logger.debug(f"Server reports this data on ping: {data}")
+        try:
+            return Server(json.loads(data))
+        except KeyError:
+            return {}
+    finally:
+        writer.close()
+
+
+async def async_ping_bedrock(ip, port, timeout=5):
+    try:
+        pong = await BedrockPing.async_ping(ip, port, get_client_guid(), timeout)
     except:
+        pong = None
+    if not pong:
         logger.debug("Unable to get RakNet stats")
+        return False
+    return pong
+
+
+async def async_ping_many(targets, timeout=5):
+    # targets are (ip, port, is_bedrock) tuples, results keep the same order
+    pings = [
+        async_ping_bedrock(ip, port, timeout)
+        if is_bedrock
+        else async_ping(ip, port, timeout)
+        for ip, port, is_bedrock in targets
+    ]
+    return await asyncio.gather(*pings)
+
+
+def ping_many(targets, timeout=5):
+    """Pings every (ip, port, is_bedrock) target concurrently.
+
+    Meant for threads without an event loop, such as the scheduler's.
+    Servers that did not answer get False.
+    """
+    if not targets:
+        return []
+    return asyncio.run(async_ping_many(targets, timeout))
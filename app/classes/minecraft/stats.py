@@ -1,13 +1,16 @@
 from __future__ import annotations
 from contextlib import redirect_stderr
+import os
 import json
 import logging
 import datetime
 import base64
+import threading
+import time
 import typing as t
 
 from app.classes.minecraft.mc_ping import ping
-from app.classes.models.management import HostStats
+from app.classes.models.management import HostStats, HelpersManagement
 from app.classes.models.servers import HelperServers
 from app.classes.shared.null_writer import NullWriter
 from app.classes.shared.helpers import Helpers
@@ -52,9 +55,109 @@ class NodeStatsReturnDict(t.TypedDict):
     node_stats: NodeStatsDict
 
 
+class ProcessStatsSampler:
+    """
+    Samples a server process and its children between stats ticks
+
+    The psutil.Process handles are kept from one tick to the next, so
+    cpu_percent can be read without blocking: psutil reports the usage since
+    the previous call on the same handle. A process seen for the first time
+    reports 0% until the next tick.
+    """
+
+    def __init__(self):
+        self.pid = None
+        self.processes: t.Dict[int, psutil.Process] = {}
+
+    def sample(self, pid: int):
+        if pid != self.pid:
+            # the server was (re)started, old handles belong to dead processes
+            self.pid = pid
+            self.processes = {}
+
+        parent = self.processes.get(pid) or psutil.Process(pid)
+        # wrapper scripts and bedrock run the actual server as a child process
+        tree = [parent] + parent.children(recursive=True)
+
+        cpu_usage = 0.0
+        memory_usage = 0
+        mem_percentage = 0.0
+        sampled = {}
+        for proc in tree:
+            handle = self.processes.get(proc.pid, proc)
+            try:
+                with handle.oneshot():
+                    cpu_usage += handle.cpu_percent(interval=None)
+                    memory_usage += handle.memory_info().rss
+                    mem_percentage += handle.memory_percent()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            sampled[proc.pid] = handle
+        self.processes = sampled
+
+        return {
+            "cpu_usage": round(cpu_usage / psutil.cpu_count(), 2),
+            "memory_usage": Helpers.human_readable_file_size(memory_usage),
+            "mem_percentage": round(mem_percentage, 0),
+        }
+
+
+class WorldSizeCache:
+    """
+    Remembers the size of each server directory between stats ticks
+
+    Reads are served from memory. Once a value is older than
+    refresh_interval seconds the directory is walked again on a background
+    thread while the old value keeps being served. Only the very first read
+    of a directory walks it synchronously.
+    """
+
+    refresh_interval = 300
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sizes: t.Dict[str, t.Tuple[int, float]] = {}
+        self.refreshing: t.Set[str] = set()
+
+    def get(self, path: str) -> int:
+        with self.lock:
+            cached = self.sizes.get(path)
+            if (
+                cached is not None
+                and time.monotonic() - cached[1] > self.refresh_interval
+                and path not in self.refreshing
+            ):
+                self.refreshing.add(path)
+                threading.Thread(
+                    target=self.refresh,
+                    args=(path,),
+                    daemon=True,
+                    name=f"world_size_{os.path.basename(path)}",
+                ).start()
+        if cached is None:
+            return self.refresh(path)
+        return cached[0]
+
+    def refresh(self, path: str) -> int:
+        try:
+            size = Helpers.get_dir_size(path)
+        except OSError as e:
+            logger.warning(f"Unable to calculate size of {path} due to error: {e}")
+            size = 0
+        with self.lock:
+            self.sizes[path] = (size, time.monotonic())
+            self.refreshing.discard(path)
+        return size
+
+    def invalidate(self, path: str):
+        with self.lock:
+            self.sizes.pop(path, None)
+
+
 class Stats:
     helper: Helpers
     controller: Controller
+    world_sizes = WorldSizeCache()
 
     @staticmethod
     def try_get_boot_time():
@@ -82,6 +185,36 @@ class Stats:
     def __init__(self, helper, controller):
         self.helper = helper
         self.controller = controller
+        # the last host sample record_stats took, so reading the current
+        # host stats doesn't need the database
+        self.latest_lock = threading.Lock()
+        self.latest_node_stats: t.Optional[NodeStatsDict] = None
+        self.latest_host_stats: t.Optional[t.Dict[str, t.Any]] = None
+        self.host_stats_listeners: t.List[t.Callable[[t.Dict[str, t.Any]], None]] = []
+
+    def subscribe_host_stats(self, listener: t.Callable[[t.Dict[str, t.Any]], None]):
+        """Calls listener with every host sample record_stats takes from now on."""
+        with self.latest_lock:
+            self.host_stats_listeners.append(listener)
+
+    def get_latest_hosts_stats(self) -> t.Dict[str, t.Any]:
+        """The last host sample, in the shape of a host_stats row."""
+        with self.latest_lock:
+            latest = self.latest_host_stats
+        if latest is None:
+            # nothing was recorded since Crafty started
+            latest = HelpersManagement.get_latest_hosts_stats()
+            with self.latest_lock:
+                if self.latest_host_stats is None:
+                    self.latest_host_stats = latest
+        return dict(latest)
+
+    def get_latest_node_stats(self) -> NodeStatsDict:
+        with self.latest_lock:
+            latest = self.latest_node_stats
+        if latest is None:
+            return self.get_node_stats()["node_stats"]
+        return latest
 
     def get_node_stats(self) -> NodeStatsReturnDict:
         try:
@@ -132,10 +265,10 @@ class Stats:
         }
 
     @staticmethod
-    def _try_get_process_stats(process, running):
+    def _try_get_process_stats(process, running, sampler: ProcessStatsSampler):
         if running:
             try:
-                return Stats._get_process_stats(process)
+                return Stats._get_process_stats(process, sampler)
             except Exception as e:
                 logger.debug(
                     f"getting process stats for pid {process.pid} "
@@ -147,26 +280,10 @@ class Stats:
             return {"cpu_usage": 0, "memory_usage": 0, "mem_percentage": 0}
 
     @staticmethod
-    def _get_process_stats(process):
+    def _get_process_stats(process, sampler: ProcessStatsSampler):
         if process is None:
             return {"cpu_usage": -1, "memory_usage": -1, "mem_percentage": -1}
-        process_pid = process.pid
-        p = psutil.Process(process_pid)
-        _dummy = p.cpu_percent()
-
-        # call it first so we can be more accurate per the docs
-        # https://giamptest.readthedocs.io/en/latest/#psutil.Process.cpu_percent
-
-        real_cpu = round(p.cpu_percent(interval=0.5) / psutil.cpu_count(), 2)
-
-        # this is a faster way of getting data for a process
-        with p.oneshot():
-            process_stats = {
-                "cpu_usage": real_cpu,
-                "memory_usage": Helpers.human_readable_file_size(p.memory_info()[0]),
-                "mem_percentage": round(p.memory_percent(), 0),
-            }
-        return process_stats
+        return sampler.sample(process.pid)
 
     @staticmethod
     def _try_all_disk_usage():
@@ -212,9 +329,7 @@ class Stats:
     @staticmethod
     def get_world_size(server_path):
 
-        total_size = 0
-
-        total_size = Helpers.get_dir_size(server_path)
+        total_size = Stats.world_sizes.get(server_path)
 
         level_total_size = Helpers.human_readable_file_size(total_size)
 
@@ -317,24 +432,53 @@ class Stats:
     def record_stats(self):
         stats_to_send = self.get_node_stats()
         node_stats = stats_to_send["node_stats"]
+        now = datetime.datetime.now()
 
-        HostStats.insert(
+        host_stats = {
+            HostStats.time: now,
+            HostStats.boot_time: node_stats.get("boot_time", "Unknown"),
+            HostStats.cpu_usage: round(node_stats.get("cpu_usage", 0), 2),
+            HostStats.cpu_cores: node_stats.get("cpu_count", 0),
+            HostStats.cpu_cur_freq: node_stats.get("cpu_cur_freq", 0),
+            HostStats.cpu_max_freq: node_stats.get("cpu_max_freq", 0),
+            HostStats.mem_usage: node_stats.get("mem_usage", "0 MB"),
+            HostStats.mem_percent: node_stats.get("mem_percent", 0),
+            HostStats.mem_total: node_stats.get("mem_total", "0 MB"),
+            HostStats.disk_json: node_stats.get("disk_data", "{}"),
+        }
+        host_stats_id = HostStats.insert(host_stats).execute()
+        # the snapshot holds the values the way they'd be read back from the row
+        self._publish_host_stats(
+            node_stats,
             {
-                HostStats.boot_time: node_stats.get("boot_time", "Unknown"),
-                HostStats.cpu_usage: round(node_stats.get("cpu_usage", 0), 2),
-                HostStats.cpu_cores: node_stats.get("cpu_count", 0),
-                HostStats.cpu_cur_freq: node_stats.get("cpu_cur_freq", 0),
-                HostStats.cpu_max_freq: node_stats.get("cpu_max_freq", 0),
-                HostStats.mem_usage: node_stats.get("mem_usage", "0 MB"),
-                HostStats.mem_percent: node_stats.get("mem_percent", 0),
-                HostStats.mem_total: node_stats.get("mem_total", "0 MB"),
-                HostStats.disk_json: node_stats.get("disk_data", "{}"),
-            }
-        ).execute()
+                "id": host_stats_id,
+                **{field.name: field.db_value(v) for field, v in host_stats.items()},
+            },
+        )
 
         # delete old data
         max_age = self.helper.get_setting("history_max_age")
-        now = datetime.datetime.now()
         minimum_to_exist = now - datetime.timedelta(days=max_age)
 
         HostStats.delete().where(HostStats.time < minimum_to_exist).execute()
+
+    def _publish_host_stats(
+        self, node_stats: NodeStatsDict, host_stats: t.Dict[str, t.Any]
+    ):
+        with self.latest_lock:
+            self.latest_node_stats = node_stats
+            self.latest_host_stats = host_stats
+            listeners = list(self.host_stats_listeners)
+        for listener in listeners:
+            try:
+                listener(dict(host_stats))
+            except Exception as e:
+                logger.error(f"Unable to send the host stats to {listener}: {e}")
+
+    @staticmethod
+    def rollup_stats():
+        try:
+            HelpersManagement.rollup_host_stats()
+            HelpersManagement.remove_old_host_stats_rollups()
+        except Exception as e:
+            logger.error(f"Unable to roll up host stats: {e}")
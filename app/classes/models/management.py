@@ -1,5 +1,9 @@
+import gzip
+import json
 import logging
 import datetime
+import os
+import typing as t
 from peewee import (
     ForeignKeyField,
     CharField,
@@ -16,7 +20,7 @@ from app.classes.models.base_model import BaseModel
 from app.classes.models.users import Users, HelperUsers
 from app.classes.models.servers import Servers
 from app.classes.models.server_permissions import PermissionsServers
-from app.classes.shared.main_models import DatabaseShortcuts
+from app.classes.models.stats_rollups import StatsRollups
 
 logger = logging.getLogger(__name__)
 
@@ -25,7 +29,7 @@ logger = logging.getLogger(__name__)
 # **********************************************************************************
 class AuditLog(BaseModel):
     audit_id = AutoField()
-    created = DateTimeField(default=datetime.datetime.now)
+    created = DateTimeField(default=datetime.datetime.now, index=True)
     user_name = CharField(default="")
     user_id = IntegerField(default=0, index=True)
     source_ip = CharField(default="127.0.0.1")
@@ -36,6 +40,11 @@ class AuditLog(BaseModel):
 
     class Meta:
         table_name = "audit_log"
+        # the activity log pages are read newest first, filtered by these
+        indexes = (
+            (("user_id", "created"), False),
+            (("server_id", "created"), False),
+        )
 
 
 # **********************************************************************************
@@ -67,6 +76,31 @@ class HostStats(BaseModel):
         table_name = "host_stats"
 
 
+# **********************************************************************************
+#                              Host_Stats Rollup Classes
+# **********************************************************************************
+class HostStatsRollup(BaseModel):
+    rollup_id = AutoField()
+    period = DateTimeField(unique=True)
+    samples = IntegerField(default=0)
+    cpu_usage_min = FloatField(default=0)
+    cpu_usage_avg = FloatField(default=0)
+    cpu_usage_max = FloatField(default=0)
+    mem_percent_min = FloatField(default=0)
+    mem_percent_avg = FloatField(default=0)
+    mem_percent_max = FloatField(default=0)
+
+
+class HostStatsMinute(HostStatsRollup):
+    class Meta:
+        table_name = "host_stats_minute"
+
+
+class HostStatsHour(HostStatsRollup):
+    class Meta:
+        table_name = "host_stats_hour"
+
+
 # **********************************************************************************
 #                                   Commands Class
 # **********************************************************************************
@@ -129,12 +163,24 @@ class Backups(BaseModel):
     server_id = ForeignKeyField(Servers, backref="backups_server")
     compress = BooleanField(default=False)
     shutdown = BooleanField(default=False)
+    incremental = BooleanField(default=False)
+    live = BooleanField(default=False)
 
     class Meta:
         table_name = "backups"
 
 
 class HelpersManagement:
+    # rollup metric name -> raw HostStats field
+    host_rollup_metrics = {
+        "cpu_usage": HostStats.cpu_usage,
+        "mem_percent": HostStats.mem_percent,
+    }
+    host_minute_stats_max_age = datetime.timedelta(days=14)
+    host_hour_stats_max_age = datetime.timedelta(days=365)
+    # audit log entries past max_audit_entries are moved here, under root_dir
+    audit_archive_file = os.path.join("logs", "audit_archive.jsonl.gz")
+
     def __init__(self, database, helper):
         self.database = database
         self.helper = helper
@@ -148,12 +194,48 @@ class HelpersManagement:
         query = HostStats.select().order_by(HostStats.id.desc()).get()
         return model_to_dict(query)
 
+    @staticmethod
+    def rollup_host_stats():
+        metrics = HelpersManagement.host_rollup_metrics
+        StatsRollups.rollup_raw(HostStats, HostStats.time, HostStatsMinute, metrics)
+        StatsRollups.rollup_minutes(HostStatsMinute, HostStatsHour, metrics)
+
+    @staticmethod
+    def remove_old_host_stats_rollups():
+        StatsRollups.remove_old_rollups(
+            HostStatsMinute, HelpersManagement.host_minute_stats_max_age
+        )
+        StatsRollups.remove_old_rollups(
+            HostStatsHour, HelpersManagement.host_hour_stats_max_age
+        )
+
+    @staticmethod
+    def get_host_stats_history(start, end, raw_max_age):
+        tiers = [
+            (HostStats, HostStats.time, StatsRollups.raw_max_span, raw_max_age),
+            (
+                HostStatsMinute,
+                HostStatsMinute.period,
+                StatsRollups.minute_max_span,
+                HelpersManagement.host_minute_stats_max_age,
+            ),
+            (
+                HostStatsHour,
+                HostStatsHour.period,
+                datetime.timedelta.max,
+                HelpersManagement.host_hour_stats_max_age,
+            ),
+        ]
+        return StatsRollups.get_history(
+            tiers, HelpersManagement.host_rollup_metrics, start, end
+        )
+
     # **********************************************************************************
     #                                   Commands Methods
     # **********************************************************************************
     @staticmethod
     def add_command(server_id, user_id, remote_ip, command):
-        Commands.insert(
+        return Commands.insert(
             {
                 Commands.server_id: server_id,
                 Commands.user: user_id,
@@ -164,7 +246,11 @@ class HelpersManagement:
 
     @staticmethod
     def get_unactioned_commands():
-        query = Commands.select().where(Commands.executed == 0)
+        query = (
+            Commands.select()
+            .where(Commands.executed == 0)
+            .order_by(Commands.command_id)
+        )
         return query
 
     @staticmethod
@@ -179,9 +265,81 @@ class HelpersManagement:
     #                                   Audit_Log Methods
     # **********************************************************************************
     @staticmethod
-    def get_actity_log():
-        query = AuditLog.select()
-        return DatabaseShortcuts.return_db_rows(query)
+    def get_actity_log(
+        limit: int = 100,
+        before: t.Optional[str] = None,
+        user_id: t.Optional[int] = None,
+        server_id: t.Optional[int] = None,
+        text: t.Optional[str] = None,
+    ) -> t.Tuple[t.List[t.Dict[str, t.Any]], t.Optional[str]]:
+        """Returns a page of the audit log, newest first, and the next page's cursor.
+
+        before is the cursor of the page to continue from. Raises ValueError
+        if it isn't one.
+        """
+        query = AuditLog.select().order_by(
+            AuditLog.created.desc(), AuditLog.audit_id.desc()
+        )
+        if before:
+            query = query.where(HelpersManagement._audit_before(before))
+        if user_id is not None:
+            query = query.where(AuditLog.user_id == user_id)
+        if server_id is not None:
+            query = query.where(AuditLog.server_id == server_id)
+        if text:
+            query = query.where(AuditLog.log_msg.contains(text))
+        # one more row than asked for, to know if there is a next page
+        rows = list(query.limit(limit + 1).dicts())
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1]['created'].isoformat()},{rows[-1]['audit_id']}"
+        return rows, next_cursor
+
+    @staticmethod
+    def _audit_before(cursor: str):
+        created, _, audit_id = cursor.partition(",")
+        created = datetime.datetime.fromisoformat(created)
+        audit_id = int(audit_id)
+        return (AuditLog.created < created) | (
+            (AuditLog.created == created) & (AuditLog.audit_id < audit_id)
+        )
+
+    def prune_audit_log(self) -> int:
+        """Moves the entries past max_audit_entries to the audit log archive.
+
+        Returns how many were moved.
+        """
+        max_entries = self.helper.get_setting("max_audit_entries") or 300
+        oldest_kept = (
+            AuditLog.select(AuditLog.created, AuditLog.audit_id)
+            .order_by(AuditLog.created.desc(), AuditLog.audit_id.desc())
+            .offset(max_entries - 1)
+            .limit(1)
+            .first()
+        )
+        if oldest_kept is None:
+            return 0
+        old_entries = HelpersManagement._audit_before(
+            f"{oldest_kept.created.isoformat()},{oldest_kept.audit_id}"
+        )
+        if not AuditLog.select().where(old_entries).exists():
+            return 0
+
+        archive_path = os.path.join(
+            self.helper.root_dir, HelpersManagement.audit_archive_file
+        )
+        os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+        moved = 0
+        # appending makes another gzip member, which reads back as one file
+        with gzip.open(archive_path, "at", encoding="utf-8") as f:
+            query = AuditLog.select().where(old_entries).order_by(AuditLog.audit_id)
+            for row in query.dicts().iterator():
+                f.write(json.dumps(row, default=str) + "\n")
+                moved += 1
+        AuditLog.delete().where(old_entries).execute()
+        logger.info(f"Moved {moved} audit log entries to {archive_path}")
+        return moved
 
     def add_to_audit_log(self, user_id, log_msg, server_id=None, source_ip=None):
         logger.debug(f"Adding to audit log User:{user_id} - Message: {log_msg} ")
@@ -207,17 +365,6 @@ class HelpersManagement:
                 AuditLog.source_ip: source_ip,
             }
         ).execute()
-        # deletes records when there's more than 300
-        ordered = AuditLog.select().order_by(+AuditLog.created)
-        for item in ordered:
-            if not self.helper.get_setting("max_audit_entries"):
-                max_entries = 300
-            else:
-                max_entries = self.helper.get_setting("max_audit_entries")
-            if AuditLog.select().count() > max_entries:
-                AuditLog.delete().where(AuditLog.audit_id == item.audit_id).execute()
-            else:
-                return
 
     def add_to_audit_log_raw(self, user_name, user_id, server_id, log_msg, source_ip):
         AuditLog.insert(
@@ -229,18 +376,6 @@ class HelpersManagement:
                 AuditLog.source_ip: source_ip,
             }
         ).execute()
-        # deletes records when there's more than 300
-        ordered = AuditLog.select().order_by(+AuditLog.created)
-        for item in ordered:
-            # configurable through app/config/config.json
-            if not self.helper.get_setting("max_audit_entries"):
-                max_entries = 300
-            else:
-                max_entries = self.helper.get_setting("max_audit_entries")
-            if AuditLog.select().count() > max_entries:
-                AuditLog.delete().where(AuditLog.audit_id == item.audit_id).execute()
-            else:
-                return
 
     @staticmethod
     def set_secret_api_key(key):
@@ -353,6 +488,8 @@ class HelpersManagement:
                 "server_id": row.server_id_id,
                 "compress": row.compress,
                 "shutdown": row.shutdown,
+                "incremental": row.incremental,
+                "live": row.live,
             }
         except IndexError:
             conf = {
@@ -362,6 +499,8 @@ class HelpersManagement:
                 "server_id": server_id,
                 "compress": False,
                 "shutdown": False,
+                "incremental": False,
+                "live": False,
             }
         return conf
 
@@ -371,8 +510,10 @@ class HelpersManagement:
         backup_path: str = None,
         max_backups: int = None,
         excluded_dirs: list = None,
-        compress: bool = False,
-        shutdown: bool = False,
+        compress: bool = None,
+        shutdown: bool = None,
+        incremental: bool = None,
+        live: bool = None,
     ):
         logger.debug(f"Updating server {server_id} backup config with {locals()}")
         if Backups.select().where(Backups.server_id == server_id).exists():
@@ -385,6 +526,8 @@ class HelpersManagement:
                 "server_id": server_id,
                 "compress": False,
                 "shutdown": False,
+                "incremental": False,
+                "live": False,
             }
             new_row = True
         if max_backups is not None:
@@ -392,8 +535,15 @@ class HelpersManagement:
         if excluded_dirs is not None:
             dirs_to_exclude = ",".join(excluded_dirs)
             conf["excluded_dirs"] = dirs_to_exclude
-        conf["compress"] = compress
-        conf["shutdown"] = shutdown
+        # settings that weren't passed keep their value
+        if compress is not None:
+            conf["compress"] = compress
+        if shutdown is not None:
+            conf["shutdown"] = shutdown
+        if incremental is not None:
+            conf["incremental"] = incremental
+        if live is not None:
+            conf["live"] = live
         if not new_row:
             with self.database.atomic():
                 if backup_path is not None:
@@ -434,8 +584,7 @@ class HelpersManagement:
         dir_list = self.get_excluded_backup_dirs(server_id)
         if dir_to_add not in dir_list:
             dir_list.append(dir_to_add)
-            excluded_dirs = ",".join(dir_list)
-            self.set_backup_config(server_id=server_id, excluded_dirs=excluded_dirs)
+            self.set_backup_config(server_id=server_id, excluded_dirs=dir_list)
         else:
             logger.debug(
                 f"Not adding {dir_to_add} to excluded directories - "
@@ -446,8 +595,7 @@ class HelpersManagement:
         dir_list = self.get_excluded_backup_dirs(server_id)
         if dir_to_del in dir_list:
             dir_list.remove(dir_to_del)
-            excluded_dirs = ",".join(dir_list)
-            self.set_backup_config(server_id=server_id, excluded_dirs=excluded_dirs)
+            self.set_backup_config(server_id=server_id, excluded_dirs=dir_list)
         else:
             logger.debug(
                 f"Not removing {dir_to_del} from excluded directories - "
@@ -11,6 +11,7 @@ from playhouse.shortcuts import model_to_dict
 
 from app.classes.models.base_model import BaseModel
 from app.classes.shared.helpers import Helpers
+from app.classes.shared.permission_helper import PermissionHelper
 
 logger = logging.getLogger(__name__)
 
@@ -85,7 +86,9 @@ class HelperRoles:
         return Roles.update(up_data).where(Roles.role_id == role_id).execute()
 
     def remove_role(self, role_id):
-        return Roles.delete().where(Roles.role_id == role_id).execute()
+        deleted = Roles.delete().where(Roles.role_id == role_id).execute()
+        PermissionHelper.permissions_changed()
+        return deleted
 
     @staticmethod
     def role_id_exists(role_id) -> bool:
@@ -1,4 +1,5 @@
 import logging
+import threading
 import typing as t
 from enum import Enum
 from peewee import (
@@ -43,12 +44,26 @@ class EnumPermissionsServer(Enum):
     PLAYERS = 7
 
 
+class UserServersPermissions(t.NamedTuple):
+    superuser: bool
+    # server id -> permissions mask, for the servers the user's roles have
+    masks: t.Dict[int, str]
+
+
 class PermissionsServers:
+    # user id -> (PermissionHelper.permissions_version it was read at, the
+    # user's permissions), so permission checks and the dashboard don't query
+    # the roles of the user for every server
+    user_permissions: t.Dict[int, t.Tuple[int, UserServersPermissions]] = {}
+    user_permissions_lock = threading.Lock()
+
     @staticmethod
     def get_or_create(role_id, server, permissions_mask):
-        return RoleServers.get_or_create(
+        role_server = RoleServers.get_or_create(
             role_id=role_id, server_id=server, permissions=permissions_mask
         )
+        PermissionHelper.permissions_changed()
+        return role_server
 
     @staticmethod
     def get_permissions_list():
@@ -133,6 +148,7 @@ class PermissionsServers:
                 RoleServers.permissions: rs_permissions,
             }
         ).execute()
+        PermissionHelper.permissions_changed()
         return servers
 
     @staticmethod
@@ -181,26 +197,68 @@ class PermissionsServers:
         RoleServers.update(permissions=permissions_mask).where(
             RoleServers.role_id == role_id, RoleServers.server_id == server_id
         ).execute()
+        PermissionHelper.permissions_changed()
 
     @staticmethod
     def delete_roles_permissions(
         role_id: t.Union[str, int], removed_servers: t.Sequence[t.Union[str, int]]
     ):
-        return (
+        deleted = (
             RoleServers.delete()
             .where(RoleServers.role_id == role_id)
             .where(RoleServers.server_id.in_(removed_servers))
             .execute()
         )
+        PermissionHelper.permissions_changed()
+        return deleted
 
     @staticmethod
     def remove_roles_of_server(server_id):
-        return RoleServers.delete().where(RoleServers.server_id == server_id).execute()
+        deleted = (
+            RoleServers.delete().where(RoleServers.server_id == server_id).execute()
+        )
+        PermissionHelper.permissions_changed()
+        return deleted
+
+    @staticmethod
+    def get_user_id_servers_permissions(user_id) -> UserServersPermissions:
+        """The user's permissions on every server, read again only after the
+        users, roles or role servers tables changed."""
+        user_id = int(user_id)
+        # read first, a change made while the user's roles are read below
+        # makes the next call read them again
+        version = PermissionHelper.permissions_version
+        with PermissionsServers.user_permissions_lock:
+            cached = PermissionsServers.user_permissions.get(user_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        user = Users.get(Users.user_id == user_id)
+        masks: t.Dict[int, str] = {}
+        role_servers = (
+            RoleServers.select(RoleServers.server_id, RoleServers.permissions)
+            .join(UserRoles, on=(UserRoles.role_id == RoleServers.role_id))
+            .where(UserRoles.user_id == user_id)
+        )
+        for role_server in role_servers:
+            # like get_user_permissions_mask, the first role found wins
+            masks.setdefault(role_server.server_id_id, role_server.permissions)
+        permissions = UserServersPermissions(bool(user.superuser), masks)
+        with PermissionsServers.user_permissions_lock:
+            PermissionsServers.user_permissions[user_id] = (version, permissions)
+        return permissions
 
     @staticmethod
     def get_user_id_permissions_mask(user_id, server_id: str):
-        user = HelperUsers.get_user_model(user_id)
-        return PermissionsServers.get_user_permissions_mask(user, server_id)
+        permissions = PermissionsServers.get_user_id_servers_permissions(user_id)
+        if permissions.superuser:
+            return "1" * len(EnumPermissionsServer)
+        try:
+            server_id = int(server_id)
+        except (TypeError, ValueError):
+            # no server has it, so none of the user's roles have it either
+            return "0" * len(EnumPermissionsServer)
+        return permissions.masks.get(server_id, "0" * len(EnumPermissionsServer))
 
     @staticmethod
     def get_user_permissions_mask(user: Users, server_id: str):
@@ -241,8 +299,9 @@ class PermissionsServers:
 
     @staticmethod
     def get_user_id_permissions_list(user_id, server_id: str):
-        user = HelperUsers.get_user_model(user_id)
-        return PermissionsServers.get_user_permissions_list(user, server_id)
+        return PermissionsServers.get_permissions(
+            PermissionsServers.get_user_id_permissions_mask(user_id, server_id)
+        )
 
     @staticmethod
     def get_user_permissions_list(user: Users, server_id: str):
@@ -1,8 +1,11 @@
 import os
 import logging
 import datetime
+import threading
+import typing as t
 
 from app.classes.models.servers import Servers, HelperServers
+from app.classes.models.stats_rollups import StatsRollups
 from app.classes.shared.helpers import Helpers
 from app.classes.shared.main_models import DatabaseShortcuts
 from app.classes.shared.migration import MigrationManager
@@ -19,7 +22,9 @@ try:
         IntegerField,
         FloatField,
         DoesNotExist,
+        chunked,
     )
+    from playhouse.shortcuts import model_to_dict
 
 except ModuleNotFoundError as e:
     Helpers.auto_installer_fix(e)
@@ -59,15 +64,72 @@ class ServerStats(Model):
         table_name = "server_stats"
 
 
+# **********************************************************************************
+#                              Servers Stats Rollup Classes
+# **********************************************************************************
+class ServerStatsRollup(Model):
+    rollup_id = AutoField()
+    period = DateTimeField(unique=True)
+    samples = IntegerField(default=0)
+    cpu_min = FloatField(default=0)
+    cpu_avg = FloatField(default=0)
+    cpu_max = FloatField(default=0)
+    mem_percent_min = FloatField(default=0)
+    mem_percent_avg = FloatField(default=0)
+    mem_percent_max = FloatField(default=0)
+    online_min = FloatField(default=0)
+    online_avg = FloatField(default=0)
+    online_max = FloatField(default=0)
+
+
+class ServerStatsMinute(ServerStatsRollup):
+    class Meta:
+        table_name = "server_stats_minute"
+
+
+class ServerStatsHour(ServerStatsRollup):
+    class Meta:
+        table_name = "server_stats_hour"
+
+
 # **********************************************************************************
 #                                    Servers_Stats Methods
 # **********************************************************************************
 class HelperServerStats:
     server_id: int
     database = None
+    # Rows per INSERT statement, keeps us below SQLite's bound variable limit
+    insert_batch_size = 50
+    # Rows removed per DELETE when pruning old history
+    prune_batch_size = 1000
+    # rollup metric name -> raw ServerStats field
+    rollup_metrics = {
+        "cpu": ServerStats.cpu,
+        "mem_percent": ServerStats.mem_percent,
+        "online": ServerStats.online,
+    }
+    minute_stats_max_age = datetime.timedelta(days=14)
+    hour_stats_max_age = datetime.timedelta(days=365)
+    # set on all of the server's rows instead of being sampled
+    state_flags = (
+        ServerStats.updating,
+        ServerStats.waiting_start,
+        ServerStats.first_run,
+        ServerStats.crashed,
+        ServerStats.downloading,
+    )
 
     def __init__(self, server_id):
         self.server_id = int(server_id)
+        # stats rows waiting for the next flush_server_stats
+        self.pending_stats = []
+        self.pending_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        # the newest stats row and the state flags, kept up to date here so
+        # reading the server's current state doesn't query its stats database
+        self.state_lock = threading.Lock()
+        self.latest_stats: t.Optional[t.Dict[str, t.Any]] = None
+        self.flags: t.Optional[t.Dict[str, bool]] = None
         self.init_database(self.server_id)
 
     def init_database(self, server_id):
@@ -138,52 +200,188 @@ class HelperServerStats:
         return server_data
 
     def insert_server_stats(self, server_stats):
+        # Buffered until the next flush_server_stats, so every sample does not
+        # cost its own write transaction
         server_id = server_stats.get("id", 0)
 
         if server_id == 0:
             logger.warning("Stats saving failed with error: Server unknown (id = 0)")
             return
 
-        ServerStats.insert(
-            {
-                ServerStats.server_id: server_stats.get("id", 0),
-                ServerStats.started: server_stats.get("started", ""),
-                ServerStats.running: server_stats.get("running", False),
-                ServerStats.cpu: server_stats.get("cpu", 0),
-                ServerStats.mem: server_stats.get("mem", 0),
-                ServerStats.mem_percent: server_stats.get("mem_percent", 0),
-                ServerStats.world_name: server_stats.get("world_name", ""),
-                ServerStats.world_size: server_stats.get("world_size", ""),
-                ServerStats.server_port: server_stats.get("server_port", 0),
-                ServerStats.int_ping_results: server_stats.get(
-                    "int_ping_results", False
-                ),
-                ServerStats.online: server_stats.get("online", False),
-                ServerStats.max: server_stats.get("max", False),
-                ServerStats.players: server_stats.get("players", False),
-                ServerStats.desc: server_stats.get("desc", False),
-                ServerStats.version: server_stats.get("version", False),
+        row = {
+            ServerStats.server_id: server_stats.get("id", 0),
+            ServerStats.started: server_stats.get("started", ""),
+            ServerStats.running: server_stats.get("running", False),
+            ServerStats.cpu: server_stats.get("cpu", 0),
+            ServerStats.mem: server_stats.get("mem", 0),
+            ServerStats.mem_percent: server_stats.get("mem_percent", 0),
+            ServerStats.world_name: server_stats.get("world_name", ""),
+            ServerStats.world_size: server_stats.get("world_size", ""),
+            ServerStats.server_port: server_stats.get("server_port", 0),
+            ServerStats.int_ping_results: server_stats.get("int_ping_results", False),
+            ServerStats.online: server_stats.get("online", False),
+            ServerStats.max: server_stats.get("max", False),
+            ServerStats.players: server_stats.get("players", False),
+            ServerStats.desc: server_stats.get("desc", False),
+            ServerStats.version: server_stats.get("version", False),
+        }
+        with self.state_lock:
+            # new rows carry the flags the rows before them were set to
+            row.update(
+                {
+                    getattr(ServerStats, name): value
+                    for name, value in self._get_flags().items()
+                }
+            )
+            with self.pending_lock:
+                # stamped under the lock, so a row that isn't buffered yet is
+                # newer than any minute rollup_server_stats has rolled up
+                row[ServerStats.created] = datetime.datetime.now()
+                self.pending_stats.append(row)
+            # the values the way they'd be read back from the row
+            self.latest_stats = {
+                "stats_id": None,
+                **{field.name: field.db_value(value) for field, value in row.items()},
             }
-        ).execute(self.database)
+
+    def flush_server_stats(self):
+        # Writes all buffered stats rows in one transaction
+        with self.flush_lock:
+            with self.pending_lock:
+                rows, self.pending_stats = self.pending_stats, []
+            self._write_stats(rows)
+
+    def _write_stats(self, rows):
+        if not rows:
+            return
+
+        try:
+            with self.database.atomic():
+                for batch in chunked(rows, self.insert_batch_size):
+                    ServerStats.insert_many(batch).execute(self.database)
+        except Exception as ex:
+            logger.error(
+                f"Unable to save {len(rows)} stats rows "
+                f"for server {self.server_id}: {ex}"
+            )
 
     def remove_old_stats(self, last_week):
-        # self.select_database(self.server_id)
-        ServerStats.delete().where(ServerStats.created < last_week).execute(
-            self.database
+        # Deletes in bounded batches so pruning a long history does not hold
+        # the write lock (and grow the WAL) in one huge transaction
+        while True:
+            old_stats = (
+                ServerStats.select(ServerStats.stats_id)
+                .where(ServerStats.created < last_week)
+                .limit(self.prune_batch_size)
+            )
+            deleted = (
+                ServerStats.delete()
+                .where(ServerStats.stats_id.in_(old_stats))
+                .execute(self.database)
+            )
+            if deleted < self.prune_batch_size:
+                return
+
+    def rollup_server_stats(self):
+        # Flushes the buffer first, and no flush can run until the rollup is
+        # done, so every row of the minutes rolled up is in the database.
+        # Rows buffered after the flush are stamped after until.
+        with self.flush_lock:
+            with self.pending_lock:
+                rows, self.pending_stats = self.pending_stats, []
+                until = datetime.datetime.now()
+            self._write_stats(rows)
+            StatsRollups.rollup_raw(
+                ServerStats,
+                ServerStats.created,
+                ServerStatsMinute,
+                self.rollup_metrics,
+                self.database,
+                until,
+            )
+        StatsRollups.rollup_minutes(
+            ServerStatsMinute, ServerStatsHour, self.rollup_metrics, self.database
         )
 
-    def get_latest_server_stats(self):
-        latest = (
-            ServerStats.select()
-            .where(ServerStats.server_id == self.server_id)
-            .order_by(ServerStats.created.desc())
-            .limit(1)
-            .get(self.database)
+    def remove_old_rollups(self):
+        StatsRollups.remove_old_rollups(
+            ServerStatsMinute, self.minute_stats_max_age, self.database
         )
-        try:
-            return DatabaseShortcuts.get_data_obj(latest)
-        except IndexError:
-            return {}
+        StatsRollups.remove_old_rollups(
+            ServerStatsHour, self.hour_stats_max_age, self.database
+        )
+
+    def get_server_stats_history(self, start, end, raw_max_age):
+        # cpu, mem_percent and online min/avg/max at a resolution that suits
+        # the length of the requested range
+        tiers = [
+            (ServerStats, ServerStats.created, StatsRollups.raw_max_span, raw_max_age),
+            (
+                ServerStatsMinute,
+                ServerStatsMinute.period,
+                StatsRollups.minute_max_span,
+                self.minute_stats_max_age,
+            ),
+            (
+                ServerStatsHour,
+                ServerStatsHour.period,
+                datetime.timedelta.max,
+                self.hour_stats_max_age,
+            ),
+        ]
+        return StatsRollups.get_history(
+            tiers, self.rollup_metrics, start, end, self.database
+        )
+
+    def get_latest_server_stats(self, server_data=None):
+        """The newest stats row of the server, with its current flags.
+
+        server_id holds the server's row, pass it as server_data when it's at
+        hand to save reading it."""
+        with self.state_lock:
+            latest = self.latest_stats
+        if latest is None:
+            # nothing was recorded since Crafty started
+            row = (
+                ServerStats.select()
+                .where(ServerStats.server_id == self.server_id)
+                .order_by(ServerStats.created.desc())
+                .limit(1)
+                .get(self.database)
+            )
+            latest = model_to_dict(row, recurse=False)
+            with self.state_lock:
+                if self.latest_stats is None:
+                    self.latest_stats = latest
+        if server_data is None:
+            server_data = HelperServers.get_server_data_by_id(self.server_id)
+        with self.state_lock:
+            flags = dict(self._get_flags())
+        return {**latest, **flags, "server_id": server_data}
+
+    def _get_flags(self) -> t.Dict[str, bool]:
+        # the caller holds state_lock
+        if self.flags is None:
+            # rows are all set at once, so any one of them has the flags
+            row = (
+                ServerStats.select(*self.state_flags)
+                .where(ServerStats.server_id == self.server_id)
+                .first(self.database)
+            )
+            self.flags = {
+                field.name: field.default if row is None else getattr(row, field.name)
+                for field in self.state_flags
+            }
+        return self.flags
+
+    def _set_flag(self, name: str, value: bool):
+        # set before the rows, so rows buffered from now on carry it too
+        with self.state_lock:
+            self._get_flags()[name] = value
+
+    def _read_flag(self, name: str) -> bool:
+        with self.state_lock:
+            return self._get_flags()[name]
 
     def get_server_stats(self):
         stats = (
@@ -202,54 +400,52 @@ class HelperServerStats:
         return True
 
     def sever_crashed(self):
+        self._set_flag("crashed", True)
+        self.flush_server_stats()
         # self.select_database(self.server_id)
         ServerStats.update(crashed=True).where(
             ServerStats.server_id == self.server_id
         ).execute(self.database)
 
     def set_download(self):
+        self._set_flag("downloading", True)
+        self.flush_server_stats()
         # self.select_database(self.server_id)
         ServerStats.update(downloading=True).where(
             ServerStats.server_id == self.server_id
         ).execute(self.database)
 
     def finish_download(self):
+        self._set_flag("downloading", False)
+        self.flush_server_stats()
         # self.select_database(self.server_id)
         ServerStats.update(downloading=False).where(
             ServerStats.server_id == self.server_id
         ).execute(self.database)
 
     def get_download_status(self):
-        # self.select_database(self.server_id)
-        download_status = (
-            ServerStats.select()
-            .where(ServerStats.server_id == self.server_id)
-            .get(self.database)
-        )
-        return download_status.downloading
+        return self._read_flag("downloading")
 
     def server_crash_reset(self):
         if self.server_id is None:
             return
 
+        self._set_flag("crashed", False)
+        self.flush_server_stats()
         # self.select_database(self.server_id)
         ServerStats.update(crashed=False).where(
             ServerStats.server_id == self.server_id
         ).execute(self.database)
 
     def is_crashed(self):
-        # self.select_database(self.server_id)
-        svr: ServerStats = (
-            ServerStats.select()
-            .where(ServerStats.server_id == self.server_id)
-            .get(self.database)
-        )
-        return svr.crashed
+        return self._read_flag("crashed")
 
     def set_update(self, value):
         if self.server_id is None:
             return
 
+        self._set_flag("updating", value)
+        self.flush_server_stats()
         # self.select_database(self.server_id)
         try:
             # Checks if server even exists
@@ -264,15 +460,11 @@ class HelperServerStats:
         ).execute(self.database)
 
     def get_update_status(self):
-        # self.select_database(self.server_id)
-        update_status = (
-            ServerStats.select()
-            .where(ServerStats.server_id == self.server_id)
-            .get(self.database)
-        )
-        return update_status.updating
+        return self._read_flag("updating")
 
     def set_first_run(self):
+        self._set_flag("first_run", False)
+        self.flush_server_stats()
         # self.select_database(self.server_id)
         # Sets first run to false
         try:
@@ -288,13 +480,7 @@ class HelperServerStats:
         ).execute(self.database)
 
     def get_first_run(self):
-        # self.select_database(self.server_id)
-        first_run = (
-            ServerStats.select()
-            .where(ServerStats.server_id == self.server_id)
-            .get(self.database)
-        )
-        return first_run.first_run
+        return self._read_flag("first_run")
 
     def get_ttl_without_player(self):
         # self.select_database(self.server_id)
@@ -318,6 +504,8 @@ class HelperServerStats:
         return (time_limit == -1) or (ttl_no_players > time_limit)
 
     def set_waiting_start(self, value):
+        self._set_flag("waiting_start", value)
+        self.flush_server_stats()
         # self.select_database(self.server_id)
         try:
             # Checks if server even exists
@@ -332,9 +520,4 @@ class HelperServerStats:
         ).execute(self.database)
 
     def get_waiting_start(self):
-        waiting_start = (
-            ServerStats.select()
-            .where(ServerStats.server_id == self.server_id)
-            .get(self.database)
-        )
-        return waiting_start.waiting_start
+        return self._read_flag("waiting_start")
@@ -0,0 +1,144 @@
+import datetime
+import logging
+
+from peewee import fn, Value
+
+logger = logging.getLogger(__name__)
+
+MINUTE = datetime.timedelta(minutes=1)
+HOUR = datetime.timedelta(hours=1)
+# strftime formats that truncate a timestamp to the start of its bucket
+MINUTE_BUCKET = "%Y-%m-%d %H:%M:00"
+HOUR_BUCKET = "%Y-%m-%d %H:00:00"
+
+
+class StatsRollups:
+    """Downsamples raw stats rows into per-minute and per-hour min/avg/max rows.
+
+    Rollup tables have a ``period`` (bucket start), a ``samples`` count and a
+    ``<metric>_min``, ``<metric>_avg`` and ``<metric>_max`` column per metric.
+    """
+
+    # Longest time range still answered from raw samples / minute rollups
+    raw_max_span = datetime.timedelta(hours=2)
+    minute_max_span = datetime.timedelta(days=2)
+
+    @staticmethod
+    def floor_time(when: datetime.datetime, step: datetime.timedelta):
+        if step == HOUR:
+            return when.replace(minute=0, second=0, microsecond=0)
+        return when.replace(second=0, microsecond=0)
+
+    @staticmethod
+    def rollup_raw(
+        raw_model, time_field, minute_model, metrics, database=None, until=None
+    ):
+        # metrics maps the rollup metric name to the raw model field. Only the
+        # minutes before until (default now) are rolled up, the caller must
+        # have saved every raw row older than it.
+        if until is None:
+            until = datetime.datetime.now()
+        until = StatsRollups.floor_time(until, MINUTE)
+        last = minute_model.select(fn.MAX(minute_model.period)).scalar(database)
+
+        bucket = fn.strftime(MINUTE_BUCKET, time_field)
+        columns = [bucket, fn.COUNT(time_field)]
+        for field in metrics.values():
+            columns += [fn.MIN(field), fn.AVG(field), fn.MAX(field)]
+
+        query = raw_model.select(*columns).where(time_field < until)
+        if last is not None:
+            query = query.where(time_field >= StatsRollups._as_time(last) + MINUTE)
+        query = query.group_by(bucket)
+
+        minute_model.insert_from(
+            query, StatsRollups._rollup_fields(minute_model, metrics)
+        ).execute(database)
+
+    @staticmethod
+    def rollup_minutes(minute_model, hour_model, metrics, database=None):
+        until = StatsRollups.floor_time(datetime.datetime.now(), HOUR)
+        last = hour_model.select(fn.MAX(hour_model.period)).scalar(database)
+
+        bucket = fn.strftime(HOUR_BUCKET, minute_model.period)
+        columns = [bucket, fn.SUM(minute_model.samples)]
+        for metric in metrics:
+            avg_field = getattr(minute_model, f"{metric}_avg")
+            columns += [
+                fn.MIN(getattr(minute_model, f"{metric}_min")),
+                # weighted, minutes with fewer samples count for less
+                fn.SUM(avg_field * minute_model.samples) / fn.SUM(minute_model.samples),
+                fn.MAX(getattr(minute_model, f"{metric}_max")),
+            ]
+
+        query = minute_model.select(*columns).where(minute_model.period < until)
+        if last is not None:
+            query = query.where(
+                minute_model.period >= StatsRollups._as_time(last) + HOUR
+            )
+        query = query.group_by(bucket)
+
+        hour_model.insert_from(
+            query, StatsRollups._rollup_fields(hour_model, metrics)
+        ).execute(database)
+
+    @staticmethod
+    def get_history(tiers, metrics, start, end, database=None):
+        """Returns the rows between start and end from the finest usable tier.
+
+        tiers is a list of (model, time_field, max_span, max_age) ordered from
+        the finest to the coarsest resolution. A tier is usable when the range
+        fits in max_span and it still keeps rows as old as start. Raw models
+        (those without a samples column) report each sample as its own
+        min/avg/max.
+        """
+        now = datetime.datetime.now()
+        span = end - start
+        for model, time_field, max_span, max_age in tiers:
+            if span <= max_span and start >= now - max_age:
+                break
+
+        if hasattr(model, "samples"):
+            columns = [time_field.alias("time"), model.samples]
+            for metric in metrics:
+                for agg in ("min", "avg", "max"):
+                    columns.append(getattr(model, f"{metric}_{agg}"))
+        else:
+            columns = [time_field.alias("time"), Value(1).alias("samples")]
+            for metric, field in metrics.items():
+                for agg in ("min", "avg", "max"):
+                    columns.append(field.alias(f"{metric}_{agg}"))
+
+        rows = (
+            model.select(*columns)
+            .where((time_field >= start) & (time_field <= end))
+            .order_by(time_field)
+            .dicts()
+            .execute(database)
+        )
+        return [
+            dict(row, time=StatsRollups._as_time(row["time"]).isoformat())
+            for row in rows
+        ]
+
+    @staticmethod
+    def remove_old_rollups(model, max_age, database=None):
+        minimum_to_exist = datetime.datetime.now() - max_age
+        model.delete().where(model.period < minimum_to_exist).execute(database)
+
+    @staticmethod
+    def _rollup_fields(model, metrics):
+        fields = [model.period, model.samples]
+        for metric in metrics:
+            fields += [
+                getattr(model, f"{metric}_min"),
+                getattr(model, f"{metric}_avg"),
+                getattr(model, f"{metric}_max"),
+            ]
+        return fields
+
+    @staticmethod
+    def _as_time(value):
+        if isinstance(value, datetime.datetime):
+            return value
+        return datetime.datetime.fromisoformat(str(value))
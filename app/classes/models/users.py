@@ -15,6 +15,7 @@ from peewee import (
 from playhouse.shortcuts import model_to_dict
 
 from app.classes.shared.helpers import Helpers
+from app.classes.shared.permission_helper import PermissionHelper
 from app.classes.models.base_model import BaseModel
 from app.classes.models.roles import Roles, HelperRoles
 
@@ -233,6 +234,8 @@ class HelperUsers:
             up_data = {}
         if up_data:
             Users.update(up_data).where(Users.user_id == user_id).execute()
+            if "superuser" in up_data:
+                PermissionHelper.permissions_changed()
 
     @staticmethod
     def update_server_order(user_id, user_server_order):
@@ -258,7 +261,9 @@ class HelperUsers:
     def remove_user(self, user_id):
         with self.database.atomic():
             UserRoles.delete().where(UserRoles.user_id == user_id).execute()
-            return Users.delete().where(Users.user_id == user_id).execute()
+            deleted = Users.delete().where(Users.user_id == user_id).execute()
+        PermissionHelper.permissions_changed()
+        return deleted
 
     @staticmethod
     def set_support_path(user_id, support_path):
@@ -290,7 +295,9 @@ class HelperUsers:
 
     @staticmethod
     def get_or_create(user_id, role_id):
-        return UserRoles.get_or_create(user_id=user_id, role_id=role_id)
+        user_role = UserRoles.get_or_create(user_id=user_id, role_id=role_id)
+        PermissionHelper.permissions_changed()
+        return user_role
 
     @staticmethod
     def get_user_roles_id(user_id):
@@ -312,6 +319,7 @@ class HelperUsers:
         UserRoles.insert(
             {UserRoles.user_id: user_id, UserRoles.role_id: role_id}
         ).execute()
+        PermissionHelper.permissions_changed()
 
     @staticmethod
     def add_user_roles(user: t.Union[dict, Users]):
@@ -351,10 +359,12 @@ class HelperUsers:
         UserRoles.delete().where(UserRoles.user_id == user_id).where(
             UserRoles.role_id.in_(removed_roles)
         ).execute()
+        PermissionHelper.permissions_changed()
 
     @staticmethod
     def remove_roles_from_role_id(role_id):
         UserRoles.delete().where(UserRoles.role_id == role_id).execute()
+        PermissionHelper.permissions_changed()
 
     @staticmethod
     def get_users_from_role(role_id):
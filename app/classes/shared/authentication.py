@@ -1,5 +1,8 @@
+import copy
 import logging
+import threading
 import time
+from collections import OrderedDict
 from typing import Optional, Dict, Any, Tuple
 import jwt
 from jwt import PyJWTError
@@ -11,8 +14,15 @@ logger = logging.getLogger(__name__)
 
 
 class Authentication:
+    # verified tokens are remembered this long, so a dashboard polling the
+    # api doesn't hit the database for every request
+    cache_ttl = 30
+    cache_size = 1024
+
     def __init__(self, helper):
         self.helper = helper
+        self.cache: OrderedDict = OrderedDict()
+        self.cache_lock = threading.Lock()
         self.secret = "my secret"
         try:
             self.secret = ManagementController.get_crafty_api_key()
@@ -47,8 +57,12 @@ class Authentication:
         self,
         token,
     ) -> Optional[Tuple[Optional[ApiKeys], Dict[str, Any], Dict[str, Any]]]:
+        token = str(token)
+        cached = self._get_cached(token)
+        if cached is not None:
+            return cached
         try:
-            data = jwt.decode(str(token), self.secret, algorithms=["HS256"])
+            data = jwt.decode(token, self.secret, algorithms=["HS256"])
         except PyJWTError as error:
             logger.debug("Error while checking JWT token: ", exc_info=error)
             return None
@@ -61,13 +75,51 @@ class Authentication:
                 return None
         user_id: str = data["user_id"]
         user = HelperUsers.get_user(user_id)
-        # TODO: Have a cache or something so we don't constantly
-        # have to query the database
         if int(user.get("valid_tokens_from").timestamp()) < iat:
             # Success!
-            return key, data, user
+            self._set_cached(token, key, data, user)
+            return key, data, copy.deepcopy(user)
         return None
 
+    def invalidate_user(self, user_id) -> None:
+        """Forgets the verified tokens of a user, call it after changing
+        their valid_tokens_from, roles or api keys"""
+        with self.cache_lock:
+            for token, (_key, data, _user, _expires) in list(self.cache.items()):
+                if str(data["user_id"]) == str(user_id):
+                    del self.cache[token]
+
+    def invalidate_api_key(self, key_id) -> None:
+        with self.cache_lock:
+            for token, (_key, data, _user, _expires) in list(self.cache.items()):
+                if str(data.get("token_id")) == str(key_id):
+                    del self.cache[token]
+
+    def invalidate_all(self) -> None:
+        with self.cache_lock:
+            self.cache.clear()
+
+    def _get_cached(self, token: str):
+        with self.cache_lock:
+            entry = self.cache.get(token)
+            if entry is None:
+                return None
+            key, data, user, expires = entry
+            if time.monotonic() > expires:
+                del self.cache[token]
+                return None
+            self.cache.move_to_end(token)
+        # callers are free to change what they get back
+        return key, dict(data), copy.deepcopy(user)
+
+    def _set_cached(self, token: str, key, data, user) -> None:
+        expires = time.monotonic() + self.cache_ttl
+        with self.cache_lock:
+            self.cache[token] = (key, dict(data), copy.deepcopy(user), expires)
+            self.cache.move_to_end(token)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
     def check_err(
         self,
         token,
@@ -0,0 +1,251 @@
+import collections
+import logging
+import os
+import threading
+import time
+import typing as t
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from zipfile import ZIP64_LIMIT, ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveEntry(t.NamedTuple):
+    path: str
+    arcname: str
+    stat: os.stat_result
+
+
+class BackupEngine:
+    """Writes zip backups, compressing on a pool of worker threads.
+
+    Files are cut into blocks that are deflated in parallel and written back
+    in order, pigz style: every block is primed with the last 32 KiB of the
+    block before it and ends on a sync flush, so the blocks join up into one
+    ordinary deflate stream and the archive stays a plain zip file.
+    zlib drops the GIL while compressing, so threads are enough.
+    """
+
+    block_size = 1024 * 1024
+    # the pool is shared by every backup so parallel backups can't
+    # oversubscribe the cpu
+    workers = min(32, os.cpu_count() or 1)
+    # seconds between progress callbacks
+    progress_interval = 1.0
+
+    pool: t.Optional[ThreadPoolExecutor] = None
+    pool_lock = threading.Lock()
+
+    @staticmethod
+    def get_pool() -> ThreadPoolExecutor:
+        with BackupEngine.pool_lock:
+            if BackupEngine.pool is None:
+                BackupEngine.pool = ThreadPoolExecutor(
+                    max_workers=BackupEngine.workers, thread_name_prefix="backup_zip"
+                )
+            return BackupEngine.pool
+
+    @staticmethod
+    def scan(
+        root: str,
+        excluded_dirs: t.Iterable[str] = (),
+        excluded_names: t.Iterable[str] = ("crafty.sqlite",),
+    ) -> t.Tuple[t.List[ArchiveEntry], int]:
+        """Lists the files to back up with their stat, and their total size.
+
+        Excluded paths are compared with forward slashes. Like os.walk,
+        symlinked directories are skipped and symlinked files are followed.
+        """
+        excluded = {p.replace("\\", "/") for p in excluded_dirs}
+        excluded_names = set(excluded_names)
+        entries = []
+        total_bytes = 0
+        stack = [(root, "")]
+        while stack:
+            dir_path, dir_arcname = stack.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    dir_entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                logger.warning(f"Error backing up: {dir_path}! - Error was: {e}")
+                continue
+            sub_dirs = []
+            for entry in dir_entries:
+                if entry.path.replace("\\", "/") in excluded:
+                    continue
+                arcname = dir_arcname + entry.name
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            sub_dirs.append((entry.path, arcname + "/"))
+                        continue
+                    if entry.name in excluded_names:
+                        continue
+                    stat = entry.stat()
+                except OSError as e:
+                    logger.warning(f"Error backing up: {entry.path}! - Error was: {e}")
+                    continue
+                entries.append(ArchiveEntry(entry.path, arcname, stat))
+                total_bytes += stat.st_size
+            stack.extend(reversed(sub_dirs))
+        return entries, total_bytes
+
+    @staticmethod
+    def write_zip(
+        path_to_destination: str,
+        entries: t.Iterable[ArchiveEntry],
+        compress: bool = True,
+        progress: t.Optional[t.Callable[[int, int], None]] = None,
+    ) -> None:
+        """Writes the entries into a new zip file.
+
+        progress is called with (bytes read, files done) at most every
+        progress_interval seconds, and once at the end.
+        """
+        writer = _ZipBlockWriter(path_to_destination, compress, progress)
+        try:
+            for entry in entries:
+                writer.add(entry)
+        finally:
+            writer.close()
+
+
+class _ZipBlockWriter:
+    def __init__(self, path_to_destination, compress, progress):
+        self.compress = compress
+        self.progress = progress
+        self.zip_file = ZipFile(path_to_destination, "w")
+        self.pool = None
+        if compress and BackupEngine.workers > 1:
+            self.pool = BackupEngine.get_pool()
+        self.max_in_flight = BackupEngine.workers * 2
+        # (entry state, future of the block's output, bytes read, last block)
+        self.pending: t.Deque = collections.deque()
+        self.bytes_done = 0
+        self.files_done = 0
+        self.last_progress = time.monotonic()
+
+    def add(self, entry: ArchiveEntry):
+        state = _EntryState(_ZipBlockWriter._make_info(entry))
+        state.zinfo.compress_type = ZIP_DEFLATED if self.compress else ZIP_STORED
+        # the local header is written before the size is known for sure, so
+        # nothing past the size we stat'ed is read
+        remaining = entry.stat.st_size
+        state.zip64 = remaining * 1.05 > ZIP64_LIMIT
+        try:
+            with open(entry.path, "rb") as f:
+                block = f.read(min(BackupEngine.block_size, remaining))
+                zdict = None
+                while True:
+                    remaining -= len(block)
+                    if block and remaining > 0:
+                        next_block = f.read(min(BackupEngine.block_size, remaining))
+                    else:
+                        next_block = b""
+                    self._queue(state, block, zdict, not next_block)
+                    if not next_block:
+                        return
+                    zdict = block[-32768:]
+                    block = next_block
+        except OSError as e:
+            logger.warning(f"Error backing up: {entry.path}! - Error was: {e}")
+            if state.queued:
+                # part of the file is in the archive already, close it off
+                self._queue(state, b"", None, True)
+
+    def close(self):
+        try:
+            while self.pending:
+                self._write_next()
+            self._report(force=True)
+        finally:
+            self.zip_file.close()
+
+    def _queue(self, state, block, zdict, last):
+        state.crc = zlib.crc32(block, state.crc)
+        state.file_size += len(block)
+        state.queued = True
+        if self.pool is not None:
+            future = self.pool.submit(_ZipBlockWriter._deflate, block, zdict, last)
+        else:
+            future = Future()
+            if self.compress:
+                future.set_result(_ZipBlockWriter._deflate(block, zdict, last))
+            else:
+                future.set_result(block)
+        self.pending.append((state, future, len(block), last))
+        while len(self.pending) >= self.max_in_flight:
+            self._write_next()
+
+    def _write_next(self):
+        state, future, read_size, last = self.pending.popleft()
+        data = future.result()
+        zinfo = state.zinfo
+        fp = self.zip_file.fp
+        if zinfo.header_offset is None:
+            zinfo.header_offset = fp.tell()
+            fp.write(zinfo.FileHeader(state.zip64))
+        fp.write(data)
+        zinfo.compress_size += len(data)
+        self.bytes_done += read_size
+        if last:
+            # the sizes and crc are known now, so rewrite the local header
+            zinfo.CRC = state.crc
+            zinfo.file_size = state.file_size
+            end = fp.tell()
+            fp.seek(zinfo.header_offset)
+            fp.write(zinfo.FileHeader(state.zip64))
+            fp.seek(end)
+            self.zip_file.filelist.append(zinfo)
+            self.zip_file.NameToInfo[zinfo.filename] = zinfo
+            self.zip_file.start_dir = end
+            self.files_done += 1
+        self._report()
+
+    def _report(self, force=False):
+        if self.progress is None:
+            return
+        now = time.monotonic()
+        if force or now - self.last_progress >= BackupEngine.progress_interval:
+            self.last_progress = now
+            self.progress(self.bytes_done, self.files_done)
+
+    @staticmethod
+    def _deflate(block, zdict, last):
+        if zdict:
+            compressor = zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15, zdict=zdict
+            )
+        else:
+            compressor = zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15
+            )
+        data = compressor.compress(block)
+        # a sync flush ends the block on a byte boundary without ending
+        # the stream, so the next block can be appended as is
+        return data + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+    @staticmethod
+    def _make_info(entry: ArchiveEntry) -> ZipInfo:
+        # same as ZipInfo.from_file, without stat'ing the file again
+        date_time = time.localtime(entry.stat.st_mtime)[0:6]
+        if date_time[0] < 1980:
+            date_time = (1980, 1, 1, 0, 0, 0)
+        zinfo = ZipInfo(entry.arcname, date_time)
+        zinfo.external_attr = (entry.stat.st_mode & 0xFFFF) << 16
+        zinfo.header_offset = None
+        zinfo.CRC = 0
+        zinfo.compress_size = 0
+        return zinfo
+
+
+class _EntryState:
+    __slots__ = ("zinfo", "zip64", "crc", "file_size", "queued")
+
+    def __init__(self, zinfo: ZipInfo):
+        self.zinfo = zinfo
+        self.zip64 = False
+        self.crc = 0
+        self.file_size = 0
+        self.queued = False
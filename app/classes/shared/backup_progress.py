@@ -0,0 +1,76 @@
+import threading
+import time
+import typing as t
+
+from app.classes.shared.helpers import Helpers
+
+
+class BackupProgress:
+    """Progress of a server's running (or last) backup, kept in memory.
+
+    The backup engines report the bytes and files they have been through
+    against the totals of the one scan they make, so reading the progress
+    never touches the disk.
+    """
+
+    IDLE = "idle"
+    PREPARING = "preparing"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = BackupProgress.IDLE
+        self.total_bytes = 0
+        self.total_files = 0
+        self.bytes_done = 0
+        self.files_done = 0
+        self.started: t.Optional[float] = None
+        self.finished: t.Optional[float] = None
+
+    def begin(self, state: str = RUNNING):
+        with self.lock:
+            self.state = state
+            self.total_bytes = 0
+            self.total_files = 0
+            self.bytes_done = 0
+            self.files_done = 0
+            self.started = time.time()
+            self.finished = None
+
+    def set_totals(self, total_bytes: int, total_files: int):
+        with self.lock:
+            self.state = BackupProgress.RUNNING
+            self.total_bytes = total_bytes
+            self.total_files = total_files
+
+    def update(self, bytes_done: int, files_done: int):
+        with self.lock:
+            self.bytes_done = bytes_done
+            self.files_done = files_done
+
+    def finish(self, failed: bool = False):
+        with self.lock:
+            self.state = BackupProgress.FAILED if failed else BackupProgress.DONE
+            self.finished = time.time()
+
+    def get_status(self) -> t.Dict[str, t.Any]:
+        with self.lock:
+            if self.state in (BackupProgress.DONE, BackupProgress.FAILED):
+                percent = 100
+            elif self.total_bytes:
+                percent = round(self.bytes_done / self.total_bytes * 100, 2)
+            else:
+                percent = 0
+            return {
+                "state": self.state,
+                "percent": percent,
+                "bytes_done": self.bytes_done,
+                "total_bytes": self.total_bytes,
+                "total_size": Helpers.human_readable_file_size(self.total_bytes),
+                "files_done": self.files_done,
+                "total_files": self.total_files,
+                "started": self.started,
+                "finished": self.finished,
+            }
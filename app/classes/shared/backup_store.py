@@ -0,0 +1,333 @@
+import collections
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import typing as t
+import uuid
+import zlib
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+from app.classes.shared.backup_engine import ArchiveEntry, BackupEngine
+
+logger = logging.getLogger(__name__)
+
+
+class DedupStore:
+    """Incremental backups that store every chunk of file data only once.
+
+    Chunks live in <backup path>/.crafty_store, named after the sha256 of
+    their content. Each backup is a small gzipped manifest next to the zip
+    backups, listing every file with the chunks it is made of: a json header
+    line, then one json line per file. A file whose size, mtime and inode
+    match the previous manifest is not read again. Chunks that no manifest
+    refers to any more are deleted by collect_garbage.
+    """
+
+    store_dir = ".crafty_store"
+    manifest_suffix = ".manifest"
+    chunk_size = 1024 * 1024
+    manifest_version = 1
+
+    # the first byte of a chunk file says how its data is stored
+    CHUNK_RAW = b"r"
+    CHUNK_ZLIB = b"z"
+
+    stores: t.Dict[str, "DedupStore"] = {}
+    stores_lock = threading.Lock()
+
+    def __init__(self, backup_path: str):
+        self.backup_path = backup_path
+        self.chunks_path = os.path.join(backup_path, DedupStore.store_dir, "chunks")
+        # snapshots and garbage collection must not overlap, or a chunk could
+        # be collected between being found and being referenced
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def for_path(backup_path: str) -> "DedupStore":
+        backup_path = os.path.abspath(backup_path)
+        with DedupStore.stores_lock:
+            store = DedupStore.stores.get(backup_path)
+            if store is None:
+                store = DedupStore.stores[backup_path] = DedupStore(backup_path)
+            return store
+
+    @staticmethod
+    def is_manifest(path: str) -> bool:
+        return str(path).endswith(DedupStore.manifest_suffix)
+
+    @staticmethod
+    def read_header(manifest_path: str) -> t.Dict[str, t.Any]:
+        with gzip.open(manifest_path, "rt", encoding="utf-8") as f:
+            return json.loads(f.readline())
+
+    @staticmethod
+    def read_files(manifest_path: str) -> t.Iterator[t.Dict[str, t.Any]]:
+        with gzip.open(manifest_path, "rt", encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                yield json.loads(line)
+
+    def list_manifests(self) -> t.List[str]:
+        if not os.path.isdir(self.backup_path):
+            return []
+        manifests = [
+            entry.path
+            for entry in os.scandir(self.backup_path)
+            if entry.is_file() and DedupStore.is_manifest(entry.name)
+        ]
+        return sorted(manifests, key=os.path.getmtime)
+
+    def create_snapshot(
+        self,
+        path_to_destination: str,
+        entries: t.Iterable[ArchiveEntry],
+        total_bytes: int,
+        compress: bool = True,
+        progress: t.Optional[t.Callable[[int, int], None]] = None,
+    ) -> str:
+        """Backs up the entries from BackupEngine.scan, returns the manifest path.
+
+        progress is called like BackupEngine.write_zip's.
+        """
+        manifest_path = path_to_destination + DedupStore.manifest_suffix
+        with self.lock:
+            previous = self._load_previous()
+            writer = _ChunkWriter(self, compress, progress)
+            files = []
+            try:
+                for entry in entries:
+                    record = writer.add(entry, previous.get(entry.arcname))
+                    if record is not None:
+                        files.append(record)
+            finally:
+                writer.close()
+
+            for record in files:
+                record["chunks"] = [
+                    c if isinstance(c, str) else c.result() for c in record["chunks"]
+                ]
+            header = {
+                "version": DedupStore.manifest_version,
+                "created": time.time(),
+                "files": len(files),
+                "total_bytes": total_bytes,
+                "new_bytes": writer.new_bytes,
+                "chunk_size": DedupStore.chunk_size,
+            }
+            tmp_path = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                f.write(json.dumps(header) + "\n")
+                for record in files:
+                    f.write(json.dumps(record) + "\n")
+            os.replace(tmp_path, manifest_path)
+        logger.info(
+            f"Backed up {len(files)} files ({total_bytes} bytes) to {manifest_path}, "
+            f"{writer.new_bytes} bytes of them in new chunks"
+        )
+        return manifest_path
+
+    def restore(self, manifest_path: str, dest_dir: str) -> None:
+        with self.lock:
+            for record in DedupStore.read_files(manifest_path):
+                file_path = os.path.join(dest_dir, *record["path"].split("/"))
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with open(file_path, "wb") as f:
+                    for digest in record["chunks"]:
+                        f.write(self._read_chunk(digest))
+                os.utime(file_path, ns=(record["mtime_ns"], record["mtime_ns"]))
+
+    def iter_zip(self, manifest_path: str, compress: bool = True) -> t.Iterator[bytes]:
+        """Yields the zip a full backup of the snapshot would have made, piece
+        by piece, without writing it or restoring the files to disk.
+
+        Only the manifest is read under the lock, so a backup or garbage
+        collection on the same path doesn't wait for a download. A chunk
+        collected in the meantime makes the next piece raise OSError.
+        """
+        with self.lock:
+            records = list(DedupStore.read_files(manifest_path))
+        stream = _ZipStream()
+        # zipfile writes data descriptors when it can't seek back
+        with ZipFile(stream, "w") as zip_file:
+            for record in records:
+                date_time = time.localtime(record["mtime_ns"] / 1e9)[0:6]
+                if date_time[0] < 1980:
+                    date_time = (1980, 1, 1, 0, 0, 0)
+                zinfo = ZipInfo(record["path"], date_time)
+                zinfo.compress_type = ZIP_DEFLATED if compress else ZIP_STORED
+                zinfo.external_attr = 0o644 << 16
+                # known up front, so zipfile can tell if it needs zip64
+                zinfo.file_size = record["size"]
+                with zip_file.open(zinfo, "w") as f:
+                    for digest in record["chunks"]:
+                        f.write(self._read_chunk(digest))
+                        yield stream.take()
+                yield stream.take()
+        yield stream.take()
+
+    def remove_snapshot(self, manifest_path: str) -> None:
+        with self.lock:
+            os.remove(manifest_path)
+            self.collect_garbage()
+
+    def collect_garbage(self) -> int:
+        """Deletes the chunks no manifest refers to, returns the bytes freed."""
+        freed = 0
+        with self.lock:
+            if not os.path.isdir(self.chunks_path):
+                return 0
+            referenced = set()
+            for manifest_path in self.list_manifests():
+                for record in DedupStore.read_files(manifest_path):
+                    referenced.update(record["chunks"])
+            for prefix in os.scandir(self.chunks_path):
+                if not prefix.is_dir():
+                    continue
+                for chunk in os.scandir(prefix.path):
+                    # leftover .tmp files are from backups that were cut short
+                    if chunk.name not in referenced:
+                        freed += chunk.stat().st_size
+                        os.remove(chunk.path)
+        if freed:
+            logger.info(f"Freed {freed} bytes of unused backup chunks")
+        return freed
+
+    def chunk_path(self, digest: str) -> str:
+        return os.path.join(self.chunks_path, digest[:2], digest)
+
+    def _read_chunk(self, digest: str) -> bytes:
+        with open(self.chunk_path(digest), "rb") as f:
+            data = f.read()
+        if data[:1] == DedupStore.CHUNK_ZLIB:
+            data = zlib.decompress(data[1:])
+        else:
+            data = data[1:]
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Backup chunk {digest} is corrupt")
+        return data
+
+    def _load_previous(self) -> t.Dict[str, t.Dict[str, t.Any]]:
+        manifests = self.list_manifests()
+        if not manifests:
+            return {}
+        try:
+            return {r["path"]: r for r in DedupStore.read_files(manifests[-1])}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read {manifests[-1]}, reading all files: {e}")
+            return {}
+
+
+class _ZipStream:
+    """An unseekable file that keeps what is written until it is taken."""
+
+    def __init__(self):
+        self.pieces: t.List[bytes] = []
+
+    def write(self, data) -> int:
+        self.pieces.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self.pieces)
+        self.pieces.clear()
+        return data
+
+
+class _ChunkWriter:
+    def __init__(self, store: DedupStore, compress, progress):
+        self.store = store
+        self.compress = compress
+        self.progress = progress
+        self.pool = BackupEngine.get_pool() if BackupEngine.workers > 1 else None
+        self.max_in_flight = BackupEngine.workers * 2
+        self.in_flight: t.Deque = collections.deque()
+        self.new_bytes = 0
+        self.new_bytes_lock = threading.Lock()
+        self.bytes_done = 0
+        self.files_done = 0
+        self.last_progress = time.monotonic()
+
+    def add(self, entry: ArchiveEntry, previous: t.Optional[t.Dict[str, t.Any]]):
+        stat = entry.stat
+        record = {
+            "path": entry.arcname,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "ino": stat.st_ino,
+        }
+        if (
+            previous is not None
+            and previous["size"] == stat.st_size
+            and previous["mtime_ns"] == stat.st_mtime_ns
+            and previous["ino"] == stat.st_ino
+        ):
+            record["chunks"] = previous["chunks"]
+            self._done(stat.st_size)
+            return record
+
+        chunks = []
+        remaining = stat.st_size
+        try:
+            with open(entry.path, "rb") as f:
+                while remaining > 0:
+                    block = f.read(min(DedupStore.chunk_size, remaining))
+                    if not block:
+                        break
+                    remaining -= len(block)
+                    chunks.append(self._queue(block))
+        except OSError as e:
+            logger.warning(f"Error backing up: {entry.path}! - Error was: {e}")
+            return None
+        record["chunks"] = chunks
+        self._done(stat.st_size)
+        return record
+
+    def close(self):
+        while self.in_flight:
+            self.in_flight.popleft().result()
+        if self.progress is not None:
+            self.progress(self.bytes_done, self.files_done)
+
+    def _queue(self, block):
+        if self.pool is None:
+            return self._store(block)
+        future = self.pool.submit(self._store, block)
+        self.in_flight.append(future)
+        while len(self.in_flight) >= self.max_in_flight:
+            self.in_flight.popleft().result()
+        return future
+
+    def _store(self, block) -> str:
+        digest = hashlib.sha256(block).hexdigest()
+        chunk_path = self.store.chunk_path(digest)
+        if os.path.exists(chunk_path):
+            return digest
+        if self.compress:
+            data = DedupStore.CHUNK_ZLIB + zlib.compress(block)
+        else:
+            data = DedupStore.CHUNK_RAW + block
+        os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+        tmp_path = f"{chunk_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, chunk_path)
+        with self.new_bytes_lock:
+            self.new_bytes += len(data)
+        return digest
+
+    def _done(self, size):
+        self.bytes_done += size
+        self.files_done += 1
+        if self.progress is None:
+            return
+        now = time.monotonic()
+        if now - self.last_progress >= BackupEngine.progress_interval:
+            self.last_progress = now
+            self.progress(self.bytes_done, self.files_done)
@@ -0,0 +1,181 @@
+import collections
+import datetime
+import logging
+import queue
+import threading
+import time
+import typing as t
+
+from app.classes.models.management import HelpersManagement
+from app.classes.models.servers import Servers
+
+if t.TYPE_CHECKING:
+    from app.classes.controllers.servers_controller import ServersController
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedCommand(t.NamedTuple):
+    command_id: int
+    server_id: int
+    user_id: int
+    command: str
+
+
+class CommandBus:
+    """Runs the commands sent to servers as soon as they are sent.
+
+    Each server has its own queue whose commands run one at a time, in the
+    order they were sent, while the queues of different servers are worked
+    through in parallel by a few threads, so a server that is slow to stop
+    only holds up its own commands. The commands table is the journal: a
+    command is written to it before it is queued and marked executed once
+    it has run, and the ones left unexecuted when Crafty stopped are queued
+    again by replay.
+    """
+
+    workers = 4
+    # unexecuted commands older than this are dropped on startup, not replayed
+    replay_max_age = 10 * 60
+    # seconds a killed server gets to exit before it is cleaned up
+    kill_wait = 5
+
+    def __init__(self, servers_controller: "ServersController"):
+        self.servers = servers_controller
+        self.lock = threading.Lock()
+        # a server has a queue here while a worker is due to run its commands
+        self.queues: t.Dict[int, t.Deque[QueuedCommand]] = {}
+        # servers with commands that no worker has picked up yet
+        self.ready: "queue.Queue[int]" = queue.Queue()
+        # queued or running, so replay doesn't queue them twice
+        self.pending_ids: t.Set[int] = set()
+        self.threads: t.List[threading.Thread] = []
+
+    def start(self):
+        with self.lock:
+            if self.threads:
+                return
+            for i in range(CommandBus.workers):
+                thread = threading.Thread(
+                    target=self._worker, daemon=True, name=f"command_bus_{i}"
+                )
+                thread.start()
+                self.threads.append(thread)
+
+    def add_command(self, server_id, user_id, remote_ip, command):
+        # scheduled tasks pass the server's model rather than its id
+        if isinstance(server_id, Servers):
+            server_id = server_id.server_id
+        command_id = HelpersManagement.add_command(
+            server_id, user_id, remote_ip, command
+        )
+        self._queue(QueuedCommand(command_id, int(server_id), user_id, command))
+
+    def replay(self):
+        """Queues the commands that were sent but never run."""
+        oldest = datetime.datetime.now() - datetime.timedelta(
+            seconds=CommandBus.replay_max_age
+        )
+        for cmd in HelpersManagement.get_unactioned_commands():
+            if cmd.created < oldest:
+                logger.info(
+                    f"Not replaying command {cmd.command} for server "
+                    f"{cmd.server_id_id}, it was sent at {cmd.created}"
+                )
+                HelpersManagement.mark_command_complete(cmd.command_id)
+                continue
+            with self.lock:
+                if cmd.command_id in self.pending_ids:
+                    continue
+            logger.info(
+                f"Replaying command {cmd.command} for server {cmd.server_id_id}"
+            )
+            self._queue(
+                QueuedCommand(
+                    cmd.command_id, cmd.server_id_id, cmd.user_id, cmd.command
+                )
+            )
+
+    def clear(self):
+        """Drops the commands that haven't started running yet."""
+        with self.lock:
+            for commands in self.queues.values():
+                for cmd in commands:
+                    self.pending_ids.discard(cmd.command_id)
+                commands.clear()
+        HelpersManagement.clear_unexecuted_commands()
+
+    def _queue(self, cmd: QueuedCommand):
+        with self.lock:
+            self.pending_ids.add(cmd.command_id)
+            commands = self.queues.get(cmd.server_id)
+            if commands is None:
+                self.queues[cmd.server_id] = collections.deque([cmd])
+                self.ready.put(cmd.server_id)
+            else:
+                # a worker has this server already and will get to it
+                commands.append(cmd)
+
+    def _worker(self):
+        while True:
+            server_id = self.ready.get()
+            while True:
+                with self.lock:
+                    commands = self.queues[server_id]
+                    if not commands:
+                        del self.queues[server_id]
+                        break
+                    cmd = commands.popleft()
+                try:
+                    self.dispatch(cmd)
+                except Exception as e:
+                    logger.error(
+                        f"Command {cmd.command} for server {cmd.server_id} "
+                        f"failed: {e}",
+                        exc_info=True,
+                    )
+                finally:
+                    HelpersManagement.mark_command_complete(cmd.command_id)
+                    with self.lock:
+                        self.pending_ids.discard(cmd.command_id)
+
+    def dispatch(self, cmd: QueuedCommand):
+        try:
+            svr = self.servers.get_server_instance_by_id(cmd.server_id)
+        except:
+            logger.error(
+                "Server value requested does not exist! "
+                "Purging item from waiting commands."
+            )
+            return
+
+        user_id = cmd.user_id
+        command = cmd.command
+
+        if command == "start_server":
+            svr.run_threaded_server(user_id)
+
+        elif command == "stop_server":
+            svr.stop_threaded_server()
+
+        elif command == "restart_server":
+            svr.restart_threaded_server(user_id)
+
+        elif command == "kill_server":
+            try:
+                svr.kill()
+                time.sleep(CommandBus.kill_wait)
+                svr.cleanup_server_object()
+                svr.record_server_stats()
+            except Exception as e:
+                logger.error(
+                    f"Could not find PID for requested termsig. Full error: {e}"
+                )
+
+        elif command == "backup_server":
+            svr.backup_server()
+
+        elif command == "update_executable":
+            svr.jar_update()
+        else:
+            svr.send_command(command)
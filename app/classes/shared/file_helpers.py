@@ -1,4 +1,5 @@
 import os
+import sys
 import shutil
 import logging
 import pathlib
@@ -6,6 +7,14 @@ import tempfile
 import zipfile
 from zipfile import ZipFile, ZIP_DEFLATED
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from app.classes.shared.backup_engine import ArchiveEntry, BackupEngine
+from app.classes.shared.backup_progress import BackupProgress
+from app.classes.shared.backup_store import DedupStore
 from app.classes.shared.helpers import Helpers
 from app.classes.shared.console import Console
 
@@ -14,6 +23,9 @@ logger = logging.getLogger(__name__)
 
 class FileHelpers:
     allowed_quotes = ['"', "'", "`"]
+    # linux ioctl that makes a copy-on-write clone of a file
+    FICLONE = 0x40049409 if fcntl is not None and sys.platform == "linux" else None
+    live_snapshot_dir = ".crafty_live"
 
     def __init__(self, helper):
         self.helper: Helpers = helper
@@ -124,126 +136,111 @@ class FileHelpers:
     def make_compressed_backup(
         self, path_to_destination, path_to_zip, excluded_dirs, server_id
     ):
-        # create a ZipFile object
-        path_to_destination += ".zip"
-        ex_replace = [p.replace("\\", "/") for p in excluded_dirs]
-        total_bytes = 0
-        dir_bytes = Helpers.get_dir_size(path_to_zip)
-        results = {
-            "percent": 0,
-            "total_files": self.helper.human_readable_file_size(dir_bytes),
-        }
-        self.helper.websocket_helper.broadcast_page_params(
-            "/panel/server_detail",
-            {"id": str(server_id)},
-            "backup_status",
-            results,
+        entries, dir_bytes = BackupEngine.scan(path_to_zip, excluded_dirs)
+        return self.write_backup(
+            path_to_destination, entries, dir_bytes, server_id, True
         )
-        with ZipFile(path_to_destination, "w", ZIP_DEFLATED) as zip_file:
-            for root, dirs, files in os.walk(path_to_zip, topdown=True):
-                for l_dir in dirs:
-                    if str(os.path.join(root, l_dir)).replace("\\", "/") in ex_replace:
-                        dirs.remove(l_dir)
-                ziproot = path_to_zip
-                for file in files:
-                    if (
-                        str(os.path.join(root, file)).replace("\\", "/")
-                        not in ex_replace
-                        and file != "crafty.sqlite"
-                    ):
-                        try:
-                            logger.info(f"backing up: {os.path.join(root, file)}")
-                            if os.name == "nt":
-                                zip_file.write(
-                                    os.path.join(root, file),
-                                    os.path.join(root.replace(ziproot, ""), file),
-                                )
-                            else:
-                                zip_file.write(
-                                    os.path.join(root, file),
-                                    os.path.join(root.replace(ziproot, "/"), file),
-                                )
-
-                        except Exception as e:
-                            logger.warning(
-                                f"Error backing up: {os.path.join(root, file)}!"
-                                f" - Error was: {e}"
-                            )
-                    total_bytes += os.path.getsize(os.path.join(root, file))
-                    percent = round((total_bytes / dir_bytes) * 100, 2)
-                    results = {
-                        "percent": percent,
-                        "total_files": self.helper.human_readable_file_size(dir_bytes),
-                    }
-                    self.helper.websocket_helper.broadcast_page_params(
-                        "/panel/server_detail",
-                        {"id": str(server_id)},
-                        "backup_status",
-                        results,
-                    )
-
-        return True
 
     def make_backup(self, path_to_destination, path_to_zip, excluded_dirs, server_id):
-        # create a ZipFile object
+        entries, dir_bytes = BackupEngine.scan(path_to_zip, excluded_dirs)
+        return self.write_backup(
+            path_to_destination, entries, dir_bytes, server_id, False
+        )
+
+    def write_backup(
+        self,
+        path_to_destination,
+        entries,
+        dir_bytes,
+        server_id,
+        compress,
+        progress=None,
+    ):
         path_to_destination += ".zip"
-        ex_replace = [p.replace("\\", "/") for p in excluded_dirs]
-        total_bytes = 0
-        dir_bytes = Helpers.get_dir_size(path_to_zip)
-        results = {
-            "percent": 0,
-            "total_files": self.helper.human_readable_file_size(dir_bytes),
-        }
-        self.helper.websocket_helper.broadcast_page_params(
-            "/panel/server_detail",
-            {"id": str(server_id)},
-            "backup_status",
-            results,
+        logger.info(
+            f"Backing up {len(entries)} files "
+            f"({self.helper.human_readable_file_size(dir_bytes)}) "
+            f"to {path_to_destination}"
+        )
+        BackupEngine.write_zip(
+            path_to_destination,
+            entries,
+            compress,
+            self.get_progress_callback(server_id, entries, dir_bytes, progress),
         )
-        with ZipFile(path_to_destination, "w") as zip_file:
-            for root, dirs, files in os.walk(path_to_zip, topdown=True):
-                for l_dir in dirs:
-                    if str(os.path.join(root, l_dir)).replace("\\", "/") in ex_replace:
-                        dirs.remove(l_dir)
-                ziproot = path_to_zip
-                for file in files:
-                    if (
-                        str(os.path.join(root, file)).replace("\\", "/")
-                        not in ex_replace
-                        and file != "crafty.sqlite"
-                    ):
-                        try:
-                            logger.info(f"backing up: {os.path.join(root, file)}")
-                            if os.name == "nt":
-                                zip_file.write(
-                                    os.path.join(root, file),
-                                    os.path.join(root.replace(ziproot, ""), file),
-                                )
-                            else:
-                                zip_file.write(
-                                    os.path.join(root, file),
-                                    os.path.join(root.replace(ziproot, "/"), file),
-                                )
-
-                        except Exception as e:
-                            logger.warning(
-                                f"Error backing up: {os.path.join(root, file)}!"
-                                f" - Error was: {e}"
-                            )
-                    total_bytes += os.path.getsize(os.path.join(root, file))
-                    percent = round((total_bytes / dir_bytes) * 100, 2)
-                    results = {
-                        "percent": percent,
-                        "total_files": self.helper.human_readable_file_size(dir_bytes),
-                    }
-                    self.helper.websocket_helper.broadcast_page_params(
-                        "/panel/server_detail",
-                        {"id": str(server_id)},
-                        "backup_status",
-                        results,
-                    )
         return True
 
+    def write_incremental_backup(
+        self,
+        path_to_destination,
+        entries,
+        dir_bytes,
+        server_id,
+        compress,
+        progress=None,
+    ):
+        store = DedupStore.for_path(os.path.dirname(path_to_destination))
+        return store.create_snapshot(
+            path_to_destination,
+            entries,
+            dir_bytes,
+            compress,
+            self.get_progress_callback(server_id, entries, dir_bytes, progress),
+        )
+
+    def get_progress_callback(self, server_id, entries, dir_bytes, progress=None):
+        if progress is None:
+            progress = BackupProgress()
+            progress.begin()
+        progress.set_totals(dir_bytes, len(entries))
+
+        def send_progress(bytes_done, files_done):
+            # the backup engines throttle these, so the socket isn't flooded
+            progress.update(bytes_done, files_done)
+            self.helper.websocket_helper.broadcast_page_params(
+                "/panel/server_detail",
+                {"id": str(server_id)},
+                "backup_status",
+                progress.get_status(),
+            )
+
+        send_progress(0, 0)
+        return send_progress
+
+    @staticmethod
+    def snapshot_files(entries, snapshot_dir):
+        """Copies the scanned files into snapshot_dir.
+
+        Uses copy-on-write clones where the filesystem has them (btrfs, xfs),
+        which is near instant. The returned entries point at the copies but
+        keep the stat of the originals, so incremental backups still see
+        unchanged files as unchanged.
+        """
+        reflink = FileHelpers.FICLONE is not None
+        snapshot = []
+        for entry in entries:
+            dest = os.path.join(snapshot_dir, *entry.arcname.split("/"))
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            try:
+                if reflink:
+                    try:
+                        FileHelpers.clone_file(entry.path, dest)
+                    except OSError:
+                        # not supported here, don't try again for every file
+                        reflink = False
+                if not reflink:
+                    shutil.copyfile(entry.path, dest)
+            except OSError as e:
+                logger.warning(f"Error backing up: {entry.path}! - Error was: {e}")
+                continue
+            snapshot.append(ArchiveEntry(dest, entry.arcname, entry.stat))
+        return snapshot
+
+    @staticmethod
+    def clone_file(src_path, dest_path):
+        with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+            fcntl.ioctl(dest.fileno(), FileHelpers.FICLONE, src.fileno())
+
     @staticmethod
     def unzip_file(zip_path):
         new_dir_list = zip_path.split("/")
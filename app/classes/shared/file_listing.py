@@ -0,0 +1,207 @@
+import base64
+import collections
+import json
+import os
+import threading
+import time
+import typing as t
+
+
+class FileEntry(t.NamedTuple):
+    name: str
+    is_dir: bool
+    size: int
+    mtime: float
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        return {
+            "name": self.name,
+            "type": "dir" if self.is_dir else "file",
+            "size": self.size,
+            "mtime": self.mtime,
+        }
+
+
+class DirPage(t.NamedTuple):
+    entries: t.List[FileEntry]
+    # pass back to list_dir for the next page, None on the last page
+    next_cursor: t.Optional[str]
+    total: int
+
+
+class FileListing:
+    """Lists directories with one os.scandir pass, folders first.
+
+    Pages are keyed on the last entry of the page before, not on an offset,
+    so files created or deleted between two pages don't shift the pages
+    around. A listing is kept for cache_ttl seconds after the first page, so
+    paging through a huge directory doesn't scan it again for every page.
+    """
+
+    SORTS = ("name", "size", "mtime")
+    # hidden from the file manager
+    hidden_names = ("crafty.sqlite", "crafty_managed.txt")
+
+    default_limit = 500
+    max_limit = 5000
+    cache_ttl = 30
+    cache_size = 16
+
+    cache: t.OrderedDict[
+        t.Tuple, t.Tuple[float, int, t.List[FileEntry]]
+    ] = collections.OrderedDict()
+    cache_lock = threading.Lock()
+
+    @staticmethod
+    def list_dir(
+        path: str,
+        sort: str = "name",
+        reverse: bool = False,
+        cursor: t.Optional[str] = None,
+        limit: t.Optional[int] = None,
+        hidden: t.Optional[t.Iterable[str]] = None,
+    ) -> DirPage:
+        """Returns a page of the directory's entries.
+
+        Without a limit the whole directory is returned. Raises ValueError
+        for an unknown sort or a bad cursor, and OSError if the directory
+        can't be read.
+        """
+        if sort not in FileListing.SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+        if hidden is None:
+            hidden = FileListing.hidden_names
+        path = os.path.abspath(path)
+        key = (path, sort, reverse, frozenset(hidden))
+
+        # the first page always scans, later pages reuse its listing
+        entries = None if cursor is None else FileListing._get_cached(key, path)
+        if entries is None:
+            # stat'ed first, so a change made during the scan isn't missed
+            mtime_ns = os.stat(path).st_mtime_ns
+            entries = FileListing._scan(path, hidden)
+            entries.sort(key=FileListing._sort_key(sort), reverse=reverse)
+            # folders stay first whichever way the files are sorted
+            entries.sort(key=lambda e: not e.is_dir)
+            FileListing._set_cached(key, mtime_ns, entries)
+
+        start = 0
+        if cursor is not None:
+            start = FileListing._find_after(
+                entries, FileListing._decode_cursor(cursor, sort), sort, reverse
+            )
+        if limit is None:
+            end = len(entries)
+        else:
+            end = start + max(1, min(limit, FileListing.max_limit))
+        page = entries[start:end]
+
+        next_cursor = None
+        if end < len(entries) and page:
+            next_cursor = FileListing._encode_cursor(page[-1], sort)
+        return DirPage(page, next_cursor, len(entries))
+
+    @staticmethod
+    def _scan(path: str, hidden: t.Iterable[str]) -> t.List[FileEntry]:
+        hidden = set(hidden)
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name in hidden:
+                    continue
+                try:
+                    # is_dir follows symlinks, like os.path.isdir did
+                    is_dir = entry.is_dir()
+                    stat = entry.stat()
+                except OSError:
+                    # a broken symlink, list the link itself
+                    is_dir = False
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                entries.append(
+                    FileEntry(
+                        entry.name,
+                        is_dir,
+                        0 if is_dir else stat.st_size,
+                        stat.st_mtime,
+                    )
+                )
+        return entries
+
+    @staticmethod
+    def _sort_key(sort: str) -> t.Callable[[FileEntry], t.Tuple]:
+        if sort == "size":
+            return lambda e: (e.size, e.name.casefold(), e.name)
+        if sort == "mtime":
+            return lambda e: (e.mtime, e.name.casefold(), e.name)
+        return lambda e: (e.name.casefold(), e.name)
+
+    @staticmethod
+    def _find_after(
+        entries: t.List[FileEntry], last: FileEntry, sort: str, reverse: bool
+    ) -> int:
+        # entries are sorted, so the ones after the cursor are a suffix
+        sort_key = FileListing._sort_key(sort)
+        last_key = (not last.is_dir, sort_key(last))
+
+        def is_after(entry: FileEntry) -> bool:
+            group = not entry.is_dir
+            if group != last_key[0]:
+                return group > last_key[0]
+            if reverse:
+                return sort_key(entry) < last_key[1]
+            return sort_key(entry) > last_key[1]
+
+        low, high = 0, len(entries)
+        while low < high:
+            mid = (low + high) // 2
+            if is_after(entries[mid]):
+                high = mid
+            else:
+                low = mid + 1
+        return low
+
+    @staticmethod
+    def _encode_cursor(entry: FileEntry, sort: str) -> str:
+        data = json.dumps([sort, entry.name, entry.is_dir, entry.size, entry.mtime])
+        return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str, sort: str) -> FileEntry:
+        try:
+            cursor_sort, name, is_dir, size, mtime = json.loads(
+                base64.urlsafe_b64decode(cursor.encode("ascii"))
+            )
+            entry = FileEntry(str(name), bool(is_dir), int(size), float(mtime))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+        if cursor_sort != sort:
+            raise ValueError(f"Cursor is for sorting by {cursor_sort}, not {sort}")
+        return entry
+
+    @staticmethod
+    def _get_cached(key, path: str) -> t.Optional[t.List[FileEntry]]:
+        with FileListing.cache_lock:
+            cached = FileListing.cache.get(key)
+        if cached is None:
+            return None
+        scanned, mtime_ns, entries = cached
+        if time.monotonic() - scanned > FileListing.cache_ttl:
+            return None
+        try:
+            # a file was added, removed or renamed since the scan
+            if os.stat(path).st_mtime_ns != mtime_ns:
+                return None
+        except OSError:
+            return None
+        return entries
+
+    @staticmethod
+    def _set_cached(key, mtime_ns: int, entries: t.List[FileEntry]):
+        with FileListing.cache_lock:
+            FileListing.cache[key] = (time.monotonic(), mtime_ns, entries)
+            FileListing.cache.move_to_end(key)
+            while len(FileListing.cache) > FileListing.cache_size:
+                FileListing.cache.popitem(last=False)
@@ -22,8 +22,12 @@ from socket import gethostname
 from contextlib import redirect_stderr, suppress
 
 from app.classes.shared.null_writer import NullWriter
+from app.classes.shared.backup_store import DedupStore
 from app.classes.shared.console import Console
+from app.classes.shared.file_listing import FileListing
 from app.classes.shared.installer import installer
+from app.classes.shared.log_highlighter import LogHighlighter
+from app.classes.shared.settings_store import SettingsStore
 from app.classes.shared.translation import Translation
 from app.classes.web.websocket_helper import WebSocketHelper
 
@@ -52,6 +56,11 @@ except ModuleNotFoundError as err:
 
 class Helpers:
     allowed_quotes = ['"', "'", "`"]
+    log_highlighter = LogHighlighter()
+    # Bytes read per step when reading a file backwards
+    tail_block_size = 64 * 1024
+    # Upper bound on what a tail keeps in memory, for files with huge lines
+    tail_max_bytes = 32 * 1024 * 1024
 
     def __init__(self):
         self.root_dir = os.path.abspath(os.path.curdir)
@@ -63,6 +72,7 @@ class Helpers:
 
         self.session_file = os.path.join(self.root_dir, "app", "config", "session.lock")
         self.settings_file = os.path.join(self.root_dir, "app", "config", "config.json")
+        self.settings_store = SettingsStore.for_file(self.settings_file)
 
         self.ensure_dir_exists(os.path.join(self.root_dir, "app", "config", "db"))
         self.db_path = os.path.join(
@@ -295,12 +305,9 @@ class Helpers:
 
     def get_setting(self, key, default_return=False):
         try:
-            with open(self.settings_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            if key in data.keys():
-                return data.get(key)
+            return self.settings_store.get(key)
 
+        except KeyError:
             logger.error(f'Config File Error: Setting "{key}" does not exist')
             Console.error(f'Config File Error: Setting "{key}" does not exist')
 
@@ -316,13 +323,7 @@ class Helpers:
 
     def set_setting(self, key, new_value):
         try:
-            with open(self.settings_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            if key in data.keys():
-                data[key] = new_value
-                with open(self.settings_file, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=2)
+            if self.settings_store.set(key, new_value):
                 return True
 
             logger.error(f'Config File Error: Setting "{key}" does not exist')
@@ -337,6 +338,10 @@ class Helpers:
             )
         return False
 
+    def get_settings_read_stats(self):
+        # how many config.json reads the in-memory settings store saved
+        return self.settings_store.get_read_stats()
+
     @staticmethod
     def get_local_ip():
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -401,40 +406,13 @@ class Helpers:
             return False
 
     def log_colors(self, line):
-        # our regex replacements
-        # note these are in a tuple
-
-        user_keywords = self.get_setting("keywords")
-
-        replacements = [
-            (r"(\[.+?/INFO\])", r'<span class="mc-log-info">\1</span>'),
-            (r"(\[.+?/WARN\])", r'<span class="mc-log-warn">\1</span>'),
-            (r"(\[.+?/ERROR\])", r'<span class="mc-log-error">\1</span>'),
-            (r"(\[.+?/FATAL\])", r'<span class="mc-log-fatal">\1</span>'),
-            (
-                r"(\w+?\[/\d+?\.\d+?\.\d+?\.\d+?\:\d+?\])",
-                r'<span class="mc-log-keyword">\1</span>',
-            ),
-            (r"\[(\d\d:\d\d:\d\d)\]", r'<span class="mc-log-time">[\1]</span>'),
-            (r"(\[.+? INFO\])", r'<span class="mc-log-info">\1</span>'),
-            (r"(\[.+? WARN\])", r'<span class="mc-log-warn">\1</span>'),
-            (r"(\[.+? ERROR\])", r'<span class="mc-log-error">\1</span>'),
-            (r"(\[.+? FATAL\])", r'<span class="mc-log-fatal">\1</span>'),
-        ]
-
-        # highlight users keywords
-        for keyword in user_keywords:
-            # pylint: disable=consider-using-f-string
-            search_replace = (
-                r"({})".format(keyword),
-                r'<span class="mc-log-keyword">\1</span>',
-            )
-            replacements.append(search_replace)
+        return Helpers.log_highlighter.highlight(line, self.get_setting("keywords"))
 
-        for old, new in replacements:
-            line = re.sub(old, new, line, flags=re.IGNORECASE)
-
-        return line
+    def log_colors_lines(self, lines):
+        # colours a whole log view in one pass
+        return Helpers.log_highlighter.highlight_lines(
+            lines, self.get_setting("keywords")
+        )
 
     @staticmethod
     def validate_traversal(base_path, filename):
@@ -453,35 +431,46 @@ class Helpers:
             logger.warning(f"Unable to find file to tail: {file_name}")
             return [f"Unable to find file to tail: {file_name}"]
 
-        # length of lines is X char here
-        avg_line_length = 255
-
-        # create our buffer number - number of lines * avg_line_length
-        line_buffer = number_lines * avg_line_length
-
-        # open our file
-        with open(file_name, "r", encoding="utf-8") as f:
-
-            # seek
-            f.seek(0, 2)
-
-            # get file size
-            fsize = f.tell()
-
-            # set pos @ last n chars
-            # (buffer from above = number of lines * avg_line_length)
-            f.seek(max(fsize - line_buffer, 0), 0)
+        try:
+            return Helpers.read_last_lines(file_name, number_lines)
+        except Exception as e:
+            logger.warning(f"Unable to read the file:{file_name} - due to error: {e}")
+            return []
 
-            # read file til the end
-            try:
-                lines = f.readlines()
+    @staticmethod
+    def read_last_lines(file_name, number_lines):
+        """Returns the last number_lines lines of a file, line endings included.
 
-            except Exception as e:
-                logger.warning(
-                    f"Unable to read a line in the file:{file_name} - due to error: {e}"
-                )
+        The file is read backwards in blocks until enough newlines were seen,
+        so only the tail is ever held in memory, however large the file is.
+        """
+        if number_lines <= 0:
+            return []
 
-        # now we are done getting the lines, let's return it
+        blocks = []
+        newlines = 0
+        kept = 0
+        with open(file_name, "rb") as f:
+            pos = f.seek(0, os.SEEK_END)
+            while pos > 0 and kept < Helpers.tail_max_bytes:
+                read_size = min(Helpers.tail_block_size, pos)
+                pos -= read_size
+                f.seek(pos)
+                block = f.read(read_size)
+                # the newline ending the very last line doesn't start a new one
+                newlines += block.count(b"\n", 0, len(block) - (kept == 0))
+                blocks.append(block)
+                kept += len(block)
+                if newlines >= number_lines:
+                    break
+
+        lines = b"".join(reversed(blocks)).decode("utf-8", "replace").split("\n")
+        # whatever follows the last newline, empty when the file ends with one
+        last_line = lines.pop()
+        lines = [line + "\n" for line in lines[-number_lines:]]
+        if last_line:
+            lines = lines[1:] if len(lines) == number_lines else lines
+            lines.append(last_line)
         return lines
 
     @staticmethod
@@ -586,6 +575,38 @@ class Helpers:
             # pylint: disable=consider-using-f-string
         return "%.1f%s%s" % (num, "Y", suffix)
 
+    @staticmethod
+    def parse_byte_range(range_header: str, size: int):
+        """Returns the (start, end) of a Range header, with end exclusive.
+
+        Returns None when the whole file should be sent, which includes
+        malformed headers and requests for more than one range. Raises
+        ValueError when the range can't be satisfied.
+        """
+        unit, _, spec = range_header.partition("=")
+        if unit.strip() != "bytes" or "," in spec:
+            return None
+        first, sep, last = spec.strip().partition("-")
+        if not sep or not (first or last):
+            return None
+        if not all(part.isdecimal() for part in (first, last) if part):
+            return None
+        if not first:
+            # bytes=-500 is the last 500 bytes
+            start = max(0, size - int(last))
+            end = size
+        else:
+            start = int(first)
+            end = size
+            if last:
+                end = int(last) + 1
+                if end <= start:
+                    return None
+        end = min(end, size)
+        if start >= end:
+            raise ValueError(f"Range {range_header} is outside of {size} bytes")
+        return start, end
+
     @staticmethod
     def check_path_exists(path: str):
         if not path:
@@ -600,15 +621,9 @@ class Helpers:
     @staticmethod
     def get_file_contents(path: str, lines=100):
 
-        contents = ""
-
         if os.path.exists(path) and os.path.isfile(path):
             try:
-                with open(path, "r", encoding="utf-8") as f:
-                    for line in f.readlines()[-lines:]:
-                        contents = contents + line
-
-                return contents
+                return "".join(Helpers.read_last_lines(path, lines))
 
             except Exception as e:
                 logger.error(f"Unable to read file: {path}. \n Error: {e}")
@@ -844,25 +859,19 @@ class Helpers:
 
         return data
 
+    @staticmethod
+    def list_tree_entries(folder, hidden=None):
+        return FileListing.list_dir(folder, hidden=hidden).entries
+
     @staticmethod
     def generate_tree(folder, output=""):
-        dir_list = []
-        unsorted_files = []
-        file_list = os.listdir(folder)
-        for item in file_list:
-            if os.path.isdir(os.path.join(folder, item)):
-                dir_list.append(item)
-            elif str(item) != "crafty.sqlite":
-                unsorted_files.append(item)
-        file_list = sorted(dir_list, key=str.casefold) + sorted(
-            unsorted_files, key=str.casefold
-        )
-        for raw_filename in file_list:
-            filename = html.escape(raw_filename)
-            rel = os.path.join(folder, raw_filename)
+        parts = [output]
+        for entry in Helpers.list_tree_entries(folder):
+            filename = html.escape(entry.name)
             dpath = os.path.join(folder, filename)
-            if os.path.isdir(rel):
-                output += f"""<li class="tree-item" data-path="{dpath}">
+            if entry.is_dir:
+                parts.append(
+                    f"""<li class="tree-item" data-path="{dpath}">
                     \n<div id="{dpath}" data-path="{dpath}" data-name="{filename}" class="tree-caret tree-ctx-item tree-folder">
                     <span id="{dpath}span" class="files-tree-title" data-path="{dpath}" data-name="{filename}" onclick="getDirView(event)">
                       <i style="color: #8862e0;" class="far fa-folder"></i>
@@ -871,37 +880,20 @@ class Helpers:
                       </span>
                     </div><li>
                     \n"""
+                )
             else:
-                if filename != "crafty_managed.txt":
-                    output += f"""<li
-                    class="d-block tree-ctx-item tree-file tree-item"
-                    data-path="{dpath}"
-                    data-name="{filename}"
-                    onclick="clickOnFile(event)"><span style="margin-right: 6px;">
-                    <i class="far fa-file"></i></span>{filename}</li>"""
-        return output
+                parts.append(Helpers._tree_file_item(dpath, filename))
+        return "".join(parts)
 
     @staticmethod
     def generate_dir(folder, output=""):
-
-        dir_list = []
-        unsorted_files = []
-        file_list = os.listdir(folder)
-        for item in file_list:
-            if os.path.isdir(os.path.join(folder, item)):
-                dir_list.append(item)
-            elif str(item) != "crafty.sqlite":
-                unsorted_files.append(item)
-        file_list = sorted(dir_list, key=str.casefold) + sorted(
-            unsorted_files, key=str.casefold
-        )
-        output += f"""<ul class="tree-nested d-block" id="{folder}ul">"""
-        for raw_filename in file_list:
-            filename = html.escape(raw_filename)
+        parts = [output, f"""<ul class="tree-nested d-block" id="{folder}ul">"""]
+        for entry in Helpers.list_tree_entries(folder):
+            filename = html.escape(entry.name)
             dpath = os.path.join(folder, filename)
-            rel = os.path.join(folder, raw_filename)
-            if os.path.isdir(rel):
-                output += f"""<li class="tree-item" data-path="{dpath}">
+            if entry.is_dir:
+                parts.append(
+                    f"""<li class="tree-item" data-path="{dpath}">
                     \n<div id="{dpath}" data-path="{dpath}" data-name="{filename}" class="tree-caret tree-ctx-item tree-folder">
                     <span id="{dpath}span" class="files-tree-title" data-path="{dpath}" data-name="{filename}" onclick="getDirView(event)">
                       <i style="color: #8862e0;" class="far fa-folder"></i>
@@ -909,50 +901,39 @@ class Helpers:
                       {filename}
                       </span>
                     </div><li>"""
+                )
             else:
-                if filename != "crafty_managed.txt":
-                    output += f"""<li
+                parts.append(Helpers._tree_file_item(dpath, filename))
+        parts.append("</ul>\n")
+        return "".join(parts)
+
+    @staticmethod
+    def _tree_file_item(dpath, filename):
+        return f"""<li
                     class="d-block tree-ctx-item tree-file tree-item"
                     data-path="{dpath}"
                     data-name="{filename}"
                     onclick="clickOnFile(event)"><span style="margin-right: 6px;">
                     <i class="far fa-file"></i></span>{filename}</li>"""
-        output += "</ul>\n"
-        return output
 
     @staticmethod
     def generate_zip_tree(folder, output=""):
-        file_list = os.listdir(folder)
-        file_list = sorted(file_list, key=str.casefold)
-        output += f"""<ul class="tree-nested d-block" id="{folder}ul">"""
-        for raw_filename in file_list:
-            filename = html.escape(raw_filename)
-            rel = os.path.join(folder, raw_filename)
-            dpath = os.path.join(folder, filename)
-            if os.path.isdir(rel):
-                output += f"""<li class="tree-item" data-path="{dpath}">
-                    \n<div id="{dpath}" data-path="{dpath}" data-name="{filename}" class="tree-caret tree-ctx-item tree-folder">
-                    <input type="radio" name="root_path" value="{dpath}">
-                    <span id="{dpath}span" class="files-tree-title" data-path="{dpath}" data-name="{filename}" onclick="getDirView(event)">
-                      <i style="color: #8862e0;" class="far fa-folder"></i>
-                      <i style="color: #8862e0;" class="far fa-folder-open"></i>
-                      {filename}
-                      </span>
-                    </input></div><li>
-                    \n"""
-        return output
+        return output + Helpers._zip_dir_html(folder, "\n                    \n")
 
     @staticmethod
     def generate_zip_dir(folder, output=""):
-        file_list = os.listdir(folder)
-        file_list = sorted(file_list, key=str.casefold)
-        output += f"""<ul class="tree-nested d-block" id="{folder}ul">"""
-        for raw_filename in file_list:
-            filename = html.escape(raw_filename)
-            rel = os.path.join(folder, raw_filename)
+        return output + Helpers._zip_dir_html(folder, "")
+
+    @staticmethod
+    def _zip_dir_html(folder, item_end):
+        parts = [f"""<ul class="tree-nested d-block" id="{folder}ul">"""]
+        for entry in Helpers.list_tree_entries(folder, hidden=()):
+            if not entry.is_dir:
+                continue
+            filename = html.escape(entry.name)
             dpath = os.path.join(folder, filename)
-            if os.path.isdir(rel):
-                output += f"""<li class="tree-item" data-path="{dpath}">
+            parts.append(
+                f"""<li class="tree-item" data-path="{dpath}">
                     \n<div id="{dpath}" data-path="{dpath}" data-name="{filename}" class="tree-caret tree-ctx-item tree-folder">
                     <input type="radio" name="root_path" value="{dpath}">
                     <span id="{dpath}span" class="files-tree-title" data-path="{dpath}" data-name="{filename}" onclick="getDirView(event)">
@@ -960,8 +941,74 @@ class Helpers:
                       <i style="color: #8862e0;" class="far fa-folder-open"></i>
                       {filename}
                       </span>
-                    </input></div><li>"""
-        return output
+                    </input></div><li>{item_end}"""
+            )
+        return "".join(parts)
+
+    @staticmethod
+    def generate_backup_tree(folder, excluded_dirs, output=""):
+        excluded_dirs = set(excluded_dirs)
+        parts = [output, f"""<ul class="tree-nested d-block" id="{folder}ul">"""]
+        for entry in Helpers.list_tree_entries(folder, hidden=()):
+            filename = html.escape(entry.name)
+            dpath = os.path.join(folder, filename)
+            checked = " checked" if str(dpath) in excluded_dirs else ""
+            if entry.is_dir:
+                parts.append(
+                    f"""<li class="tree-item" data-path="{dpath}">
+                            \n<div id="{dpath}" data-path="{dpath}" data-name="{filename}" class="tree-caret tree-ctx-item tree-folder">
+                            <input type="checkbox" class="checkBoxClass" name="root_path" value="{dpath}"{checked}>
+                            <span id="{dpath}span" class="files-tree-title" data-path="{dpath}" data-name="{filename}" onclick="getDirView(event)">
+                            <i style="color: #8862e0;" class="far fa-folder"></i>
+                            <i style="color: #8862e0;" class="far fa-folder-open"></i>
+                            <strong>{filename}</strong>
+                            </span>
+                            </input></div><li>
+                            \n"""
+                )
+            else:
+                parts.append(
+                    f"""<li
+                        class="d-block tree-ctx-item tree-file"
+                        data-path="{dpath}"
+                        data-name="{filename}"
+                        onclick=""><input type='checkbox' class="checkBoxClass" name='root_path' value="{dpath}"{checked}>
+                        <span style="margin-right: 6px;"><i class="far fa-file">
+                        </i></span></input>{filename}</li>"""
+                )
+        return "".join(parts)
+
+    @staticmethod
+    def generate_backup_dir(folder, excluded_dirs, output=""):
+        excluded_dirs = set(excluded_dirs)
+        parts = [output, f"""<ul class="tree-nested d-block" id="{folder}ul">"""]
+        for entry in Helpers.list_tree_entries(folder, hidden=()):
+            filename = html.escape(entry.name)
+            dpath = os.path.join(folder, filename)
+            checked = " checked" if str(dpath) in excluded_dirs else ""
+            if entry.is_dir:
+                parts.append(
+                    f"""<li class="tree-item" data-path="{dpath}">
+                            \n<div id="{dpath}" data-path="{dpath}" data-name="{filename}" class="tree-caret tree-ctx-item tree-folder">
+                            <input type="checkbox" name="root_path" value="{dpath}"{checked}>
+                            <span id="{dpath}span" class="files-tree-title" data-path="{dpath}" data-name="{filename}" onclick="getDirView(event)">
+                            <i class="far fa-folder"></i>
+                            <i class="far fa-folder-open"></i>
+                            <strong>{filename}</strong>
+                            </span>
+                            </input></div><li>"""
+                )
+            else:
+                parts.append(
+                    f"""<li
+                        class="tree-item tree-nested d-block tree-ctx-item tree-file"
+                        data-path="{dpath}"
+                        data-name="{filename}"
+                        onclick=""><input type='checkbox' name='root_path' value='{dpath}'{checked}>
+                        <span style="margin-right: 6px;"><i class="far fa-file">
+                        </i></span></input>{filename}</li>"""
+                )
+        return "".join(parts)
 
     def unzip_server(self, zip_path, user_id):
         if Helpers.check_file_perms(zip_path):
@@ -983,6 +1030,10 @@ class Helpers:
     @staticmethod
     def unzip_backup_archive(backup_path, zip_name):
         zip_path = os.path.join(backup_path, zip_name)
+        if DedupStore.is_manifest(zip_name) and Helpers.check_file_perms(zip_path):
+            temp_dir = tempfile.mkdtemp()
+            DedupStore.for_path(backup_path).restore(zip_path, temp_dir)
+            return temp_dir
         if Helpers.check_file_perms(zip_path):
             temp_dir = tempfile.mkdtemp()
             with zipfile.ZipFile(zip_path, "r") as zip_ref:
@@ -0,0 +1,116 @@
+import logging
+import re
+import threading
+import typing as t
+
+logger = logging.getLogger(__name__)
+
+# console colour codes and the backspaced characters some servers print
+ANSI_CODES = re.compile("(\033\\[(0;)?[0-9]*[A-z]?(;[0-9])?m?)")
+BACKSPACED = re.compile("[A-z]{2}\b\b")
+
+# (css class, pattern) in order of precedence. The time stamp comes first so
+# the "[12:00:00] [Server thread/INFO]" prefix is coloured as two tags.
+# A css class of None means mc-log-<level>, e.g. "[Server thread/WARN]" and
+# bungee's "[12:00:00 WARN]" are both mc-log-warn.
+BUILTIN_RULES = [
+    ("mc-log-time", r"\[\d\d:\d\d:\d\d\]"),
+    (None, r"\[.+?[/ ](?P<level>INFO|WARN|ERROR|FATAL)\]"),
+    # player names with their address, anchored so words are not rescanned
+    ("mc-log-keyword", r"\b\w+\[/\d+\.\d+\.\d+\.\d+:\d+\]"),
+]
+
+
+class LogHighlighter:
+    """Wraps log levels, time stamps, IPs and user keywords in css spans.
+
+    All rules are compiled into one alternation, so a line is scanned once
+    and text that was already wrapped is never matched again. The pattern is
+    only rebuilt when the keywords change.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keywords: t.Optional[t.Tuple[str, ...]] = None
+        self.pattern: t.Optional[t.Pattern] = None
+        self.css_classes: t.Dict[str, str] = {}
+
+    @staticmethod
+    def strip_console_codes(line: str, replacement: str = "") -> str:
+        line = ANSI_CODES.sub(replacement, line)
+        return BACKSPACED.sub("", line)
+
+    def highlight(self, line: str, keywords: t.Iterable[str]) -> str:
+        pattern, css_classes = self.get_pattern(keywords)
+        return pattern.sub(lambda m: LogHighlighter._wrap(m, css_classes), line)
+
+    def highlight_lines(
+        self, lines: t.Sequence[str], keywords: t.Iterable[str]
+    ) -> t.List[str]:
+        # One pass over the joined text instead of a call per line. Matches
+        # can't cross lines unless a keyword matches a newline, in which case
+        # the lines are coloured one at a time.
+        if not lines:
+            return []
+        pattern, css_classes = self.get_pattern(keywords)
+        crossed_lines = False
+
+        def wrap(match):
+            nonlocal crossed_lines
+            if "\n" in match.group(0):
+                crossed_lines = True
+            return LogHighlighter._wrap(match, css_classes)
+
+        highlighted = pattern.sub(wrap, "\n".join(lines))
+        if crossed_lines:
+            return [self.highlight(line, keywords) for line in lines]
+        return highlighted.split("\n")
+
+    def get_pattern(self, keywords: t.Iterable[str]):
+        keywords = tuple(keywords or ())
+        with self.lock:
+            if keywords != self.keywords:
+                self.pattern, self.css_classes = LogHighlighter._compile(keywords)
+                self.keywords = keywords
+            return self.pattern, self.css_classes
+
+    @staticmethod
+    def _compile(keywords: t.Tuple[str, ...]):
+        rules = list(BUILTIN_RULES)
+        pattern, css_classes = LogHighlighter._join(rules)
+        for keyword in keywords:
+            if not keyword:
+                continue
+            # A keyword can be valid alone and still break the alternation,
+            # e.g. "(?i)foo" or a group name another rule uses, so each one
+            # is tried in the joined pattern and taken literally if it fails
+            for candidate in (keyword, re.escape(keyword)):
+                try:
+                    pattern, css_classes = LogHighlighter._join(
+                        rules + [("mc-log-keyword", candidate)]
+                    )
+                except re.error as e:
+                    logger.warning(f"Highlighting keyword {keyword!r} literally: {e}")
+                    continue
+                rules.append(("mc-log-keyword", candidate))
+                break
+        return pattern, css_classes
+
+    @staticmethod
+    def _join(rules: t.List[t.Tuple[t.Optional[str], str]]):
+        alternatives = []
+        css_classes = {}
+        for i, (css_class, rule) in enumerate(rules):
+            alternatives.append(f"(?P<rule{i}>{rule})")
+            css_classes[f"rule{i}"] = css_class
+        return re.compile("|".join(alternatives), re.IGNORECASE), css_classes
+
+    @staticmethod
+    def _wrap(match: t.Match, css_classes: t.Dict[str, str]) -> str:
+        text = match.group(0)
+        if not text:
+            return ""
+        css_class = css_classes[match.lastgroup]
+        if css_class is None:
+            css_class = f"mc-log-{match.group('level').lower()}"
+        return f'<span class="{css_class}">{text}</span>'
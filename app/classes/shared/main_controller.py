@@ -25,10 +25,12 @@ from app.classes.controllers.roles_controller import RolesController
 from app.classes.controllers.server_perms_controller import ServerPermsController
 from app.classes.controllers.servers_controller import ServersController
 from app.classes.shared.authentication import Authentication
+from app.classes.shared.command_bus import CommandBus
 from app.classes.shared.console import Console
 from app.classes.shared.helpers import Helpers
 from app.classes.shared.file_helpers import FileHelpers
 from app.classes.minecraft.serverjars import ServerJars
+from app.classes.minecraft.stats import Stats
 
 logger = logging.getLogger(__name__)
 
@@ -46,16 +48,17 @@ class Controller:
         )
         self.authentication: Authentication = Authentication(self.helper)
         self.crafty_perms: CraftyPermsController = CraftyPermsController()
-        self.management: ManagementController = ManagementController(
-            self.management_helper
-        )
         self.roles: RolesController = RolesController(
-            self.users_helper, self.roles_helper
+            self.users_helper, self.roles_helper, self.authentication
         )
         self.server_perms: ServerPermsController = ServerPermsController()
         self.servers: ServersController = ServersController(
             self.helper, self.servers_helper, self.management_helper, self.file_helper
         )
+        self.command_bus: CommandBus = CommandBus(self.servers)
+        self.management: ManagementController = ManagementController(
+            self.management_helper, self.command_bus
+        )
         self.users: UsersController = UsersController(
             self.helper, self.users_helper, self.authentication
         )
@@ -920,6 +923,8 @@ class Controller:
                             )
                         )
 
+                Stats.world_sizes.invalidate(server_data["path"])
+
                 # Cleanup scheduled tasks
                 try:
                     HelpersManagement.delete_scheduled_task_by_server(server_id)
@@ -933,9 +938,8 @@ class Controller:
 
             counter += 1
 
-    @staticmethod
-    def clear_unexecuted_commands():
-        HelpersManagement.clear_unexecuted_commands()
+    def clear_unexecuted_commands(self):
+        self.command_bus.clear()
 
     @staticmethod
     def clear_support_status():
@@ -1,7 +1,18 @@
+import threading
 from enum import Enum
 
 
 class PermissionHelper:
+    # bumped by every write to the users, roles or role servers tables, so the
+    # server permissions kept in memory know they have to be read again
+    permissions_version = 0
+    version_lock = threading.Lock()
+
+    @staticmethod
+    def permissions_changed():
+        with PermissionHelper.version_lock:
+            PermissionHelper.permissions_version += 1
+
     @staticmethod
     def both_have_perm(
         permission_mask_a: str, permission_mask_b: str, permission_tested: Enum
@@ -1,4 +1,5 @@
 from contextlib import redirect_stderr
+import codecs
 import os
 import re
 import shutil
@@ -7,24 +8,30 @@ import datetime
 import base64
 import threading
 import logging.config
+import typing as t
 import subprocess
 import html
+from types import MappingProxyType
 
 # TZLocal is set as a hidden import on win pipeline
 from tzlocal import get_localzone
 from tzlocal.utils import ZoneInfoNotFoundError
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.jobstores.base import JobLookupError
 
-from app.classes.minecraft.stats import Stats
+from app.classes.minecraft.stats import Stats, ProcessStatsSampler
 from app.classes.minecraft.mc_ping import ping, ping_bedrock
 from app.classes.models.servers import HelperServers, Servers
 from app.classes.models.server_stats import HelperServerStats
 from app.classes.models.management import HelpersManagement
 from app.classes.models.users import HelperUsers
 from app.classes.models.server_permissions import PermissionsServers
+from app.classes.shared.backup_engine import BackupEngine
+from app.classes.shared.backup_progress import BackupProgress
+from app.classes.shared.backup_store import DedupStore
 from app.classes.shared.console import Console
 from app.classes.shared.helpers import Helpers
+from app.classes.shared.log_highlighter import LogHighlighter
+from app.classes.shared.terminal_history import TerminalHistory
 from app.classes.shared.file_helpers import FileHelpers
 from app.classes.shared.null_writer import NullWriter
 
@@ -36,7 +43,11 @@ logger = logging.getLogger(__name__)
 
 
 class ServerOutBuf:
-    lines = {}
+    lines: t.Dict[str, TerminalHistory] = {}
+    # Number of bytes requested from the server's stdout pipe per read
+    read_size = 64 * 1024
+    # Scrollbacks at least this long are kept as bytes
+    compact_history_lines = 2000
 
     def __init__(self, helper, proc, server_id):
         self.helper = helper
@@ -45,53 +56,57 @@ class ServerOutBuf:
         # Buffers text for virtual_terminal_lines config number of lines
         self.max_lines = self.helper.get_setting("virtual_terminal_lines")
         self.line_buffer = ""
-        ServerOutBuf.lines[self.server_id] = []
-        self.lsi = 0
-
-    def process_byte(self, char):
-        if char == os.linesep[self.lsi]:
-            self.lsi += 1
-        else:
-            self.lsi = 0
-            self.line_buffer += char
+        # Keeps multi-byte characters intact when they are split across reads
+        self.decoder = codecs.getincrementaldecoder("utf-8")("ignore")
+        # sequence numbers carry on across restarts, so cursors held by
+        # connected browsers stay valid
+        previous = ServerOutBuf.lines.get(self.server_id)
+        ServerOutBuf.lines[self.server_id] = TerminalHistory(
+            self.max_lines,
+            self.max_lines >= self.compact_history_lines,
+            previous.next_seq if previous else 0,
+        )
 
-        if self.lsi >= len(os.linesep):
-            self.lsi = 0
-            ServerOutBuf.lines[self.server_id].append(self.line_buffer)
+    def process_chunk(self, text):
+        if not text:
+            return
+        *new_lines, self.line_buffer = (self.line_buffer + text).split("\n")
+        for new_line in new_lines:
+            self.process_line(new_line.rstrip("\r"))
 
-            self.new_line_handler(self.line_buffer)
-            self.line_buffer = ""
-            # Limit list length to self.max_lines:
-            if len(ServerOutBuf.lines[self.server_id]) > self.max_lines:
-                ServerOutBuf.lines[self.server_id].pop(0)
+    def process_line(self, new_line):
+        seq = ServerOutBuf.lines[self.server_id].append(new_line)
+        self.new_line_handler(new_line, seq)
 
     def check(self):
         while True:
-            if self.proc.poll() is None:
-                char = self.proc.stdout.read(1).decode("utf-8", "ignore")
-                # TODO: we may want to benchmark reading in blocks and userspace
-                # processing it later, reads are kind of expensive as a syscall
-                self.process_byte(char)
-            else:
-                flush = self.proc.stdout.read().decode("utf-8", "ignore")
-                for char in flush:
-                    self.process_byte(char)
+            # read1 returns whatever is already buffered in the pipe (up to
+            # read_size) instead of waiting for a full block, so lines are
+            # still delivered as soon as the server prints them
+            chunk = self.proc.stdout.read1(self.read_size)
+            if not chunk:
                 break
+            self.process_chunk(self.decoder.decode(chunk))
 
-    def new_line_handler(self, new_line):
-        new_line = re.sub("(\033\\[(0;)?[0-9]*[A-z]?(;[0-9])?m?)", " ", new_line)
-        new_line = re.sub("[A-z]{2}\b\b", "", new_line)
-        highlighted = self.helper.log_colors(html.escape(new_line))
+        self.process_chunk(self.decoder.decode(b"", final=True))
+        # the server exited without terminating its last line
+        if self.line_buffer:
+            self.process_line(self.line_buffer.rstrip("\r"))
+            self.line_buffer = ""
 
-        logger.debug("Broadcasting new virtual terminal line")
+    def new_line_handler(self, new_line, seq=None):
+        # Nobody is connected, so there is no one to highlight the line for
+        if len(self.helper.websocket_helper.clients) == 0:
+            return
+
+        new_line = LogHighlighter.strip_console_codes(new_line, " ")
+        highlighted = self.helper.log_colors(html.escape(new_line))
 
         # TODO: Do not send data to clients who do not have permission to view
         # this server's console
-        self.helper.websocket_helper.broadcast_page_params(
-            "/panel/server_detail",
-            {"id": self.server_id},
-            "vterm_new_line",
-            {"line": highlighted + "<br />"},
+        # Lines are coalesced into one frame per interval by the websocket helper
+        self.helper.websocket_helper.broadcast_vterm_line(
+            self.server_id, highlighted + "<br />", seq
         )
 
 
@@ -105,6 +120,9 @@ class ServerInstance:
     management_helper: HelpersManagement
     stats: Stats
     stats_helper: HelperServerStats
+    # seconds a live backup waits for the server to confirm "save-all flush"
+    live_backup_save_timeout = 120
+    save_complete = re.compile(r"Saved the (game|world)", re.IGNORECASE)
 
     def __init__(self, server_id, helper, management_helper, stats, file_helper):
         self.helper = helper
@@ -125,6 +143,7 @@ class ServerInstance:
         self.is_crashed = False
         self.restart_count = 0
         self.stats = stats
+        self.process_sampler = ProcessStatsSampler()
         self.server_object = HelperServers.get_server_obj(self.server_id)
         self.stats_helper = HelperServerStats(self.server_id)
         self.last_backup_failed = False
@@ -141,6 +160,7 @@ class ServerInstance:
             target=self.a_backup_server, daemon=True, name=f"backup_{self.name}"
         )
         self.is_backingup = False
+        self.backup_progress = BackupProgress()
         # Reset crash and update at initialization
         self.stats_helper.server_crash_reset()
         self.stats_helper.set_update(False)
@@ -175,6 +195,8 @@ class ServerInstance:
 
         self.stats_helper.init_database(server_id)
         self.record_server_stats()
+        # the rest of the setup reads this row back, so it can't wait
+        self.stats_helper.flush_server_stats()
 
         # build our server run command
 
@@ -210,25 +232,8 @@ class ServerInstance:
             name=f"{self.server_id}_server_thread",
         )
         self.server_thread.start()
-
-        # Register an shedule for polling server stats when running
-        logger.info(f"Polling server statistics {self.name} every {5} seconds")
-        Console.info(f"Polling server statistics {self.name} every {5} seconds")
-        try:
-            self.server_scheduler.add_job(
-                self.realtime_stats,
-                "interval",
-                seconds=5,
-                id="stats_" + str(self.server_id),
-            )
-        except:
-            self.server_scheduler.remove_job("stats_" + str(self.server_id))
-            self.server_scheduler.add_job(
-                self.realtime_stats,
-                "interval",
-                seconds=5,
-                id="stats_" + str(self.server_id),
-            )
+        # realtime stats are polled for every running server by
+        # ServersController.collect_servers_stats
 
     def setup_server_run_command(self):
         # configure the server
@@ -633,14 +638,6 @@ class ServerInstance:
         self.cleanup_server_object()
         server_users = PermissionsServers.get_server_user_list(self.server_id)
 
-        try:
-            # remove the stats polling job since server is stopped
-            self.server_scheduler.remove_job("stats_" + str(self.server_id))
-        except JobLookupError as e:
-            logger.error(
-                f"Could not remove job with id stats_{self.server_id} due"
-                + f" to error: {e}"
-            )
         self.record_server_stats()
 
         for user in server_users:
@@ -688,8 +685,6 @@ class ServerInstance:
 
         # clear the old scheduled watcher task
         self.server_scheduler.remove_job(f"c_{self.server_id}")
-        # remove the stats polling job since server is stopped
-        self.server_scheduler.remove_job("stats_" + str(self.server_id))
 
         # the server crashed, or isn't found - so let's reset things.
         logger.warning(
@@ -731,13 +726,6 @@ class ServerInstance:
             proc.kill()
         # kill the main process we are after
         logger.info("Sending SIGKILL to parent")
-        try:
-            self.server_scheduler.remove_job("stats_" + str(self.server_id))
-        except JobLookupError as e:
-            logger.error(
-                f"Could not remove job with id stats_{self.server_id} due"
-                + f" to error: {e}"
-            )
         self.process.kill()
 
     def get_start_time(self):
@@ -764,7 +752,6 @@ class ServerInstance:
             )
             # cancel the watcher task
             self.server_scheduler.remove_job("c_" + str(self.server_id))
-            self.server_scheduler.remove_job("stats_" + str(self.server_id))
             return
 
         self.stats_helper.sever_crashed()
@@ -848,6 +835,7 @@ class ServerInstance:
                 {"percent": 0, "total_files": 0},
             )
         was_server_running = None
+        self.backup_progress.begin(BackupProgress.PREPARING)
         logger.info(f"Starting server {self.name} (ID {self.server_id}) backup")
         server_users = PermissionsServers.get_server_user_list(self.server_id)
         for user in server_users:
@@ -882,27 +870,65 @@ class ServerInstance:
             )
             excluded_dirs = HelpersManagement.get_excluded_backup_dirs(self.server_id)
             server_dir = Helpers.get_os_understandable_path(self.settings["path"])
-            if conf["compress"]:
-                logger.debug(
-                    "Found compress backup to be true. Calling compressed archive"
+            snapshot_dir = None
+            if (
+                conf["live"]
+                and self.check_running()
+                and self.settings["type"] == "minecraft-java"
+            ):
+                logger.debug("Found live backup to be true. Snapshotting the server")
+                snapshot_dir = os.path.join(
+                    Helpers.get_os_understandable_path(self.settings["backup_path"]),
+                    FileHelpers.live_snapshot_dir,
                 )
-                self.file_helper.make_compressed_backup(
-                    Helpers.get_os_understandable_path(backup_filename),
-                    server_dir,
-                    excluded_dirs,
-                    self.server_id,
+                entries, dir_bytes = self.take_live_snapshot(
+                    server_dir, excluded_dirs, snapshot_dir
                 )
             else:
-                logger.debug(
-                    "Found compress backup to be false. Calling NON-compressed archive"
-                )
-                self.file_helper.make_backup(
-                    Helpers.get_os_understandable_path(backup_filename),
-                    server_dir,
-                    excluded_dirs,
-                    self.server_id,
-                )
+                entries, dir_bytes = BackupEngine.scan(server_dir, excluded_dirs)
+            try:
+                if conf["incremental"]:
+                    logger.debug(
+                        "Found incremental backup to be true. Writing a manifest"
+                    )
+                    self.file_helper.write_incremental_backup(
+                        Helpers.get_os_understandable_path(backup_filename),
+                        entries,
+                        dir_bytes,
+                        self.server_id,
+                        conf["compress"],
+                        self.backup_progress,
+                    )
+                elif conf["compress"]:
+                    logger.debug(
+                        "Found compress backup to be true. Calling compressed archive"
+                    )
+                    self.file_helper.write_backup(
+                        Helpers.get_os_understandable_path(backup_filename),
+                        entries,
+                        dir_bytes,
+                        self.server_id,
+                        True,
+                        self.backup_progress,
+                    )
+                else:
+                    logger.debug(
+                        "Found compress backup to be false. "
+                        "Calling NON-compressed archive"
+                    )
+                    self.file_helper.write_backup(
+                        Helpers.get_os_understandable_path(backup_filename),
+                        entries,
+                        dir_bytes,
+                        self.server_id,
+                        False,
+                        self.backup_progress,
+                    )
+            finally:
+                if snapshot_dir is not None:
+                    shutil.rmtree(snapshot_dir, ignore_errors=True)
 
+            removed_snapshot = False
             while (
                 len(self.list_backups()) > conf["max_backups"]
                 and conf["max_backups"] > 0
@@ -912,17 +938,18 @@ class ServerInstance:
                 oldfile_path = f"{conf['backup_path']}/{oldfile['path']}"
                 logger.info(f"Removing old backup '{oldfile['path']}'")
                 os.remove(Helpers.get_os_understandable_path(oldfile_path))
+                if DedupStore.is_manifest(oldfile["path"]):
+                    removed_snapshot = True
+            if removed_snapshot:
+                # drop the chunks only the removed snapshots used
+                DedupStore.for_path(
+                    Helpers.get_os_understandable_path(conf["backup_path"])
+                ).collect_garbage()
 
             self.is_backingup = False
             logger.info(f"Backup of server: {self.name} completed")
-            results = {"percent": 100, "total_files": 0, "current_file": 0}
-            if len(self.helper.websocket_helper.clients) > 0:
-                self.helper.websocket_helper.broadcast_page_params(
-                    "/panel/server_detail",
-                    {"id": str(self.server_id)},
-                    "backup_status",
-                    results,
-                )
+            self.backup_progress.finish()
+            self.broadcast_backup_status()
             server_users = PermissionsServers.get_server_user_list(self.server_id)
             for user in server_users:
                 self.helper.websocket_helper.broadcast_user(
@@ -945,14 +972,8 @@ class ServerInstance:
             logger.exception(
                 f"Failed to create backup of server {self.name} (ID {self.server_id})"
             )
-            results = {"percent": 100, "total_files": 0, "current_file": 0}
-            if len(self.helper.websocket_helper.clients) > 0:
-                self.helper.websocket_helper.broadcast_page_params(
-                    "/panel/server_detail",
-                    {"id": str(self.server_id)},
-                    "backup_status",
-                    results,
-                )
+            self.backup_progress.finish(failed=True)
+            self.broadcast_backup_status()
             self.is_backingup = False
             if was_server_running:
                 logger.info(
@@ -961,25 +982,48 @@ class ServerInstance:
                 self.run_threaded_server(HelperUsers.get_user_id_by_name("system"))
             self.last_backup_failed = True
 
-    def backup_status(self, source_path, dest_path):
-        results = Helpers.calc_percent(source_path, dest_path)
-        self.backup_stats = results
+    def take_live_snapshot(self, server_dir, excluded_dirs, snapshot_dir):
+        # Turn off autosave and flush the world so the files stop changing,
+        # copy them, and let the server save again. The archive is then built
+        # from the copy while players keep playing.
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        history = ServerOutBuf.lines.get(str(self.server_id))
+        self.send_command("save-off")
+        try:
+            seq = history.next_seq if history is not None else 0
+            self.send_command("save-all flush")
+            if (
+                history is None
+                or history.wait_for_line(
+                    self.save_complete, seq, self.live_backup_save_timeout
+                )
+                is None
+            ):
+                logger.warning(
+                    f"Server {self.name} did not confirm the world was saved, "
+                    f"backing up the files as they are"
+                )
+            entries, dir_bytes = BackupEngine.scan(server_dir, excluded_dirs)
+            entries = FileHelpers.snapshot_files(entries, snapshot_dir)
+        finally:
+            self.send_command("save-on")
+        logger.info(f"Took a live snapshot of {len(entries)} files of {self.name}")
+        return entries, dir_bytes
+
+    def broadcast_backup_status(self):
         if len(self.helper.websocket_helper.clients) > 0:
             self.helper.websocket_helper.broadcast_page_params(
                 "/panel/server_detail",
                 {"id": str(self.server_id)},
                 "backup_status",
-                results,
+                self.backup_progress.get_status(),
             )
 
     def last_backup_status(self):
         return self.last_backup_failed
 
     def send_backup_status(self):
-        try:
-            return self.backup_stats
-        except:
-            return {"percent": 0, "total_files": 0}
+        return self.backup_progress.get_status()
 
     def list_backups(self):
         if not self.settings["backup_path"]:
@@ -992,10 +1036,24 @@ class ServerInstance:
         ):
             return []
         files = Helpers.get_human_readable_files_sizes(
-            Helpers.list_dir_by_date(
-                Helpers.get_os_understandable_path(self.settings["backup_path"])
-            )
+            [
+                path
+                for path in Helpers.list_dir_by_date(
+                    Helpers.get_os_understandable_path(self.settings["backup_path"])
+                )
+                if os.path.basename(path)
+                not in (DedupStore.store_dir, FileHelpers.live_snapshot_dir)
+            ]
         )
+        for f in files:
+            # a snapshot's manifest is tiny, show the size of what it restores
+            if DedupStore.is_manifest(f["path"]):
+                try:
+                    f["size"] = Helpers.human_readable_file_size(
+                        DedupStore.read_header(f["path"])["total_bytes"]
+                    )
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Could not read backup {f['path']}: {e}")
         return [
             {
                 "path": os.path.relpath(
@@ -1152,164 +1210,66 @@ class ServerInstance:
     #                               Minecraft Servers Statistics
     # **********************************************************************************
 
-    def realtime_stats(self):
-        total_players = 0
-        max_players = 0
-        servers_ping = []
-        raw_ping_result = []
-        raw_ping_result = self.get_raw_server_stats(self.server_id)
-
-        if f"{raw_ping_result.get('icon')}" == "b''":
-            raw_ping_result["icon"] = False
-
-        servers_ping.append(
-            {
-                "id": raw_ping_result.get("id"),
-                "started": raw_ping_result.get("started"),
-                "running": raw_ping_result.get("running"),
-                "cpu": raw_ping_result.get("cpu"),
-                "mem": raw_ping_result.get("mem"),
-                "mem_percent": raw_ping_result.get("mem_percent"),
-                "world_name": raw_ping_result.get("world_name"),
-                "world_size": raw_ping_result.get("world_size"),
-                "server_port": raw_ping_result.get("server_port"),
-                "int_ping_results": raw_ping_result.get("int_ping_results"),
-                "online": raw_ping_result.get("online"),
-                "max": raw_ping_result.get("max"),
-                "players": raw_ping_result.get("players"),
-                "desc": raw_ping_result.get("desc"),
-                "version": raw_ping_result.get("version"),
-                "icon": raw_ping_result.get("icon"),
-                "crashed": self.is_crashed,
-            }
-        )
+    def realtime_stats(self, int_mc_ping=None):
+        stats_snapshot = self.collect_stats_snapshot(int_mc_ping)
+
+        icon = stats_snapshot.get("icon")
+        if f"{icon}" == "b''":
+            icon = False
+
+        server_status = {
+            "id": stats_snapshot.get("id"),
+            "started": stats_snapshot.get("started"),
+            "running": stats_snapshot.get("running"),
+            "cpu": stats_snapshot.get("cpu"),
+            "mem": stats_snapshot.get("mem"),
+            "mem_percent": stats_snapshot.get("mem_percent"),
+            "world_name": stats_snapshot.get("world_name"),
+            "world_size": stats_snapshot.get("world_size"),
+            "server_port": stats_snapshot.get("server_port"),
+            "int_ping_results": stats_snapshot.get("int_ping_results"),
+            "online": stats_snapshot.get("online"),
+            "max": stats_snapshot.get("max"),
+            "players": stats_snapshot.get("players"),
+            "desc": stats_snapshot.get("desc"),
+            "version": stats_snapshot.get("version"),
+            "icon": icon,
+            "crashed": self.is_crashed,
+        }
         if len(self.helper.websocket_helper.clients) > 0:
             self.helper.websocket_helper.broadcast_page_params(
                 "/panel/server_detail",
                 {"id": str(self.server_id)},
                 "update_server_details",
-                {
-                    "id": raw_ping_result.get("id"),
-                    "started": raw_ping_result.get("started"),
-                    "running": raw_ping_result.get("running"),
-                    "cpu": raw_ping_result.get("cpu"),
-                    "mem": raw_ping_result.get("mem"),
-                    "mem_percent": raw_ping_result.get("mem_percent"),
-                    "world_name": raw_ping_result.get("world_name"),
-                    "world_size": raw_ping_result.get("world_size"),
-                    "server_port": raw_ping_result.get("server_port"),
-                    "int_ping_results": raw_ping_result.get("int_ping_results"),
-                    "online": raw_ping_result.get("online"),
-                    "max": raw_ping_result.get("max"),
-                    "players": raw_ping_result.get("players"),
-                    "desc": raw_ping_result.get("desc"),
-                    "version": raw_ping_result.get("version"),
-                    "icon": raw_ping_result.get("icon"),
-                    "crashed": self.is_crashed,
-                },
+                server_status,
             )
-        total_players += int(raw_ping_result.get("online"))
-        max_players += int(raw_ping_result.get("max"))
 
-        self.record_server_stats()
+        self.record_server_stats(stats_snapshot)
 
-        if (len(servers_ping) > 0) & (len(self.helper.websocket_helper.clients) > 0):
+        if len(self.helper.websocket_helper.clients) > 0:
             try:
                 self.helper.websocket_helper.broadcast_page(
-                    "/panel/dashboard", "update_server_status", servers_ping
+                    "/panel/dashboard", "update_server_status", [server_status]
                 )
                 self.helper.websocket_helper.broadcast_page(
-                    "/status", "update_server_status", servers_ping
+                    "/status", "update_server_status", [server_status]
                 )
             except:
                 Console.critical("Can't broadcast server status to websocket")
 
-    def get_servers_stats(self):
-
-        server_stats = {}
-
-        logger.info("Getting Stats for Server " + self.name + " ...")
-
-        server_id = self.server_id
-        server = HelperServers.get_server_data_by_id(server_id)
-
-        logger.debug(f"Getting stats for server: {server_id}")
-
-        # get our server object, settings and data dictionaries
-        self.reload_server_settings()
-
-        # world data
-        server_path = server["path"]
-
-        # process stats
-        p_stats = Stats._try_get_process_stats(self.process, self.check_running())
-
-        internal_ip = server["server_ip"]
-        server_port = server["server_port"]
-        server_name = server.get("server_name", f"ID#{server_id}")
-
-        logger.debug(f"Pinging server '{server}' on {internal_ip}:{server_port}")
-        if HelperServers.get_server_type_by_id(server_id) == "minecraft-bedrock":
-            int_mc_ping = ping_bedrock(internal_ip, int(server_port))
-        else:
-            try:
-                int_mc_ping = ping(internal_ip, int(server_port))
-            except:
-                int_mc_ping = False
-
-        int_data = False
-        ping_data = {}
-
-        # if we got a good ping return, let's parse it
-        if int_mc_ping:
-            int_data = True
-            if (
-                HelperServers.get_server_type_by_id(server["server_id"])
-                == "minecraft-bedrock"
-            ):
-                ping_data = Stats.parse_server_raknet_ping(int_mc_ping)
-            else:
-                ping_data = Stats.parse_server_ping(int_mc_ping)
-        # Makes sure we only show stats when a server is online
-        # otherwise people have gotten confused.
-        if self.check_running():
-            server_stats = {
-                "id": server_id,
-                "started": self.get_start_time(),
-                "running": self.check_running(),
-                "cpu": p_stats.get("cpu_usage", 0),
-                "mem": p_stats.get("memory_usage", 0),
-                "mem_percent": p_stats.get("mem_percentage", 0),
-                "world_name": server_name,
-                "world_size": Stats.get_world_size(server_path),
-                "server_port": server_port,
-                "int_ping_results": int_data,
-                "online": ping_data.get("online", False),
-                "max": ping_data.get("max", False),
-                "players": ping_data.get("players", False),
-                "desc": ping_data.get("server_description", False),
-                "version": ping_data.get("server_version", False),
-            }
-        else:
-            server_stats = {
-                "id": server_id,
-                "started": self.get_start_time(),
-                "running": self.check_running(),
-                "cpu": p_stats.get("cpu_usage", 0),
-                "mem": p_stats.get("memory_usage", 0),
-                "mem_percent": p_stats.get("mem_percentage", 0),
-                "world_name": server_name,
-                "world_size": Stats.get_world_size(server_path),
-                "server_port": server_port,
-                "int_ping_results": int_data,
-                "online": False,
-                "max": False,
-                "players": False,
-                "desc": False,
-                "version": False,
-            }
-
-        return server_stats
+    def collect_stats_snapshot(self, int_mc_ping=None):
+        # Pings the server, samples the process and sizes the world once.
+        # The read-only result is shared by the websocket broadcast and the
+        # stats database so neither has to probe the server again.
+        return MappingProxyType(self.get_raw_server_stats(self.server_id, int_mc_ping))
+
+    def get_ping_target(self):
+        # (ip, port, is_bedrock) as expected by mc_ping.ping_many
+        return (
+            self.settings["server_ip"],
+            int(self.settings["server_port"]),
+            self.settings["type"] == "minecraft-bedrock",
+        )
 
     def get_server_players(self):
 
@@ -1332,7 +1292,7 @@ class ServerInstance:
                 return ping_data["players"]
         return []
 
-    def get_raw_server_stats(self, server_id):
+    def get_raw_server_stats(self, server_id, int_mc_ping=None):
 
         try:
             server = HelperServers.get_server_obj(server_id)
@@ -1357,7 +1317,6 @@ class ServerInstance:
             }
 
         server_stats = {}
-        server = HelperServers.get_server_obj(server_id)
         if not server:
             return {}
         server_dt = HelperServers.get_server_data_by_id(server_id)
@@ -1372,16 +1331,23 @@ class ServerInstance:
         server_path = server_dt["path"]
 
         # process stats
-        p_stats = Stats._try_get_process_stats(self.process, self.check_running())
+        p_stats = Stats._try_get_process_stats(
+            self.process, self.check_running(), self.process_sampler
+        )
 
         internal_ip = server_dt["server_ip"]
         server_port = server_dt["server_port"]
 
-        logger.debug(f"Pinging server '{self.name}' on {internal_ip}:{server_port}")
-        if HelperServers.get_server_type_by_id(server_id) == "minecraft-bedrock":
-            int_mc_ping = ping_bedrock(internal_ip, int(server_port))
-        else:
-            int_mc_ping = ping(internal_ip, int(server_port))
+        # the stats collector pings all servers at once and passes the result in
+        if int_mc_ping is None:
+            logger.debug(f"Pinging server '{self.name}' on {internal_ip}:{server_port}")
+            if HelperServers.get_server_type_by_id(server_id) == "minecraft-bedrock":
+                int_mc_ping = ping_bedrock(internal_ip, int(server_port))
+            else:
+                try:
+                    int_mc_ping = ping(internal_ip, int(server_port))
+                except:
+                    int_mc_ping = False
 
         int_data = False
         ping_data = {}
@@ -1481,14 +1447,7 @@ class ServerInstance:
 
         return server_stats
 
-    def record_server_stats(self):
-
-        server_stats = self.get_servers_stats()
+    def record_server_stats(self, server_stats=None):
+        if server_stats is None:
+            server_stats = self.collect_stats_snapshot()
         self.stats_helper.insert_server_stats(server_stats)
-
-        # delete old data
-        max_age = self.helper.get_setting("history_max_age")
-        now = datetime.datetime.now()
-        minimum_to_exist = now - datetime.timedelta(days=max_age)
-
-        self.stats_helper.remove_old_stats(minimum_to_exist)
@@ -0,0 +1,110 @@
+import copy
+import json
+import logging
+import os
+import threading
+import typing as t
+
+logger = logging.getLogger(__name__)
+
+
+class SettingsDict(t.TypedDict, total=False):
+    http_port: int
+    https_port: int
+    language: str
+    cookie_expire: int
+    cookie_secret: str
+    apikey_secret: str
+    show_errors: bool
+    history_max_age: int
+    stats_update_frequency: int
+    delete_default_json: bool
+    show_contribute_link: bool
+    virtual_terminal_lines: int
+    max_log_lines: int
+    max_audit_entries: int
+    disabled_language_files: t.List[str]
+    stream_size_GB: int
+    keywords: t.List[str]
+    allow_nsfw_profile_pictures: bool
+    enable_user_self_delete: bool
+
+
+class SettingsStore:
+    """The contents of a settings file, kept in memory.
+
+    The file is read again only after set_setting or when its modification
+    time or size changes, so reading a setting costs a stat instead of a
+    json.load.
+    """
+
+    stores: t.Dict[str, "SettingsStore"] = {}
+    stores_lock = threading.Lock()
+
+    def __init__(self, settings_file: str):
+        self.settings_file = settings_file
+        self.lock = threading.Lock()
+        self.data: t.Optional[SettingsDict] = None
+        self.file_stamp = None
+        self.disk_reads = 0
+        self.disk_reads_saved = 0
+
+    @staticmethod
+    def for_file(settings_file: str) -> "SettingsStore":
+        # every Helpers instance pointing at the same file shares one store
+        with SettingsStore.stores_lock:
+            store = SettingsStore.stores.get(settings_file)
+            if store is None:
+                store = SettingsStore.stores[settings_file] = SettingsStore(
+                    settings_file
+                )
+            return store
+
+    def get(self, key: str):
+        with self.lock:
+            data = self._get_data()
+        if key not in data:
+            raise KeyError(key)
+        value = data[key]
+        # callers must not be able to change the cached copy
+        if isinstance(value, (list, dict)):
+            return copy.deepcopy(value)
+        return value
+
+    def set(self, key: str, new_value) -> bool:
+        with self.lock:
+            data = copy.deepcopy(self._get_data())
+            if key not in data:
+                return False
+            data[key] = new_value
+            with open(self.settings_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            self.data = data
+            self.file_stamp = self._get_file_stamp()
+            return True
+
+    def get_read_stats(self) -> t.Dict[str, int]:
+        with self.lock:
+            return {
+                "disk_reads": self.disk_reads,
+                "disk_reads_saved": self.disk_reads_saved,
+            }
+
+    def _get_data(self) -> SettingsDict:
+        file_stamp = self._get_file_stamp()
+        if self.data is not None and file_stamp == self.file_stamp:
+            self.disk_reads_saved += 1
+            return self.data
+
+        with open(self.settings_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.disk_reads += 1
+        if self.data is not None:
+            logger.info(f"Reloaded {self.settings_file} after it changed on disk")
+        self.data = data
+        self.file_stamp = file_stamp
+        return data
+
+    def _get_file_stamp(self):
+        stat = os.stat(self.settings_file)
+        return stat.st_mtime_ns, stat.st_size
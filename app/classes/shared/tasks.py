@@ -2,7 +2,6 @@ import os
 import time
 import logging
 import threading
-import asyncio
 import datetime
 
 from tzlocal import get_localzone
@@ -39,6 +38,10 @@ scheduler_intervals = {
 
 class TasksManager:
     controller: Controller
+    # seconds between writes of the buffered server stats
+    stats_flush_interval = 30
+    # minutes between moves of old audit log entries to the archive
+    audit_prune_interval = 10
 
     def __init__(self, helper, controller):
         self.helper: Helpers = helper
@@ -69,13 +72,8 @@ class TasksManager:
             target=self.log_watcher, daemon=True, name="log_watcher"
         )
 
-        self.command_thread = threading.Thread(
-            target=self.command_watcher, daemon=True, name="command_watcher"
-        )
-
-        self.realtime_thread = threading.Thread(
-            target=self.realtime, daemon=True, name="realtime"
-        )
+        # the dashboards get each host sample as soon as it is taken
+        self.controller.servers.stats.subscribe_host_stats(self.broadcast_host_stats)
 
         self.reload_schedule_from_db()
 
@@ -88,62 +86,11 @@ class TasksManager:
         for item in jobs:
             logger.info(f"JOB: {item}")
 
-    def command_watcher(self):
-        while True:
-            # select any commands waiting to be processed
-            commands = HelpersManagement.get_unactioned_commands()
-            for cmd in commands:
-                try:
-                    svr = self.controller.servers.get_server_instance_by_id(
-                        cmd.server_id.server_id
-                    )
-                except:
-                    logger.error(
-                        "Server value requested does not exist! "
-                        "Purging item from waiting commands."
-                    )
-                    HelpersManagement.mark_command_complete(cmd.command_id)
-                    continue
-
-                user_id = cmd.user_id
-                command = cmd.command
-
-                if command == "start_server":
-                    svr.run_threaded_server(user_id)
-
-                elif command == "stop_server":
-                    svr.stop_threaded_server()
-
-                elif command == "restart_server":
-                    svr.restart_threaded_server(user_id)
-
-                elif command == "kill_server":
-                    try:
-                        svr.kill()
-                        time.sleep(5)
-                        svr.cleanup_server_object()
-                        svr.record_server_stats()
-                    except Exception as e:
-                        logger.error(
-                            f"Could not find PID for requested termsig. Full error: {e}"
-                        )
-
-                elif command == "backup_server":
-                    svr.backup_server()
-
-                elif command == "update_executable":
-                    svr.jar_update()
-                else:
-                    svr.send_command(command)
-
-                HelpersManagement.mark_command_complete(cmd.command_id)
-
-            time.sleep(1)
-
     def _main_graceful_exit(self):
         try:
             os.remove(self.helper.session_file)
             self.controller.servers.stop_all_servers()
+            self.controller.servers.flush_servers_stats()
         except:
             logger.info("Caught error during shutdown", exc_info=True)
         try:
@@ -179,15 +126,12 @@ class TasksManager:
         logger.info("Launching Scheduler Thread...")
         Console.info("Launching Scheduler Thread...")
         self.schedule_thread.start()
-        logger.info("Launching command thread...")
-        Console.info("Launching command thread...")
-        self.command_thread.start()
+        logger.info("Launching command bus...")
+        Console.info("Launching command bus...")
+        self.controller.command_bus.start()
         logger.info("Launching log watcher...")
         Console.info("Launching log watcher...")
         self.log_watcher_thread.start()
-        logger.info("Launching realtime thread...")
-        Console.info("Launching realtime thread...")
-        self.realtime_thread.start()
 
     def scheduler_thread(self):
         schedules = HelpersManagement.get_schedules_enabled()
@@ -202,7 +146,7 @@ class TasksManager:
                 if schedule.cron_string != "":
                     try:
                         self.scheduler.add_job(
-                            HelpersManagement.add_command,
+                            self.controller.command_bus.add_command,
                             CronTrigger.from_crontab(
                                 schedule.cron_string, timezone=str(self.tz)
                             ),
@@ -226,7 +170,7 @@ class TasksManager:
                 else:
                     if schedule.interval_type == "hours":
                         self.scheduler.add_job(
-                            HelpersManagement.add_command,
+                            self.controller.command_bus.add_command,
                             "cron",
                             minute=0,
                             hour="*/" + str(schedule.interval),
@@ -240,7 +184,7 @@ class TasksManager:
                         )
                     elif schedule.interval_type == "minutes":
                         self.scheduler.add_job(
-                            HelpersManagement.add_command,
+                            self.controller.command_bus.add_command,
                             "cron",
                             minute="*/" + str(schedule.interval),
                             id=str(schedule.schedule_id),
@@ -254,7 +198,7 @@ class TasksManager:
                     elif schedule.interval_type == "days":
                         curr_time = schedule.start_time.split(":")
                         self.scheduler.add_job(
-                            HelpersManagement.add_command,
+                            self.controller.command_bus.add_command,
                             "cron",
                             day="*/" + str(schedule.interval),
                             hour=curr_time[0],
@@ -299,7 +243,7 @@ class TasksManager:
             if job_data["cron_string"] != "":
                 try:
                     self.scheduler.add_job(
-                        HelpersManagement.add_command,
+                        self.controller.command_bus.add_command,
                         CronTrigger.from_crontab(
                             job_data["cron_string"], timezone=str(self.tz)
                         ),
@@ -321,7 +265,7 @@ class TasksManager:
             else:
                 if job_data["interval_type"] == "hours":
                     self.scheduler.add_job(
-                        HelpersManagement.add_command,
+                        self.controller.command_bus.add_command,
                         "cron",
                         minute=0,
                         hour="*/" + str(job_data["interval"]),
@@ -335,7 +279,7 @@ class TasksManager:
                     )
                 elif job_data["interval_type"] == "minutes":
                     self.scheduler.add_job(
-                        HelpersManagement.add_command,
+                        self.controller.command_bus.add_command,
                         "cron",
                         minute="*/" + str(job_data["interval"]),
                         id=str(sch_id),
@@ -349,7 +293,7 @@ class TasksManager:
                 elif job_data["interval_type"] == "days":
                     curr_time = job_data["start_time"].split(":")
                     self.scheduler.add_job(
-                        HelpersManagement.add_command,
+                        self.controller.command_bus.add_command,
                         "cron",
                         day="*/" + str(job_data["interval"]),
                         hour=curr_time[0],
@@ -419,7 +363,7 @@ class TasksManager:
             if job_data["cron_string"] != "":
                 try:
                     self.scheduler.add_job(
-                        HelpersManagement.add_command,
+                        self.controller.command_bus.add_command,
                         CronTrigger.from_crontab(
                             job_data["cron_string"], timezone=str(self.tz)
                         ),
@@ -438,7 +382,7 @@ class TasksManager:
             else:
                 if job_data["interval_type"] == "hours":
                     self.scheduler.add_job(
-                        HelpersManagement.add_command,
+                        self.controller.command_bus.add_command,
                         "cron",
                         minute=0,
                         hour="*/" + str(job_data["interval"]),
@@ -452,7 +396,7 @@ class TasksManager:
                     )
                 elif job_data["interval_type"] == "minutes":
                     self.scheduler.add_job(
-                        HelpersManagement.add_command,
+                        self.controller.command_bus.add_command,
                         "cron",
                         minute="*/" + str(job_data["interval"]),
                         id=str(sch_id),
@@ -466,7 +410,7 @@ class TasksManager:
                 elif job_data["interval_type"] == "days":
                     curr_time = job_data["start_time"].split(":")
                     self.scheduler.add_job(
-                        HelpersManagement.add_command,
+                        self.controller.command_bus.add_command,
                         "cron",
                         day="*/" + str(job_data["interval"]),
                         hour=curr_time[0],
@@ -520,7 +464,7 @@ class TasksManager:
                                 seconds=schedule.delay
                             )
                             self.scheduler.add_job(
-                                HelpersManagement.add_command,
+                                self.controller.command_bus.add_command,
                                 "date",
                                 run_date=delaytime,
                                 id=str(schedule.schedule_id),
@@ -558,6 +502,42 @@ class TasksManager:
             id="stats",
         )
 
+        logger.info("Polling running server statistics every 5 seconds")
+        Console.info("Polling running server statistics every 5 seconds")
+        self.scheduler.add_job(
+            self.controller.servers.collect_servers_stats,
+            "interval",
+            seconds=5,
+            id="servers_stats",
+        )
+        # server stats rows are buffered and written in one go
+        self.scheduler.add_job(
+            self.controller.servers.flush_servers_stats,
+            "interval",
+            seconds=self.stats_flush_interval,
+            id="servers_stats_flush",
+        )
+        # per minute and per hour history
+        self.scheduler.add_job(
+            self.controller.servers.stats.rollup_stats,
+            "interval",
+            minutes=1,
+            id="stats_rollup",
+        )
+        self.scheduler.add_job(
+            self.controller.servers.rollup_servers_stats,
+            "interval",
+            minutes=1,
+            id="servers_stats_rollup",
+        )
+        self.scheduler.add_job(
+            self.controller.servers.prune_servers_stats,
+            "interval",
+            hours=1,
+            id="servers_stats_prune",
+            next_run_time=datetime.datetime.now(),
+        )
+
     def serverjar_cache_refresher(self):
         logger.info("Refreshing serverjars.com cache on start")
         self.controller.server_jars.refresh_cache()
@@ -570,41 +550,19 @@ class TasksManager:
             id="serverjars",
         )
 
-    def realtime(self):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-        host_stats = HelpersManagement.get_latest_hosts_stats()
-
-        while True:
-
-            if host_stats.get(
-                "cpu_usage"
-            ) != HelpersManagement.get_latest_hosts_stats().get(
-                "cpu_usage"
-            ) or host_stats.get(
-                "mem_percent"
-            ) != HelpersManagement.get_latest_hosts_stats().get(
-                "mem_percent"
-            ):
-                # Stats are different
-
-                host_stats = HelpersManagement.get_latest_hosts_stats()
-                if len(self.helper.websocket_helper.clients) > 0:
-                    # There are clients
-                    self.helper.websocket_helper.broadcast_page(
-                        "/panel/dashboard",
-                        "update_host_stats",
-                        {
-                            "cpu_usage": host_stats.get("cpu_usage"),
-                            "cpu_cores": host_stats.get("cpu_cores"),
-                            "cpu_cur_freq": host_stats.get("cpu_cur_freq"),
-                            "cpu_max_freq": host_stats.get("cpu_max_freq"),
-                            "mem_percent": host_stats.get("mem_percent"),
-                            "mem_usage": host_stats.get("mem_usage"),
-                        },
-                    )
-            time.sleep(1)
+    def broadcast_host_stats(self, host_stats):
+        self.helper.websocket_helper.broadcast_page(
+            "/panel/dashboard",
+            "update_host_stats",
+            {
+                "cpu_usage": host_stats.get("cpu_usage"),
+                "cpu_cores": host_stats.get("cpu_cores"),
+                "cpu_cur_freq": host_stats.get("cpu_cur_freq"),
+                "cpu_max_freq": host_stats.get("cpu_max_freq"),
+                "mem_percent": host_stats.get("mem_percent"),
+                "mem_usage": host_stats.get("mem_usage"),
+            },
+        )
 
     def log_watcher(self):
         self.controller.servers.check_for_old_logs()
@@ -614,3 +572,11 @@ class TasksManager:
             hours=6,
             id="log-mgmt",
         )
+        # the audit log is trimmed here rather than on every entry added
+        self.scheduler.add_job(
+            self.controller.management.prune_audit_log,
+            "interval",
+            minutes=self.audit_prune_interval,
+            id="audit-log-prune",
+            next_run_time=datetime.datetime.now(),
+        )
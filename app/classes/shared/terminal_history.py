@@ -0,0 +1,84 @@
+import threading
+import time
+import typing as t
+
+
+class TerminalHistory:
+    """Fixed capacity ring buffer of console lines.
+
+    Every line gets a sequence number that keeps counting up for the lifetime
+    of the buffer, so a client that knows the next sequence number it expects
+    can ask for just the lines it missed. In compact mode the lines are kept
+    as utf-8 bytes, which is smaller than str for long scrollbacks.
+    """
+
+    def __init__(self, capacity: int, compact: bool = False, first_seq: int = 0):
+        self.lock = threading.Lock()
+        # notified on every append, for threads waiting on a line
+        self.appended = threading.Condition(self.lock)
+        self.capacity = max(1, int(capacity))
+        self.compact = compact
+        self.slots: t.List[t.Union[str, bytes, None]] = [None] * self.capacity
+        # sequence number the next appended line will get
+        self.next_seq = first_seq
+        # sequence number of the oldest line still kept
+        self.first_seq = first_seq
+
+    def append(self, line: str) -> int:
+        if self.compact:
+            line = line.encode("utf-8")
+        with self.lock:
+            seq = self.next_seq
+            self.slots[seq % self.capacity] = line
+            self.next_seq += 1
+            if self.next_seq - self.first_seq > self.capacity:
+                self.first_seq += 1
+            self.appended.notify_all()
+            return seq
+
+    def lines_since(
+        self, seq: int = 0, until: t.Optional[int] = None
+    ) -> t.Tuple[t.List[str], int]:
+        """Returns the kept lines from seq up to (not including) until.
+
+        Also returns the sequence number to ask for next time. Lines that
+        were already evicted are silently skipped.
+        """
+        with self.lock:
+            # a cursor from before a Crafty restart may be ahead of us
+            start = min(max(seq, self.first_seq), self.next_seq)
+            end = self.next_seq if until is None else min(until, self.next_seq)
+            lines = [self.slots[i % self.capacity] for i in range(start, end)]
+        if self.compact:
+            lines = [line.decode("utf-8") for line in lines]
+        return lines, max(end, start)
+
+    def wait_for_line(
+        self, pattern: t.Pattern, seq: int, timeout: float
+    ) -> t.Optional[str]:
+        """Waits for a line from seq on that matches pattern.
+
+        Returns the line, or None if none came within timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            lines, seq = self.lines_since(seq)
+            for line in lines:
+                if pattern.search(line):
+                    return line
+            with self.lock:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                if self.next_seq <= seq:
+                    self.appended.wait(remaining)
+
+    def get_lines(self) -> t.List[str]:
+        return self.lines_since(0)[0]
+
+    def __iter__(self):
+        return iter(self.get_lines())
+
+    def __len__(self):
+        with self.lock:
+            return self.next_seq - self.first_seq
@@ -1,16 +1,19 @@
 import os
 import html
 import pathlib
-import re
 import logging
 import time
 import bleach
 import tornado.web
 import tornado.escape
+import tornado.ioloop
+import tornado.iostream
 
 from app.classes.models.server_permissions import EnumPermissionsServer
+from app.classes.shared.backup_store import DedupStore
 from app.classes.shared.console import Console
 from app.classes.shared.helpers import Helpers
+from app.classes.shared.log_highlighter import LogHighlighter
 from app.classes.shared.server import ServerOutBuf
 from app.classes.web.base_handler import BaseHandler
 
@@ -18,6 +21,9 @@ logger = logging.getLogger(__name__)
 
 
 class AjaxHandler(BaseHandler):
+    # Log lines highlighted and sent to the browser at a time
+    log_chunk_lines = 500
+
     def render_page(self, template, page_data):
         self.render(
             template,
@@ -26,7 +32,7 @@ class AjaxHandler(BaseHandler):
         )
 
     @tornado.web.authenticated
-    def get(self, page):
+    async def get(self, page):
         _, _, exec_user = self.current_user
         error = bleach.clean(self.get_argument("error", "WTF Error!"))
 
@@ -62,25 +68,55 @@ class AjaxHandler(BaseHandler):
 
             if full_log:
                 log_lines = self.helper.get_setting("max_log_lines")
-                data = Helpers.tail_file(
+                # the log can be huge, so it is read off the IOLoop
+                data = await tornado.ioloop.IOLoop.current().run_in_executor(
+                    None,
+                    Helpers.tail_file,
                     # If the log path is absolute it returns it as is
                     # If it is relative it joins the paths below like normal
                     pathlib.Path(server_data["path"], server_data["log_path"]),
                     log_lines,
                 )
+            elif server_id in ServerOutBuf.lines:
+                # the terminal asks for just the lines it missed with since
+                # (and until) and continues from the X-Next-Line header
+                try:
+                    since = int(self.get_argument("since", 0))
+                    until = self.get_argument("until", None)
+                    until = None if until is None else int(until)
+                except ValueError:
+                    self.set_status(400)
+                    self.finish()
+                    return
+                data, next_line = ServerOutBuf.lines[server_id].lines_since(
+                    since, until
+                )
+                self.set_header("X-Next-Line", str(next_line))
             else:
-                data = ServerOutBuf.lines.get(server_id, [])
+                data = []
 
-            for line in data:
-                try:
-                    line = re.sub("(\033\\[(0;)?[0-9]*[A-z]?(;[0-9])?m?)", "", line)
-                    line = re.sub("[A-z]{2}\b\b", "", line)
-                    line = self.helper.log_colors(html.escape(line))
-                    self.write(f"{line}<br />")
-                    # self.write(d.encode("utf-8"))
+            # highlighted and sent in chunks, so the browser can start
+            # rendering before the whole log is coloured
+            for start in range(0, len(data), self.log_chunk_lines):
+                lines = []
+                for line in data[start : start + self.log_chunk_lines]:
+                    try:
+                        line = LogHighlighter.strip_console_codes(line)
+                        lines.append(html.escape(line))
+
+                    except Exception as e:
+                        logger.warning(f"Skipping Log Line due to error: {e}")
 
-                except Exception as e:
-                    logger.warning(f"Skipping Log Line due to error: {e}")
+                self.write(
+                    "".join(
+                        f"{line}<br />" for line in self.helper.log_colors_lines(lines)
+                    )
+                )
+                try:
+                    await self.flush()
+                except tornado.iostream.StreamClosedError:
+                    logger.debug("Browser went away while receiving the server log")
+                    return
 
         elif page == "announcements":
             data = Helpers.get_announcements()
@@ -93,7 +129,9 @@ class AjaxHandler(BaseHandler):
             self.write(
                 Helpers.get_os_understandable_path(path)
                 + "\n"
-                + Helpers.generate_zip_tree(path)
+                + await tornado.ioloop.IOLoop.current().run_in_executor(
+                    None, Helpers.generate_zip_tree, path
+                )
             )
             self.finish()
 
@@ -103,7 +141,9 @@ class AjaxHandler(BaseHandler):
             self.write(
                 Helpers.get_os_understandable_path(path)
                 + "\n"
-                + Helpers.generate_zip_dir(path)
+                + await tornado.ioloop.IOLoop.current().run_in_executor(
+                    None, Helpers.generate_zip_dir, path
+                )
             )
             self.finish()
 
@@ -111,131 +151,25 @@ class AjaxHandler(BaseHandler):
             server_id = self.get_argument("id", None)
             folder = self.get_argument("path", None)
 
-            output = ""
-
-            dir_list = []
-            unsorted_files = []
-            file_list = os.listdir(folder)
-            for item in file_list:
-                if os.path.isdir(os.path.join(folder, item)):
-                    dir_list.append(item)
-                else:
-                    unsorted_files.append(item)
-            file_list = sorted(dir_list, key=str.casefold) + sorted(
-                unsorted_files, key=str.casefold
+            output = await tornado.ioloop.IOLoop.current().run_in_executor(
+                None,
+                Helpers.generate_backup_tree,
+                folder,
+                self.controller.management.get_excluded_backup_dirs(server_id),
             )
-            output += f"""<ul class="tree-nested d-block" id="{folder}ul">"""
-            for raw_filename in file_list:
-                filename = html.escape(raw_filename)
-                rel = os.path.join(folder, raw_filename)
-                dpath = os.path.join(folder, filename)
-                if str(dpath) in self.controller.management.get_excluded_backup_dirs(
-                    server_id
-                ):
-                    if os.path.isdir(rel):
-                        output += f"""<li class="tree-item" data-path="{dpath}">
-                            \n<div id="{dpath}" data-path="{dpath}" data-name="{filename}" class="tree-caret tree-ctx-item tree-folder">
-                            <input type="checkbox" class="checkBoxClass" name="root_path" value="{dpath}" checked>
-                            <span id="{dpath}span" class="files-tree-title" data-path="{dpath}" data-name="{filename}" onclick="getDirView(event)">
-                            <i style="color: #8862e0;" class="far fa-folder"></i>
-                            <i style="color: #8862e0;" class="far fa-folder-open"></i>
-                            <strong>{filename}</strong>
-                            </span>
-                            </input></div><li>
-                            \n"""
-                    else:
-                        output += f"""<li
-                        class="d-block tree-ctx-item tree-file"
-                        data-path="{dpath}"
-                        data-name="{filename}"
-                        onclick=""><input type='checkbox' class="checkBoxClass" name='root_path' value="{dpath}" checked><span style="margin-right: 6px;">
-                        <i class="far fa-file"></i></span></input>{filename}</li>"""
-
-                else:
-                    if os.path.isdir(rel):
-                        output += f"""<li class="tree-item" data-path="{dpath}">
-                            \n<div id="{dpath}" data-path="{dpath}" data-name="{filename}" class="tree-caret tree-ctx-item tree-folder">
-                            <input type="checkbox" class="checkBoxClass" name="root_path" value="{dpath}">
-                            <span id="{dpath}span" class="files-tree-title" data-path="{dpath}" data-name="{filename}" onclick="getDirView(event)">
-                            <i style="color: #8862e0;" class="far fa-folder"></i>
-                            <i style="color: #8862e0;" class="far fa-folder-open"></i>
-                            <strong>{filename}</strong>
-                            </span>
-                            </input></div><li>
-                            \n"""
-                    else:
-                        output += f"""<li
-                        class="d-block tree-ctx-item tree-file"
-                        data-path="{dpath}"
-                        data-name="{filename}"
-                        onclick=""><input type='checkbox' class="checkBoxClass" name='root_path' value="{dpath}">
-                        <span style="margin-right: 6px;"><i class="far fa-file">
-                        </i></span></input>{filename}</li>"""
             self.write(Helpers.get_os_understandable_path(folder) + "\n" + output)
             self.finish()
 
         elif page == "get_backup_dir":
             server_id = self.get_argument("id", None)
             folder = self.get_argument("path", None)
-            output = ""
-
-            dir_list = []
-            unsorted_files = []
-            file_list = os.listdir(folder)
-            for item in file_list:
-                if os.path.isdir(os.path.join(folder, item)):
-                    dir_list.append(item)
-                else:
-                    unsorted_files.append(item)
-            file_list = sorted(dir_list, key=str.casefold) + sorted(
-                unsorted_files, key=str.casefold
-            )
-            output += f"""<ul class="tree-nested d-block" id="{folder}ul">"""
-            for raw_filename in file_list:
-                filename = html.escape(raw_filename)
-                rel = os.path.join(folder, raw_filename)
-                dpath = os.path.join(folder, filename)
-                if str(dpath) in self.controller.management.get_excluded_backup_dirs(
-                    server_id
-                ):
-                    if os.path.isdir(rel):
-                        output += f"""<li class="tree-item" data-path="{dpath}">
-                            \n<div id="{dpath}" data-path="{dpath}" data-name="{filename}" class="tree-caret tree-ctx-item tree-folder">
-                            <input type="checkbox" name="root_path" value="{dpath}" checked>
-                            <span id="{dpath}span" class="files-tree-title" data-path="{dpath}" data-name="{filename}" onclick="getDirView(event)">
-                            <i class="far fa-folder"></i>
-                            <i class="far fa-folder-open"></i>
-                            <strong>{filename}</strong>
-                            </span>
-                            </input></div><li>"""
-                    else:
-                        output += f"""<li
-                        class="tree-item tree-nested d-block tree-ctx-item tree-file"
-                        data-path="{dpath}"
-                        data-name="{filename}"
-                        onclick=""><input type='checkbox' name='root_path' value='{dpath}' checked><span style="margin-right: 6px;">
-                        <i class="far fa-file"></i></span></input>{filename}</li>"""
-
-                else:
-                    if os.path.isdir(rel):
-                        output += f"""<li class="tree-item" data-path="{dpath}">
-                            \n<div id="{dpath}" data-path="{dpath}" data-name="{filename}" class="tree-caret tree-ctx-item tree-folder">
-                            <input type="checkbox" name="root_path" value="{dpath}">
-                            <span id="{dpath}span" class="files-tree-title" data-path="{dpath}" data-name="{filename}" onclick="getDirView(event)">
-                            <i class="far fa-folder"></i>
-                            <i class="far fa-folder-open"></i>
-                            <strong>{filename}</strong>
-                            </span>
-                            </input></div><li>"""
-                    else:
-                        output += f"""<li
-                        class="tree-item tree-nested d-block tree-ctx-item tree-file"
-                        data-path="{dpath}"
-                        data-name="{filename}"
-                        onclick=""><input type='checkbox' name='root_path' value='{dpath}'>
-                        <span style="margin-right: 6px;"><i class="far fa-file">
-                        </i></span></input>{filename}</li>"""
 
+            output = await tornado.ioloop.IOLoop.current().run_in_executor(
+                None,
+                Helpers.generate_backup_dir,
+                folder,
+                self.controller.management.get_excluded_backup_dirs(server_id),
+            )
             self.write(Helpers.get_os_understandable_path(folder) + "\n" + output)
             self.finish()
 
@@ -253,7 +187,9 @@ class AjaxHandler(BaseHandler):
                 self.write(
                     Helpers.get_os_understandable_path(path)
                     + "\n"
-                    + Helpers.generate_dir(path)
+                    + await tornado.ioloop.IOLoop.current().run_in_executor(
+                        None, Helpers.generate_dir, path
+                    )
                 )
             self.finish()
 
@@ -514,11 +450,12 @@ class AjaxHandler(BaseHandler):
                 return
 
             # Delete the file
-            if Helpers.validate_traversal(
-                Helpers.get_os_understandable_path(server_info["backup_path"]),
-                file_path,
-            ):
-                os.remove(file_path)
+            backup_path = Helpers.get_os_understandable_path(server_info["backup_path"])
+            if Helpers.validate_traversal(backup_path, file_path):
+                if DedupStore.is_manifest(file_path):
+                    DedupStore.for_path(backup_path).remove_snapshot(file_path)
+                else:
+                    os.remove(file_path)
 
         elif page == "delete_server":
             if not permissions["Config"] in user_perms:
@@ -5,7 +5,7 @@ import re
 from app.classes.controllers.crafty_perms_controller import EnumPermissionsCrafty
 from app.classes.controllers.server_perms_controller import EnumPermissionsServer
 from app.classes.web.base_handler import BaseHandler
-from app.classes.models.management import DatabaseShortcuts
+from app.classes.shared.main_models import DatabaseShortcuts
 
 logger = logging.getLogger(__name__)
 bearer_pattern = re.compile(r"^Bearer", flags=re.IGNORECASE)
@@ -127,8 +127,8 @@ class NodeStats(ApiHandler):
             return
 
         # Get node stats
-        node_stats = self.controller.servers.stats.get_node_stats()
-        self.return_response(200, {"code": node_stats["node_stats"]})
+        node_stats = self.controller.servers.stats.get_latest_node_stats()
+        self.return_response(200, {"code": node_stats})
 
 
 class SendCommand(ApiHandler):
@@ -3,6 +3,7 @@ import logging
 import bleach
 import tornado.web
 import tornado.escape
+import tornado.ioloop
 
 from app.classes.models.server_permissions import EnumPermissionsServer
 from app.classes.shared.console import Console
@@ -22,7 +23,7 @@ class FileHandler(BaseHandler):
         )
 
     @tornado.web.authenticated
-    def get(self, page):
+    async def get(self, page):
         api_key, _, exec_user = self.current_user
         superuser = exec_user["superuser"]
         if api_key is not None:
@@ -100,7 +101,9 @@ class FileHandler(BaseHandler):
                 self.write(
                     Helpers.get_os_understandable_path(path)
                     + "\n"
-                    + Helpers.generate_tree(path)
+                    + await tornado.ioloop.IOLoop.current().run_in_executor(
+                        None, Helpers.generate_tree, path
+                    )
                 )
             self.finish()
 
@@ -121,7 +124,9 @@ class FileHandler(BaseHandler):
                 self.write(
                     Helpers.get_os_understandable_path(path)
                     + "\n"
-                    + Helpers.generate_dir(path)
+                    + await tornado.ioloop.IOLoop.current().run_in_executor(
+                        None, Helpers.generate_dir, path
+                    )
                 )
             self.finish()
 
@@ -12,7 +12,8 @@ import libgravatar
 import requests
 import tornado.web
 import tornado.escape
-from tornado import iostream
+import tornado.ioloop
+from tornado import httputil, iostream
 
 # TZLocal is set as a hidden import on win pipeline
 from tzlocal import get_localzone
@@ -24,6 +25,7 @@ from app.classes.models.server_permissions import EnumPermissionsServer
 from app.classes.models.crafty_permissions import EnumPermissionsCrafty
 from app.classes.models.management import HelpersManagement
 from app.classes.controllers.roles_controller import RolesController
+from app.classes.shared.backup_store import DedupStore
 from app.classes.shared.helpers import Helpers
 from app.classes.shared.main_models import DatabaseShortcuts
 from app.classes.web.base_handler import BaseHandler
@@ -119,29 +121,109 @@ class PanelHandler(BaseHandler):
                 roles.add(role.role_id)
         return roles
 
-    def download_file(self, name: str, file: str):
+    async def download_file(self, name: str, file: str):
+        """Sends a file, resuming from a Range header when one is given.
+
+        Chunks are read in the executor and each one is flushed to the client
+        before the next is read, so a slow download holds one chunk in memory
+        rather than the whole file.
+        """
+        chunk_size = 1024 * 1024 * 4  # 4 MiB
+        stat = os.stat(file)
+        size = stat.st_size
+        etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+        last_modified = httputil.format_timestamp(stat.st_mtime)
+
         self.set_header("Content-Type", "application/octet-stream")
         self.set_header("Content-Disposition", f"attachment; filename={name}")
-        chunk_size = 1024 * 1024 * 4  # 4 MiB
+        self.set_header("Accept-Ranges", "bytes")
+        self.set_header("Etag", etag)
+        self.set_header("Last-Modified", last_modified)
+
+        start, end = 0, size
+        range_header = self.request.headers.get("Range")
+        if_range = self.request.headers.get("If-Range")
+        # If-Range only resumes when the file hasn't changed since the
+        # client got the first part, otherwise the whole file is sent again
+        if range_header and if_range in (None, etag, last_modified):
+            try:
+                byte_range = Helpers.parse_byte_range(range_header, size)
+            except ValueError:
+                self.set_status(416)
+                self.set_header("Content-Type", "text/plain")
+                self.set_header("Content-Range", f"bytes */{size}")
+                self.finish()
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                self.set_status(206)
+                self.set_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+        self.set_header("Content-Length", end - start)
 
+        io_loop = tornado.ioloop.IOLoop.current()
         with open(file, "rb") as f:
-            while True:
-                chunk = f.read(chunk_size)
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = await io_loop.run_in_executor(
+                    None, f.read, min(chunk_size, remaining)
+                )
                 if not chunk:
-                    break
+                    # Content-Length was already sent, so finishing here would
+                    # pass a truncated file off as complete. Dropping the
+                    # connection tells the client the download failed.
+                    logger.warning(f"{file} got shorter while it was downloaded")
+                    self.request.connection.close()
+                    return
+                remaining -= len(chunk)
                 try:
                     self.write(chunk)  # write the chunk to response
-                    self.flush()  # send the chunk to client
+                    # wait for the chunk to be sent before reading the next
+                    await self.flush()
                 except iostream.StreamClosedError:
                     # this means the client has closed the connection
-                    # so break the loop
+                    # so stop sending
+                    return
+        self.finish()
+
+    async def download_backup_zip(
+        self, name: str, store: DedupStore, manifest_path: str
+    ):
+        """Sends an incremental backup as a zip that is built while it is sent.
+
+        Each piece of the zip is built in the executor and flushed to the
+        client before the next is built, so nothing is written to disk. The
+        size isn't known up front, so the zip can't be resumed with Range.
+        """
+        self.set_header("Content-Type", "application/octet-stream")
+        self.set_header("Content-Disposition", f"attachment; filename={name}")
+        self.set_header("Accept-Ranges", "none")
+
+        io_loop = tornado.ioloop.IOLoop.current()
+        pieces = store.iter_zip(manifest_path)
+        try:
+            while True:
+                try:
+                    piece = await io_loop.run_in_executor(None, next, pieces, None)
+                except (OSError, ValueError) as e:
+                    # part of the zip may be out already, dropping the
+                    # connection tells the client the download failed
+                    logger.error(f"Unable to send {manifest_path} as a zip: {e}")
+                    self.request.connection.close()
+                    return
+                if piece is None:
                     break
-                finally:
-                    # deleting the chunk is very important because
-                    # if many clients are downloading files at the
-                    # same time, the chunks in memory will keep
-                    # increasing and will eat up the RAM
-                    del chunk
+                if not piece:
+                    continue
+                try:
+                    self.write(piece)
+                    await self.flush()
+                except iostream.StreamClosedError:
+                    # the client has closed the connection, so stop sending
+                    return
+        finally:
+            pieces.close()
+        self.finish()
 
     def check_server_id(self):
         server_id = self.get_argument("id", None)
@@ -304,7 +386,7 @@ class PanelHandler(BaseHandler):
                 ),
             },
             "menu_servers": defined_servers,
-            "hosts_data": self.controller.management.get_latest_hosts_stats(),
+            "hosts_data": self.controller.servers.stats.get_latest_hosts_stats(),
             "show_contribute": self.helper.get_setting("show_contribute_link", True),
             "error": error,
             "time": formatted_time,
@@ -442,35 +524,14 @@ class PanelHandler(BaseHandler):
             page_servers = []
             server_ids = []
             un_used_servers = page_data["servers"]
-            flag = 0
+            # the stats already hold the downloading, crashed and
+            # waiting_start flags, the servers only need ordering
             for server_id in user_order[:]:
                 for server in un_used_servers[:]:
-                    if flag == 0:
-                        server["stats"][
-                            "downloading"
-                        ] = self.controller.servers.get_download_status(
-                            str(server["stats"]["server_id"]["server_id"])
-                        )
-                        server["stats"]["crashed"] = self.controller.servers.is_crashed(
-                            str(server["stats"]["server_id"]["server_id"])
-                        )
-                        try:
-                            server["stats"][
-                                "waiting_start"
-                            ] = self.controller.servers.get_waiting_start(
-                                str(server["stats"]["server_id"]["server_id"])
-                            )
-                        except Exception as e:
-                            logger.error(f"Failed to get server waiting to start: {e}")
-                            server["stats"]["waiting_start"] = False
-
                     if str(server["server_data"]["server_id"]) == str(server_id):
                         page_servers.append(server)
                         un_used_servers.remove(server)
                         user_order.remove(server_id)
-                # we only want to set these server stats values once.
-                # We need to update the flag so it only hits that if once.
-                flag += 1
 
             for server in un_used_servers:
                 server_ids.append(str(server["server_data"]["server_id"]))
@@ -752,9 +813,18 @@ class PanelHandler(BaseHandler):
                 self.redirect("/panel/error?error=Invalid path detected")
                 return
 
-            self.download_file(file, backup_file)
+            if not DedupStore.is_manifest(backup_file):
+                await self.download_file(file, backup_file)
+                return
 
-            self.redirect(f"/panel/server_detail?id={server_id}&subpage=backup")
+            # an incremental backup is only a list of chunks, so it is sent
+            # as the zip a full backup would have been
+            store = DedupStore.for_path(
+                Helpers.get_os_understandable_path(server_info["backup_path"])
+            )
+            zip_name = os.path.basename(file)[: -len(DedupStore.manifest_suffix)]
+            await self.download_backup_zip(f"{zip_name}.zip", store, backup_file)
+            return
 
         elif page == "panel_config":
             auth_servers = {}
@@ -1229,7 +1299,30 @@ class PanelHandler(BaseHandler):
             self.redirect("/panel/panel_config")
 
         elif page == "activity_logs":
-            page_data["audit_logs"] = self.controller.management.get_actity_log()
+            audit_user = self.get_argument("user", "")
+            audit_server = self.get_argument("server", "")
+            audit_text = self.get_argument("q", "")
+            before = self.get_argument("before", None)
+            try:
+                audit_logs, audit_next = self.controller.management.get_actity_log(
+                    before=before,
+                    user_id=int(audit_user) if audit_user else None,
+                    server_id=int(audit_server) if audit_server else None,
+                    text=audit_text or None,
+                )
+            except ValueError:
+                self.redirect("/panel/error?error=Invalid activity log filter")
+                return
+            page_data["audit_logs"] = audit_logs
+            page_data["audit_next"] = audit_next
+            page_data["audit_filters"] = {
+                "user": audit_user,
+                "server": audit_server,
+                "q": audit_text,
+            }
+            page_data["audit_is_first_page"] = not before
+            page_data["users"] = self.controller.users.get_all_users()
+            page_data["servers_all"] = self.controller.servers.get_all_defined_servers()
 
             template = "panel/activity_logs.html"
 
@@ -1249,8 +1342,8 @@ class PanelHandler(BaseHandler):
                 self.redirect("/panel/error?error=Invalid path detected")
                 return
 
-            self.download_file(name, file)
-            self.redirect(f"/panel/server_detail?id={server_id}&subpage=files")
+            await self.download_file(name, file)
+            return
 
         elif page == "wiki":
             template = "panel/wiki.html"
@@ -1258,34 +1351,11 @@ class PanelHandler(BaseHandler):
         elif page == "download_support_package":
             temp_zip_storage = exec_user["support_logs"]
 
-            self.set_header("Content-Type", "application/octet-stream")
-            self.set_header(
-                "Content-Disposition", "attachment; filename=" + "support_logs.zip"
-            )
-            chunk_size = 1024 * 1024 * 4  # 4 MiB
-            if temp_zip_storage != "":
-                with open(temp_zip_storage, "rb") as f:
-                    while True:
-                        chunk = f.read(chunk_size)
-                        if not chunk:
-                            break
-                        try:
-                            self.write(chunk)  # write the chunk to response
-                            self.flush()  # send the chunk to client
-                        except iostream.StreamClosedError:
-                            # this means the client has closed the connection
-                            # so break the loop
-                            break
-                        finally:
-                            # deleting the chunk is very important because
-                            # if many clients are downloading files at the
-                            # same time, the chunks in memory will keep
-                            # increasing and will eat up the RAM
-                            del chunk
-                self.redirect("/panel/dashboard")
-            else:
+            if temp_zip_storage == "":
                 self.redirect("/panel/error?error=No path found for support logs")
                 return
+            await self.download_file("support_logs.zip", temp_zip_storage)
+            return
 
         elif page == "support_logs":
             logger.info(
@@ -1502,6 +1572,8 @@ class PanelHandler(BaseHandler):
             server_obj = self.controller.servers.get_server_obj(server_id)
             compress = self.get_argument("compress", False)
             shutdown = self.get_argument("shutdown", False)
+            incremental = self.get_argument("incremental", False)
+            live = self.get_argument("live", False)
             check_changed = self.get_argument("changed")
             if str(check_changed) == str(1):
                 checked = self.get_body_arguments("root_path")
@@ -1526,6 +1598,8 @@ class PanelHandler(BaseHandler):
                 excluded_dirs=checked,
                 compress=bool(compress),
                 shutdown=bool(shutdown),
+                incremental=bool(incremental),
+                live=bool(live),
             )
 
             self.controller.management.add_to_audit_log(
@@ -2221,7 +2295,7 @@ class PanelHandler(BaseHandler):
             "update_available": False,
             "version_data": self.helper.get_version_string(),
             "user_data": exec_user,
-            "hosts_data": self.controller.management.get_latest_hosts_stats(),
+            "hosts_data": self.controller.servers.stats.get_latest_hosts_stats(),
             "show_contribute": self.helper.get_setting("show_contribute_link", True),
             "lang": self.controller.users.get_user_lang_by_id(exec_user["user_id"]),
             "lang_page": Helpers.get_lang_page(
@@ -8,6 +8,13 @@ from app.classes.web.routes.api.auth.invalidate_tokens import (
     ApiAuthInvalidateTokensHandler,
 )
 from app.classes.web.routes.api.auth.login import ApiAuthLoginHandler
+from app.classes.web.routes.api.crafty.logs.audit import ApiCraftyLogsAuditHandler
+from app.classes.web.routes.api.crafty.stats.host import (
+    ApiCraftyStatsHostHistoryHandler,
+)
+from app.classes.web.routes.api.crafty.stats.settings import (
+    ApiCraftyStatsSettingsHandler,
+)
 from app.classes.web.routes.api.roles.index import ApiRolesIndexHandler
 from app.classes.web.routes.api.roles.role.index import ApiRolesRoleIndexHandler
 from app.classes.web.routes.api.roles.role.servers import ApiRolesRoleServersHandler
@@ -16,12 +23,21 @@ from app.classes.web.routes.api.servers.index import ApiServersIndexHandler
 from app.classes.web.routes.api.servers.server.action import (
     ApiServersServerActionHandler,
 )
+from app.classes.web.routes.api.servers.server.backups import (
+    ApiServersServerBackupsStatusHandler,
+)
+from app.classes.web.routes.api.servers.server.files import (
+    ApiServersServerFilesHandler,
+)
 from app.classes.web.routes.api.servers.server.index import ApiServersServerIndexHandler
 from app.classes.web.routes.api.servers.server.logs import ApiServersServerLogsHandler
 from app.classes.web.routes.api.servers.server.public import (
     ApiServersServerPublicHandler,
 )
-from app.classes.web.routes.api.servers.server.stats import ApiServersServerStatsHandler
+from app.classes.web.routes.api.servers.server.stats import (
+    ApiServersServerStatsHandler,
+    ApiServersServerStatsHistoryHandler,
+)
 from app.classes.web.routes.api.servers.server.stdin import ApiServersServerStdinHandler
 from app.classes.web.routes.api.servers.server.tasks.index import (
     ApiServersServerTasksIndexHandler,
@@ -132,6 +148,21 @@ def api_handlers(handler_args):
             ApiServersServerStatsHandler,
             handler_args,
         ),
+        (
+            r"/api/v2/servers/([0-9]+)/stats/history/?",
+            ApiServersServerStatsHistoryHandler,
+            handler_args,
+        ),
+        (
+            r"/api/v2/servers/([0-9]+)/backups/status/?",
+            ApiServersServerBackupsStatusHandler,
+            handler_args,
+        ),
+        (
+            r"/api/v2/servers/([0-9]+)/files/?",
+            ApiServersServerFilesHandler,
+            handler_args,
+        ),
         (
             r"/api/v2/servers/([0-9]+)/action/([a-z_]+)/?",
             ApiServersServerActionHandler,
@@ -157,6 +188,21 @@ def api_handlers(handler_args):
             ApiServersServerStdinHandler,
             handler_args,
         ),
+        (
+            r"/api/v2/crafty/logs/audit/?",
+            ApiCraftyLogsAuditHandler,
+            handler_args,
+        ),
+        (
+            r"/api/v2/crafty/stats/host/history/?",
+            ApiCraftyStatsHostHistoryHandler,
+            handler_args,
+        ),
+        (
+            r"/api/v2/crafty/stats/settings/?",
+            ApiCraftyStatsSettingsHandler,
+            handler_args,
+        ),
         (
             r"/api/v2/roles/?",
             ApiRolesIndexHandler,
@@ -0,0 +1,52 @@
+import logging
+from app.classes.web.base_api_handler import BaseApiHandler
+
+
+logger = logging.getLogger(__name__)
+
+
+class ApiCraftyLogsAuditHandler(BaseApiHandler):
+    # most entries a single call can ask for
+    max_limit = 1000
+
+    def get(self):
+        auth_data = self.authenticate_user()
+        if not auth_data:
+            return
+        (
+            _,
+            _,
+            _,
+            superuser,
+            _,
+        ) = auth_data
+
+        if not superuser:
+            return self.finish_json(400, {"status": "error", "error": "NOT_AUTHORIZED"})
+
+        # GET /api/v2/crafty/logs/audit?limit=100
+        # GET /api/v2/crafty/logs/audit?before=<next_cursor of the last call>
+        # GET /api/v2/crafty/logs/audit?user_id=1&server_id=2&text=started
+        try:
+            limit = min(int(self.get_query_argument("limit", "100")), self.max_limit)
+            user_id = self.get_query_argument("user_id", None)
+            server_id = self.get_query_argument("server_id", None)
+            rows, next_cursor = self.controller.management.get_actity_log(
+                limit=max(1, limit),
+                before=self.get_query_argument("before", None),
+                user_id=int(user_id) if user_id else None,
+                server_id=int(server_id) if server_id else None,
+                text=self.get_query_argument("text", None),
+            )
+        except ValueError:
+            return self.finish_json(
+                400, {"status": "error", "error": "INVALID_AUDIT_LOG_QUERY"}
+            )
+
+        self.finish_json(
+            200,
+            {
+                "status": "ok",
+                "data": {"entries": rows, "next_cursor": next_cursor},
+            },
+        )
@@ -0,0 +1,57 @@
+import datetime
+import logging
+from app.classes.web.base_api_handler import BaseApiHandler
+
+
+logger = logging.getLogger(__name__)
+
+
+class ApiCraftyStatsHostHistoryHandler(BaseApiHandler):
+    def get(self):
+        auth_data = self.authenticate_user()
+        if not auth_data:
+            return
+        (
+            _,
+            _,
+            _,
+            superuser,
+            _,
+        ) = auth_data
+
+        if not superuser:
+            return self.finish_json(400, {"status": "error", "error": "NOT_AUTHORIZED"})
+
+        # GET /api/v2/crafty/stats/host/history?from=<unix time>&to=<unix time>
+        try:
+            end = datetime.datetime.fromtimestamp(
+                float(
+                    self.get_query_argument("to", datetime.datetime.now().timestamp())
+                )
+            )
+            start = datetime.datetime.fromtimestamp(
+                float(
+                    self.get_query_argument(
+                        "from", (end - datetime.timedelta(days=1)).timestamp()
+                    )
+                )
+            )
+        except (ValueError, OverflowError, OSError):
+            return self.finish_json(400, {"status": "error", "error": "INVALID_RANGE"})
+        if start > end:
+            return self.finish_json(400, {"status": "error", "error": "INVALID_RANGE"})
+
+        raw_max_age = datetime.timedelta(
+            days=self.helper.get_setting("history_max_age")
+        )
+        history = self.controller.management.get_host_stats_history(
+            start, end, raw_max_age
+        )
+
+        self.finish_json(
+            200,
+            {
+                "status": "ok",
+                "data": history,
+            },
+        )
@@ -0,0 +1,29 @@
+import logging
+from app.classes.web.base_api_handler import BaseApiHandler
+
+
+logger = logging.getLogger(__name__)
+
+
+class ApiCraftyStatsSettingsHandler(BaseApiHandler):
+    def get(self):
+        auth_data = self.authenticate_user()
+        if not auth_data:
+            return
+        (
+            _,
+            _,
+            _,
+            superuser,
+            _,
+        ) = auth_data
+
+        if not superuser:
+            return self.finish_json(400, {"status": "error", "error": "NOT_AUTHORIZED"})
+
+        # GET /api/v2/crafty/stats/settings
+        # how often config.json was read, and how many reads the store saved
+        self.finish_json(
+            200,
+            {"status": "ok", "data": self.helper.get_settings_read_stats()},
+        )
@@ -0,0 +1,40 @@
+import logging
+from app.classes.models.server_permissions import EnumPermissionsServer
+from app.classes.web.base_api_handler import BaseApiHandler
+
+
+logger = logging.getLogger(__name__)
+
+
+class ApiServersServerBackupsStatusHandler(BaseApiHandler):
+    def get(self, server_id: str):
+        auth_data = self.authenticate_user()
+        if not auth_data:
+            return
+
+        if server_id not in [str(x["server_id"]) for x in auth_data[0]]:
+            # if the user doesn't have access to the server, return an error
+            return self.finish_json(400, {"status": "error", "error": "NOT_AUTHORIZED"})
+
+        if (
+            EnumPermissionsServer.BACKUP
+            not in self.controller.server_perms.get_user_id_permissions_list(
+                auth_data[4]["user_id"], server_id
+            )
+        ):
+            # if the user doesn't have Backup permission, return an error
+            return self.finish_json(400, {"status": "error", "error": "NOT_AUTHORIZED"})
+
+        srv = self.controller.servers.get_server_instance_by_id(server_id)
+
+        self.finish_json(
+            200,
+            {
+                "status": "ok",
+                "data": {
+                    "backing_up": srv.is_backingup,
+                    "last_failed": srv.last_backup_status(),
+                    **srv.send_backup_status(),
+                },
+            },
+        )
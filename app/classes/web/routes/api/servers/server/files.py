@@ -0,0 +1,75 @@
+import logging
+import tornado.ioloop
+from app.classes.models.server_permissions import EnumPermissionsServer
+from app.classes.shared.file_listing import FileListing
+from app.classes.shared.helpers import Helpers
+from app.classes.web.base_api_handler import BaseApiHandler
+
+
+logger = logging.getLogger(__name__)
+
+
+class ApiServersServerFilesHandler(BaseApiHandler):
+    async def get(self, server_id: str):
+        auth_data = self.authenticate_user()
+        if not auth_data:
+            return
+
+        # GET /api/v2/servers/server/files?path=world/region
+        path = self.get_query_argument("path", "")
+        # GET /api/v2/servers/server/files?sort=mtime&order=desc
+        sort = self.get_query_argument("sort", "name")
+        reverse = self.get_query_argument("order", "asc") == "desc"
+        # GET /api/v2/servers/server/files?cursor=<next_cursor of the last call>
+        cursor = self.get_query_argument("cursor", None)
+        try:
+            limit = int(
+                self.get_query_argument("limit", str(FileListing.default_limit))
+            )
+        except ValueError:
+            return self.finish_json(400, {"status": "error", "error": "INVALID_LIMIT"})
+
+        if server_id not in [str(x["server_id"]) for x in auth_data[0]]:
+            # if the user doesn't have access to the server, return an error
+            return self.finish_json(400, {"status": "error", "error": "NOT_AUTHORIZED"})
+
+        if (
+            EnumPermissionsServer.FILES
+            not in self.controller.server_perms.get_user_id_permissions_list(
+                auth_data[4]["user_id"], server_id
+            )
+        ):
+            # if the user doesn't have Files permission, return an error
+            return self.finish_json(400, {"status": "error", "error": "NOT_AUTHORIZED"})
+
+        server_path = self.controller.servers.get_server_data_by_id(server_id)["path"]
+        try:
+            folder = Helpers.validate_traversal(server_path, path)
+        except ValueError:
+            return self.finish_json(400, {"status": "error", "error": "INVALID_PATH"})
+
+        try:
+            # a huge directory takes a while to list, so it is done off the IOLoop
+            page = await tornado.ioloop.IOLoop.current().run_in_executor(
+                None, FileListing.list_dir, folder, sort, reverse, cursor, limit
+            )
+        except ValueError as e:
+            return self.finish_json(
+                400,
+                {"status": "error", "error": "INVALID_LISTING", "error_data": str(e)},
+            )
+        except OSError as e:
+            logger.warning(f"Unable to list {folder}: {e}")
+            return self.finish_json(400, {"status": "error", "error": "INVALID_PATH"})
+
+        self.finish_json(
+            200,
+            {
+                "status": "ok",
+                "data": {
+                    "entries": [entry.to_dict() for entry in page.entries],
+                    "next_cursor": page.next_cursor,
+                    "total": page.total,
+                },
+            },
+        )
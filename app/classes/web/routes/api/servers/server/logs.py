@@ -26,6 +26,11 @@ class ApiServersServerLogsHandler(BaseApiHandler):
         disable_ansi_strip = self.get_query_argument("raw", None) == "true"
         # GET /api/v2/servers/server/logs?html=true
         use_html = self.get_query_argument("html", None) == "true"
+        # GET /api/v2/servers/server/logs?since=<next_line of the last call>
+        try:
+            since = int(self.get_query_argument("since", 0))
+        except ValueError:
+            return self.finish_json(400, {"status": "error", "error": "INVALID_SINCE"})
 
         if server_id not in [str(x["server_id"]) for x in auth_data[0]]:
             # if the user doesn't have access to the server, return an error
@@ -53,8 +58,11 @@ class ApiServersServerLogsHandler(BaseApiHandler):
 
             # Remove newline characters from the end of the lines
             raw_lines = [line.rstrip("\r\n") for line in raw_lines]
+        elif server_id in ServerOutBuf.lines:
+            raw_lines, next_line = ServerOutBuf.lines[server_id].lines_since(since)
         else:
-            raw_lines = ServerOutBuf.lines.get(server_id, [])
+            raw_lines = []
+            next_line = since
 
         lines = []
 
@@ -75,5 +83,9 @@ class ApiServersServerLogsHandler(BaseApiHandler):
         if use_html:
             for line in lines:
                 self.write(f"{line}<br />")
-        else:
+        elif read_log_file:
             self.finish_json(200, {"status": "ok", "data": lines})
+        else:
+            self.finish_json(
+                200, {"status": "ok", "data": lines, "next_line": next_line}
+            )
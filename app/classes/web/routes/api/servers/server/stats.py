@@ -1,3 +1,4 @@
+import datetime
 import logging
 from app.classes.web.base_api_handler import BaseApiHandler
 from app.classes.controllers.servers_controller import ServersController
@@ -26,3 +27,47 @@ class ApiServersServerStatsHandler(BaseApiHandler):
                 "data": latest,
             },
         )
+
+
+class ApiServersServerStatsHistoryHandler(BaseApiHandler):
+    def get(self, server_id: str):
+        auth_data = self.authenticate_user()
+        if not auth_data:
+            return
+
+        if server_id not in [str(x["server_id"]) for x in auth_data[0]]:
+            # if the user doesn't have access to the server, return an error
+            return self.finish_json(400, {"status": "error", "error": "NOT_AUTHORIZED"})
+
+        # GET /api/v2/servers/server/stats/history?from=<unix time>&to=<unix time>
+        try:
+            end = datetime.datetime.fromtimestamp(
+                float(
+                    self.get_query_argument("to", datetime.datetime.now().timestamp())
+                )
+            )
+            start = datetime.datetime.fromtimestamp(
+                float(
+                    self.get_query_argument(
+                        "from", (end - datetime.timedelta(days=1)).timestamp()
+                    )
+                )
+            )
+        except (ValueError, OverflowError, OSError):
+            return self.finish_json(400, {"status": "error", "error": "INVALID_RANGE"})
+        if start > end:
+            return self.finish_json(400, {"status": "error", "error": "INVALID_RANGE"})
+
+        srv = ServersController().get_server_instance_by_id(server_id)
+        raw_max_age = datetime.timedelta(
+            days=self.helper.get_setting("history_max_age")
+        )
+        history = srv.stats_helper.get_server_stats_history(start, end, raw_max_age)
+
+        self.finish_json(
+            200,
+            {
+                "status": "ok",
+                "data": history,
+            },
+        )
@@ -270,6 +270,8 @@ class ApiUsersUserIndexHandler(BaseApiHandler):
                 setattr(user_obj, key, value)
             user_obj.save()
 
+        self.controller.users.invalidate_user_auth(user_id)
+
         self.controller.management.add_to_audit_log(
             user["user_id"],
             (
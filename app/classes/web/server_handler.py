@@ -110,7 +110,7 @@ class ServerHandler(BaseHandler):
                     - len(self.controller.servers.list_running_servers())
                 ),
             },
-            "hosts_data": self.controller.management.get_latest_hosts_stats(),
+            "hosts_data": self.controller.servers.stats.get_latest_hosts_stats(),
             "menu_servers": page_servers,
             "show_contribute": self.helper.get_setting("show_contribute_link", True),
             "lang": self.controller.users.get_user_lang_by_id(exec_user["user_id"]),
@@ -1,6 +1,7 @@
 import json
 import logging
 import asyncio
+import time
 from urllib.parse import parse_qsl
 import tornado.websocket
 
@@ -16,6 +17,11 @@ class SocketHandler(tornado.websocket.WebSocketHandler):
     tasks_manager = None
     translator = None
     io_loop = None
+    # Seconds a successful token check is trusted before it is re-validated
+    auth_recheck_interval = 60
+    # Virtual terminal frames that may be waiting on a slow browser before
+    # new frames for this client are dropped and summarized instead
+    max_vterm_frames_in_flight = 10
 
     def initialize(
         self, helper=None, controller=None, tasks_manager=None, translator=None
@@ -25,6 +31,11 @@ class SocketHandler(tornado.websocket.WebSocketHandler):
         self.tasks_manager = tasks_manager
         self.translator = translator
         self.io_loop = tornado.ioloop.IOLoop.current()
+        self.user_id = None
+        self.auth_valid = False
+        self.auth_checked_at = None
+        self.vterm_frames_in_flight = 0
+        self.vterm_lines_dropped = 0
 
     def get_remote_ip(self):
         remote_ip = (
@@ -35,11 +46,26 @@ class SocketHandler(tornado.websocket.WebSocketHandler):
         return remote_ip
 
     def get_user_id(self):
-        _, _, user = self.controller.authentication.check(self.get_cookie("token"))
-        return user["user_id"]
+        # The token cookie is fixed for the lifetime of the connection
+        if self.user_id is None:
+            _, _, user = self.controller.authentication.check(self.get_cookie("token"))
+            self.user_id = user["user_id"]
+        return self.user_id
 
     def check_auth(self):
-        return self.controller.authentication.check_bool(self.get_cookie("token"))
+        now = time.monotonic()
+        if (
+            self.auth_checked_at is None
+            or now - self.auth_checked_at > self.auth_recheck_interval
+        ):
+            self.auth_valid = self.controller.authentication.check_bool(
+                self.get_cookie("token")
+            )
+            self.auth_checked_at = now
+        return self.auth_valid
+
+    def invalidate_auth(self):
+        self.auth_checked_at = None
 
     # pylint: disable=arguments-differ
     def open(self):
@@ -95,3 +121,34 @@ class SocketHandler(tornado.websocket.WebSocketHandler):
         asyncio.run_coroutine_threadsafe(
             self.write_message_int(message), self.io_loop.asyncio_loop
         )
+
+    def write_vterm_frame(self, message, line_count, resumable=False):
+        self.io_loop.add_callback(
+            self.write_vterm_frame_int, message, line_count, resumable
+        )
+
+    async def write_vterm_frame_int(self, message, line_count, resumable=False):
+        # Runs on the IOLoop, so the counters need no locking
+        if self.vterm_frames_in_flight >= self.max_vterm_frames_in_flight:
+            # resumable frames carry line numbers, the browser fetches the gap
+            if not resumable:
+                self.vterm_lines_dropped += line_count
+            return
+
+        self.vterm_frames_in_flight += 1
+        try:
+            if self.vterm_lines_dropped > 0:
+                skipped_line = self.helper.websocket_helper.vterm_skipped_line(
+                    self.vterm_lines_dropped
+                )
+                self.vterm_lines_dropped = 0
+                await self.write_message(
+                    json.dumps(
+                        {"event": "vterm_new_line", "data": {"line": skipped_line}}
+                    )
+                )
+            await self.write_message(message)
+        except tornado.websocket.WebSocketClosedError:
+            logger.debug("WebSocket closed while sending virtual terminal frame")
+        finally:
+            self.vterm_frames_in_flight -= 1
@@ -1,5 +1,8 @@
 import json
 import logging
+import threading
+import time
+from collections import deque
 
 from app.classes.shared.console import Console
 
@@ -7,15 +10,73 @@ logger = logging.getLogger(__name__)
 
 
 class WebSocketHelper:
+    # Virtual terminal lines are coalesced and sent once per interval (seconds)
+    vterm_frame_interval = 0.1
+    # Lines kept per server per frame, browsers fetch older ones from the
+    # terminal history, or are told how many were skipped when they can't
+    vterm_max_frame_lines = 500
+
     def __init__(self, helper):
         self.helper = helper
         self.clients = set()
+        # Subscription indexes, so a broadcast only visits interested clients
+        self.clients_lock = threading.Lock()
+        self.page_clients = {}
+        self.page_id_clients = {}
+        self.user_clients = {}
+        self.vterm_lock = threading.Lock()
+        self.vterm_pending = {}
+        self.vterm_thread = None
 
     def add_client(self, client):
-        self.clients.add(client)
+        page_id = (client.page, client.page_query_params.get("id", None))
+        user_id = WebSocketHelper._user_key(client.get_user_id())
+        with self.clients_lock:
+            self.clients.add(client)
+            self.page_clients.setdefault(client.page, set()).add(client)
+            self.page_id_clients.setdefault(page_id, set()).add(client)
+            self.user_clients.setdefault(user_id, set()).add(client)
 
     def remove_client(self, client):
-        self.clients.remove(client)
+        with self.clients_lock:
+            if client not in self.clients:
+                return
+            page_id = (client.page, client.page_query_params.get("id", None))
+            user_id = WebSocketHelper._user_key(client.get_user_id())
+            self.clients.remove(client)
+            WebSocketHelper._discard_indexed(self.page_clients, client.page, client)
+            WebSocketHelper._discard_indexed(self.page_id_clients, page_id, client)
+            WebSocketHelper._discard_indexed(self.user_clients, user_id, client)
+
+    @staticmethod
+    def _discard_indexed(index: dict, key, client):
+        subscribers = index.get(key)
+        if subscribers is None:
+            return
+        subscribers.discard(client)
+        if not subscribers:
+            del index[key]
+
+    @staticmethod
+    def _user_key(user_id):
+        # user ids reach the helper both as ints and as strings
+        try:
+            return int(user_id)
+        except (TypeError, ValueError):
+            return user_id
+
+    def _get_indexed(self, index: dict, key):
+        # Copied so the set can change while the broadcast is being sent
+        with self.clients_lock:
+            return list(index.get(key, ()))
+
+    def _get_user_clients(self, user_id):
+        return self._get_indexed(self.user_clients, WebSocketHelper._user_key(user_id))
+
+    def invalidate_user_auth(self, user_id):
+        """Forces the user's open connections to re-validate their token"""
+        for client in self._get_user_clients(user_id):
+            client.invalidate_auth()
 
     def send_message(self, client, event_type: str, data):
         if client.check_auth():
@@ -23,47 +84,29 @@ class WebSocketHelper:
             client.write_message_helper(message)
 
     def broadcast(self, event_type: str, data):
-        logger.debug(
-            f"Sending to {len(self.clients)} clients: "
-            f"{json.dumps({'event': event_type, 'data': data})}"
-        )
-        for client in self.clients:
-            try:
-                self.send_message(client, event_type, data)
-            except Exception as e:
-                logger.exception(
-                    f"Error caught while sending WebSocket message to "
-                    f"{client.get_remote_ip()} {e}"
-                )
+        with self.clients_lock:
+            clients = list(self.clients)
+        self.broadcast_to(clients, event_type, data)
 
     def broadcast_page(self, page: str, event_type: str, data):
-        def filter_fn(client):
-            return client.page == page
-
-        self.broadcast_with_fn(filter_fn, event_type, data)
+        clients = self._get_indexed(self.page_clients, page)
+        self.broadcast_to(clients, event_type, data)
 
     def broadcast_user(self, user_id: str, event_type: str, data):
-        def filter_fn(client):
-            return client.get_user_id() == user_id
-
-        self.broadcast_with_fn(filter_fn, event_type, data)
+        clients = self._get_user_clients(user_id)
+        self.broadcast_to(clients, event_type, data)
 
     def broadcast_user_page(self, page: str, user_id: str, event_type: str, data):
         def filter_fn(client):
-            if client.get_user_id() != user_id:
-                return False
-            if client.page != page:
-                return False
-            return True
+            return client.page == page
 
-        self.broadcast_with_fn(filter_fn, event_type, data)
+        clients = self._get_user_clients(user_id)
+        self.broadcast_to(list(filter(filter_fn, clients)), event_type, data)
 
     def broadcast_user_page_params(
         self, page: str, params: dict, user_id: str, event_type: str, data
     ):
         def filter_fn(client):
-            if client.get_user_id() != user_id:
-                return False
             if client.page != page:
                 return False
             for key, param in params.items():
@@ -71,37 +114,147 @@ class WebSocketHelper:
                     return False
             return True
 
-        self.broadcast_with_fn(filter_fn, event_type, data)
+        clients = self._get_user_clients(user_id)
+        self.broadcast_to(list(filter(filter_fn, clients)), event_type, data)
 
     def broadcast_page_params(self, page: str, params: dict, event_type: str, data):
         def filter_fn(client):
-            if client.page != page:
-                return False
             for key, param in params.items():
                 if param != client.page_query_params.get(key, None):
                     return False
             return True
 
-        self.broadcast_with_fn(filter_fn, event_type, data)
+        clients = self._get_page_params_clients(page, params)
+        self.broadcast_to(list(filter(filter_fn, clients)), event_type, data)
+
+    def _get_page_params_clients(self, page: str, params: dict):
+        if "id" in params:
+            return self._get_indexed(self.page_id_clients, (page, params["id"]))
+        return self._get_indexed(self.page_clients, page)
 
     def broadcast_with_fn(self, filter_fn, event_type: str, data):
-        clients = list(filter(filter_fn, self.clients))
+        with self.clients_lock:
+            clients = list(filter(filter_fn, self.clients))
+        self.broadcast_to(clients, event_type, data)
+
+    def broadcast_to(self, clients, event_type: str, data):
+        if not clients:
+            return
+        # serialized once and shared by every recipient
+        message = json.dumps({"event": event_type, "data": data})
         logger.debug(
             f"Sending to {len(clients)} out of {len(self.clients)} "
-            f"clients: {json.dumps({'event': event_type, 'data': data})}"
+            f"clients: {message}"
         )
 
         for client in clients:
             try:
-                self.send_message(client, event_type, data)
+                if client.check_auth():
+                    client.write_message_helper(message)
             except Exception as e:
                 logger.exception(
                     f"Error catched while sending WebSocket message to "
                     f"{client.get_remote_ip()} {e}"
                 )
 
+    def broadcast_vterm_line(self, server_id: str, line: str, seq: int = None):
+        with self.vterm_lock:
+            pending = self.vterm_pending.get(server_id)
+            if pending is None:
+                pending = self.vterm_pending[server_id] = {
+                    "lines": deque(maxlen=self.vterm_max_frame_lines),
+                    "total": 0,
+                    "first_line": seq,
+                }
+            pending["lines"].append(line)
+            pending["total"] += 1
+            # terminal history sequence numbers, so browsers can spot gaps
+            if seq is not None:
+                pending["next_line"] = seq + 1
+
+            if self.vterm_thread is None:
+                self.vterm_thread = threading.Thread(
+                    target=self.vterm_frame_sender, daemon=True, name="vterm_frames"
+                )
+                self.vterm_thread.start()
+
+    def vterm_frame_sender(self):
+        while True:
+            time.sleep(self.vterm_frame_interval)
+            with self.vterm_lock:
+                pending, self.vterm_pending = self.vterm_pending, {}
+
+            for server_id, frame in pending.items():
+                try:
+                    self.send_vterm_frame(
+                        server_id,
+                        frame["lines"],
+                        frame["total"],
+                        frame["first_line"],
+                        frame.get("next_line"),
+                    )
+                except Exception as e:
+                    logger.exception(
+                        f"Error caught while sending virtual terminal frame "
+                        f"for server {server_id} {e}"
+                    )
+
+    def send_vterm_frame(
+        self,
+        server_id: str,
+        lines,
+        total: int,
+        first_line: int = None,
+        next_line: int = None,
+    ):
+        clients = self._get_indexed(
+            self.page_id_clients, ("/panel/server_detail", server_id)
+        )
+        if not clients:
+            return
+
+        lines = list(lines)
+        skipped = total - len(lines)
+        data = {}
+        if first_line is not None and next_line is not None:
+            if skipped > 0:
+                # the frame starts after the dropped lines, so browsers see
+                # the gap and fetch them from the terminal history
+                first_line = next_line - len(lines)
+            data["first_line"] = first_line
+            data["next_line"] = next_line
+        elif skipped > 0:
+            # nothing to fetch the dropped lines again with
+            lines.insert(0, WebSocketHelper.vterm_skipped_line(skipped))
+        data["line"] = "".join(lines)
+        # serialized once and shared by every client watching this console
+        message = json.dumps({"event": "vterm_new_line", "data": data})
+        logger.debug(
+            f"Sending {len(lines)} virtual terminal lines for server {server_id} "
+            f"to {len(clients)} out of {len(self.clients)} clients"
+        )
+
+        for client in clients:
+            try:
+                if client.check_auth():
+                    client.write_vterm_frame(message, len(lines), "next_line" in data)
+            except Exception as e:
+                logger.exception(
+                    f"Error caught while sending WebSocket message to "
+                    f"{client.get_remote_ip()} {e}"
+                )
+
+    @staticmethod
+    def vterm_skipped_line(count: int):
+        return (
+            f'<span class="mc-log-warn">[Crafty] {count} console lines were '
+            f"skipped to keep up with the server</span><br />"
+        )
+
     def disconnect_all(self):
         Console.info("Disconnecting WebSocket clients")
-        for client in self.clients:
+        with self.clients_lock:
+            clients = list(self.clients)
+        for client in clients:
             client.close()
         Console.info("Disconnected WebSocket clients")
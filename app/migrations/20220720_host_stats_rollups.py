@@ -0,0 +1,42 @@
+# Generated by database migrator
+import peewee
+
+
+def migrate(migrator, database, **kwargs):
+    db = database
+
+    class HostStatsRollup(peewee.Model):
+        rollup_id = peewee.AutoField()
+        period = peewee.DateTimeField(unique=True)
+        samples = peewee.IntegerField(default=0)
+        cpu_usage_min = peewee.FloatField(default=0)
+        cpu_usage_avg = peewee.FloatField(default=0)
+        cpu_usage_max = peewee.FloatField(default=0)
+        mem_percent_min = peewee.FloatField(default=0)
+        mem_percent_avg = peewee.FloatField(default=0)
+        mem_percent_max = peewee.FloatField(default=0)
+
+        class Meta:
+            database = db
+
+    class HostStatsMinute(HostStatsRollup):
+        class Meta:
+            table_name = "host_stats_minute"
+
+    class HostStatsHour(HostStatsRollup):
+        class Meta:
+            table_name = "host_stats_hour"
+
+    migrator.create_table(HostStatsMinute)
+    migrator.create_table(HostStatsHour)
+    """
+    Write your migrations here.
+    """
+
+
+def rollback(migrator, database, **kwargs):
+    migrator.drop_table("host_stats_minute")
+    migrator.drop_table("host_stats_hour")
+    """
+    Write your rollback migrations here.
+    """
@@ -0,0 +1,19 @@
+# Generated by database migrator
+
+
+def migrate(migrator, database, **kwargs):
+    migrator.add_index("audit_log", "created")
+    migrator.add_index("audit_log", "user_id", "created")
+    migrator.add_index("audit_log", "server_id", "created")
+    """
+    Write your migrations here.
+    """
+
+
+def rollback(migrator, database, **kwargs):
+    migrator.drop_index("audit_log", "server_id", "created")
+    migrator.drop_index("audit_log", "user_id", "created")
+    migrator.drop_index("audit_log", "created")
+    """
+    Write your rollback migrations here.
+    """
@@ -0,0 +1,45 @@
+# Generated by database migrator
+import peewee
+
+
+def migrate(migrator, database, **kwargs):
+    db = database
+
+    class ServerStatsRollup(peewee.Model):
+        rollup_id = peewee.AutoField()
+        period = peewee.DateTimeField(unique=True)
+        samples = peewee.IntegerField(default=0)
+        cpu_min = peewee.FloatField(default=0)
+        cpu_avg = peewee.FloatField(default=0)
+        cpu_max = peewee.FloatField(default=0)
+        mem_percent_min = peewee.FloatField(default=0)
+        mem_percent_avg = peewee.FloatField(default=0)
+        mem_percent_max = peewee.FloatField(default=0)
+        online_min = peewee.FloatField(default=0)
+        online_avg = peewee.FloatField(default=0)
+        online_max = peewee.FloatField(default=0)
+
+        class Meta:
+            database = db
+
+    class ServerStatsMinute(ServerStatsRollup):
+        class Meta:
+            table_name = "server_stats_minute"
+
+    class ServerStatsHour(ServerStatsRollup):
+        class Meta:
+            table_name = "server_stats_hour"
+
+    migrator.create_table(ServerStatsMinute)
+    migrator.create_table(ServerStatsHour)
+    """
+    Write your migrations here.
+    """
+
+
+def rollback(migrator, database, **kwargs):
+    migrator.drop_table("server_stats_minute")
+    migrator.drop_table("server_stats_hour")
+    """
+    Write your rollback migrations here.
+    """
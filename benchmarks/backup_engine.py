@@ -0,0 +1,86 @@
+"""
+Backs up a server directory with the old zipfile loop and with BackupEngine.
+
+The old loop walks the tree twice, stats every file again and compresses on
+one thread. Reports MB/sec and archive size for both.
+
+Usage (from the repository root):
+    python -m benchmarks.backup_engine [path/to/server] [--size-mb N]
+
+Without a server directory a synthetic world of --size-mb MB is used.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from app.classes.shared.backup_engine import BackupEngine
+from app.classes.shared.helpers import Helpers
+
+
+def make_world(path, size_mb):
+    # region files are part noise and part repeated chunk data
+    rnd = random.Random(4)
+    region = os.path.join(path, "world", "region")
+    os.makedirs(region)
+    for i in range(max(1, size_mb // 8)):
+        noise = rnd.randbytes(2 * 1024 * 1024)
+        chunk = rnd.randbytes(4096) * 1536
+        with open(os.path.join(region, f"r.{i}.0.mca"), "wb") as f:
+            f.write(noise + chunk)
+
+
+def run_legacy(source, dest):
+    dir_bytes = Helpers.get_dir_size(source)
+    total_bytes = 0
+    with ZipFile(dest, "w", ZIP_DEFLATED) as zip_file:
+        for root, _dirs, files in os.walk(source, topdown=True):
+            for file in files:
+                zip_file.write(
+                    os.path.join(root, file),
+                    os.path.join(root.replace(source, "/"), file),
+                )
+                total_bytes += os.path.getsize(os.path.join(root, file))
+                round((total_bytes / dir_bytes) * 100, 2)
+    return dir_bytes
+
+
+def run_engine(source, dest):
+    entries, dir_bytes = BackupEngine.scan(source)
+    BackupEngine.write_zip(dest, entries, True, lambda *_: None)
+    return dir_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("source", nargs="?", help="server directory to back up")
+    parser.add_argument("--size-mb", type=int, default=256)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        source = args.source
+        if not source:
+            source = os.path.join(work_dir, "server")
+            make_world(source, args.size_mb)
+
+        print(f"Backing up {source} with {BackupEngine.workers} workers")
+        for name, run in (("legacy zipfile", run_legacy), ("BackupEngine", run_engine)):
+            dest = os.path.join(work_dir, f"{name.replace(' ', '_')}.zip")
+            start = time.perf_counter()
+            dir_bytes = run(source, dest)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:>15}: {elapsed:.2f}s "
+                f"({dir_bytes / elapsed / 1024 / 1024:,.1f} MB/sec, "
+                f"archive {os.path.getsize(dest) / 1024 / 1024:,.1f} MB)"
+            )
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
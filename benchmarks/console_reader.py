@@ -0,0 +1,122 @@
+"""
+Replays a captured server log through the virtual terminal reader.
+
+Compares the old byte-at-a-time reader against the block-buffered
+ServerOutBuf reader and reports lines/sec for both.
+
+Usage (from the repository root):
+    python -m benchmarks.console_reader [path/to/latest.log] [--size-mb N]
+
+Without a log file a synthetic modded-server log of --size-mb MB is used.
+"""
+import argparse
+import io
+import os
+import time
+
+from app.classes.shared.server import ServerOutBuf
+
+SAMPLE_LINES = [
+    "[12:01:33] [Server thread/INFO]: Preparing spawn area: 83%",
+    "[12:01:34] [Server thread/WARN]: Can't keep up! Is the server overloaded?",
+    "[12:01:35] [Server thread/ERROR]: Chunk generation failed at -1204, 338 "
+    "java.lang.IllegalStateException: ¯\\_(ツ)_/¯ biome source mismatch",
+    "[12:01:35] [User Authenticator #1/INFO]: UUID of player Steve is "
+    "069a79f4-44e9-4726-a5be-fca90e38aaf5",
+    "\x1b[0;32m[12:01:36] [Server thread/INFO]: Done (12.345s)! For help, "
+    'type "help"\x1b[m',
+]
+
+
+class _BenchHelper:
+    @staticmethod
+    def get_setting(key, default_return=False):
+        if key == "virtual_terminal_lines":
+            return 70
+        return default_return
+
+
+class _BenchProc:
+    def __init__(self, data):
+        self.stdout = io.BufferedReader(io.BytesIO(data))
+
+
+class LegacyOutBuf(ServerOutBuf):
+    """The pre-chunking reader: one read(1) and one decode per byte."""
+
+    def __init__(self, helper, proc, server_id):
+        super().__init__(helper, proc, server_id)
+        self.lsi = 0
+        self.line_count = 0
+
+    def process_byte(self, char):
+        if char == os.linesep[self.lsi]:
+            self.lsi += 1
+        else:
+            self.lsi = 0
+            self.line_buffer += char
+
+        if self.lsi >= len(os.linesep):
+            self.lsi = 0
+            self.process_line(self.line_buffer)
+            self.line_buffer = ""
+
+    def check(self):
+        while True:
+            char = self.proc.stdout.read(1)
+            if not char:
+                break
+            self.process_byte(char.decode("utf-8", "ignore"))
+
+    def new_line_handler(self, new_line, seq=None):
+        self.line_count += 1
+
+
+class ChunkedOutBuf(ServerOutBuf):
+    def __init__(self, helper, proc, server_id):
+        super().__init__(helper, proc, server_id)
+        self.line_count = 0
+
+    def new_line_handler(self, new_line, seq=None):
+        self.line_count += 1
+
+
+def build_synthetic_log(size_mb):
+    block = (os.linesep.join(SAMPLE_LINES) + os.linesep).encode("utf-8")
+    return block * max(1, (size_mb * 1024 * 1024) // len(block))
+
+
+def run(reader_cls, data):
+    out_buf = reader_cls(_BenchHelper(), _BenchProc(data), "bench")
+    start = time.perf_counter()
+    out_buf.check()
+    elapsed = time.perf_counter() - start
+    return out_buf.line_count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("log", nargs="?", help="captured server log to replay")
+    parser.add_argument("--size-mb", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, "rb") as f:
+            data = f.read()
+    else:
+        data = build_synthetic_log(args.size_mb)
+
+    print(f"Replaying {len(data) / 1024 / 1024:.1f} MB of console output")
+    for name, reader_cls in (
+        ("byte-at-a-time", LegacyOutBuf),
+        ("chunked", ChunkedOutBuf),
+    ):
+        lines, elapsed = run(reader_cls, data)
+        print(
+            f"{name:>15}: {lines} lines in {elapsed:.2f}s "
+            f"({lines / elapsed:,.0f} lines/sec)"
+        )
+
+
+if __name__ == "__main__":
+    main()
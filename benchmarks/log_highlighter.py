@@ -0,0 +1,101 @@
+"""
+Colours a server log with the old and the new console highlighter.
+
+Compares the old per-line list of re.sub calls against LogHighlighter, both
+line by line (live console) and in one batch (full log view), and reports
+lines/sec for each.
+
+Usage (from the repository root):
+    python -m benchmarks.log_highlighter [path/to/latest.log] [--lines N]
+
+Without a log file a synthetic log of --lines lines is used.
+"""
+import argparse
+import html
+import re
+import time
+
+from app.classes.shared.log_highlighter import LogHighlighter
+from benchmarks.console_reader import SAMPLE_LINES
+
+KEYWORDS = ["help", "chunk"]
+
+
+def legacy_log_colors(line, user_keywords):
+    """The pre-LogHighlighter Helpers.log_colors."""
+    replacements = [
+        (r"(\[.+?/INFO\])", r'<span class="mc-log-info">\1</span>'),
+        (r"(\[.+?/WARN\])", r'<span class="mc-log-warn">\1</span>'),
+        (r"(\[.+?/ERROR\])", r'<span class="mc-log-error">\1</span>'),
+        (r"(\[.+?/FATAL\])", r'<span class="mc-log-fatal">\1</span>'),
+        (
+            r"(\w+?\[/\d+?\.\d+?\.\d+?\.\d+?\:\d+?\])",
+            r'<span class="mc-log-keyword">\1</span>',
+        ),
+        (r"\[(\d\d:\d\d:\d\d)\]", r'<span class="mc-log-time">[\1]</span>'),
+        (r"(\[.+? INFO\])", r'<span class="mc-log-info">\1</span>'),
+        (r"(\[.+? WARN\])", r'<span class="mc-log-warn">\1</span>'),
+        (r"(\[.+? ERROR\])", r'<span class="mc-log-error">\1</span>'),
+        (r"(\[.+? FATAL\])", r'<span class="mc-log-fatal">\1</span>'),
+    ]
+    for keyword in user_keywords:
+        # pylint: disable=consider-using-f-string
+        replacements.append(
+            (r"({})".format(keyword), r'<span class="mc-log-keyword">\1</span>')
+        )
+    for old, new in replacements:
+        line = re.sub(old, new, line, flags=re.IGNORECASE)
+    return line
+
+
+def legacy_strip(line):
+    line = re.sub("(\033\\[(0;)?[0-9]*[A-z]?(;[0-9])?m?)", "", line)
+    return re.sub("[A-z]{2}\b\b", "", line)
+
+
+def run_legacy(lines):
+    return [legacy_log_colors(html.escape(legacy_strip(x)), KEYWORDS) for x in lines]
+
+
+def run_per_line(lines):
+    highlighter = LogHighlighter()
+    return [
+        highlighter.highlight(
+            html.escape(LogHighlighter.strip_console_codes(x)), KEYWORDS
+        )
+        for x in lines
+    ]
+
+
+def run_batch(lines):
+    highlighter = LogHighlighter()
+    escaped = [html.escape(LogHighlighter.strip_console_codes(x)) for x in lines]
+    return highlighter.highlight_lines(escaped, KEYWORDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("log", nargs="?", help="server log to colour")
+    parser.add_argument("--lines", type=int, default=50000)
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, "r", encoding="utf-8", errors="ignore") as f:
+            lines = f.read().splitlines()
+    else:
+        lines = (SAMPLE_LINES * (args.lines // len(SAMPLE_LINES) + 1))[: args.lines]
+
+    print(f"Colouring {len(lines)} log lines")
+    for name, run in (
+        ("legacy re.sub", run_legacy),
+        ("per line", run_per_line),
+        ("batch", run_batch),
+    ):
+        start = time.perf_counter()
+        run(lines)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>15}: {elapsed:.2f}s ({len(lines) / elapsed:,.0f} lines/sec)")
+
+
+if __name__ == "__main__":
+    main()
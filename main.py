@@ -196,7 +196,7 @@ if __name__ == "__main__":
 
         project_root = os.path.dirname(__file__)
         controller.set_project_root(project_root)
-        controller.clear_unexecuted_commands()
+        controller.command_bus.replay()
         controller.clear_support_status()
 
     crafty_prompt = MainPrompt(
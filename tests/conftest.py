@@ -0,0 +1,13 @@
+import peewee
+import pytest
+
+from app.classes.models.base_model import database_proxy
+
+
+@pytest.fixture
+def database():
+    """An empty in-memory Crafty database, tests create the tables they use."""
+    db = peewee.SqliteDatabase(":memory:")
+    database_proxy.initialize(db)
+    yield db
+    db.close()
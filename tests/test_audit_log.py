@@ -0,0 +1,68 @@
+import datetime
+import gzip
+import json
+import types
+
+import pytest
+
+from app.classes.models.management import AuditLog, HelpersManagement
+
+START = datetime.datetime(2022, 7, 20, 12, 0)
+
+
+@pytest.fixture
+def audit_log(database):
+    database.create_tables([AuditLog])
+    # pairs of entries share a timestamp, so paging must break the tie by id
+    for i in range(10):
+        AuditLog.create(
+            created=START + datetime.timedelta(minutes=i // 2),
+            user_id=i % 2,
+            server_id=1,
+            log_msg=f"entry {i}",
+        )
+    return database
+
+
+def read_all(**filters):
+    pages = []
+    cursor = None
+    while True:
+        rows, cursor = HelpersManagement.get_actity_log(
+            limit=3, before=cursor, **filters
+        )
+        pages.append([row["log_msg"] for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_entry_once(audit_log):
+    pages = read_all()
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    assert sum(pages, []) == [f"entry {i}" for i in reversed(range(10))]
+
+
+def test_filters(audit_log):
+    assert sum(read_all(user_id=1), []) == [f"entry {i}" for i in (9, 7, 5, 3, 1)]
+    assert read_all(server_id=2) == [[]]
+    assert read_all(text="entry 4") == [["entry 4"]]
+
+
+def test_bad_cursor(audit_log):
+    with pytest.raises(ValueError):
+        HelpersManagement.get_actity_log(before="not a cursor")
+
+
+def test_prune_moves_old_entries_to_the_archive(audit_log, tmp_path):
+    helper = types.SimpleNamespace(root_dir=str(tmp_path), get_setting=lambda key: 4)
+    management = HelpersManagement(audit_log, helper)
+
+    assert management.prune_audit_log() == 6
+    assert management.prune_audit_log() == 0
+    kept = [row.log_msg for row in AuditLog.select().order_by(AuditLog.audit_id)]
+    assert kept == ["entry 6", "entry 7", "entry 8", "entry 9"]
+
+    archive = tmp_path / HelpersManagement.audit_archive_file
+    with gzip.open(archive, "rt", encoding="utf-8") as f:
+        archived = [json.loads(line)["log_msg"] for line in f]
+    assert archived == [f"entry {i}" for i in range(6)]
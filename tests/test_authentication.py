@@ -0,0 +1,49 @@
+import collections
+import datetime
+import threading
+
+import pytest
+
+from app.classes.controllers.users_controller import UsersController
+from app.classes.models.roles import Roles
+from app.classes.models.users import ApiKeys, HelperUsers, UserRoles, Users
+from app.classes.shared.authentication import Authentication
+
+
+@pytest.fixture
+def authentication(database):
+    database.create_tables([Users, Roles, UserRoles, ApiKeys])
+    Users.create(
+        user_id=1,
+        username="steve",
+        password="",
+        valid_tokens_from=datetime.datetime.now() - datetime.timedelta(minutes=1),
+    )
+    auth = Authentication.__new__(Authentication)
+    auth.helper = None
+    auth.cache = collections.OrderedDict()
+    auth.cache_lock = threading.Lock()
+    auth.secret = "0123456789abcdef0123456789abcdef"
+    return auth
+
+
+def test_verified_tokens_are_cached(authentication):
+    token = authentication.generate(1)
+    assert authentication.check(token)[2]["username"] == "steve"
+    Users.update(username="alex").where(Users.user_id == 1).execute()
+    assert authentication.check(token)[2]["username"] == "steve"
+    authentication.invalidate_user(1)
+    assert authentication.check(token)[2]["username"] == "alex"
+
+
+def test_user_setters_drop_the_cached_user(authentication):
+    users = UsersController(None, HelperUsers(None, None), authentication)
+    token = authentication.generate(1)
+    assert not authentication.check(token)[2]["preparing"]
+
+    users.set_prepare(1)
+    assert authentication.check(token)[2]["preparing"]
+    users.stop_prepare(1)
+    assert not authentication.check(token)[2]["preparing"]
+    users.update_server_order(1, "3,1,2")
+    assert authentication.check(token)[2]["server_order"] == "3,1,2"
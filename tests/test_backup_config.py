@@ -0,0 +1,44 @@
+import pytest
+
+from app.classes.models.management import Backups, HelpersManagement
+from app.classes.models.servers import Servers
+
+
+@pytest.fixture
+def management(database):
+    database.create_tables([Servers, Backups])
+    Servers.create(server_id=1)
+    return HelpersManagement(database, None)
+
+
+def test_new_config(management):
+    management.set_backup_config(1, max_backups=3, excluded_dirs=["logs"])
+    conf = HelpersManagement.get_backup_config(1)
+    assert conf["max_backups"] == 3
+    assert conf["excluded_dirs"] == "logs"
+    assert not conf["compress"] and not conf["incremental"] and not conf["live"]
+
+
+def test_settings_not_passed_are_kept(management):
+    management.set_backup_config(
+        1, max_backups=3, compress=True, shutdown=True, incremental=True, live=True
+    )
+    management.set_backup_config(1, excluded_dirs=["logs", "cache"])
+    conf = HelpersManagement.get_backup_config(1)
+    assert conf["max_backups"] == 3
+    assert conf["compress"] and conf["shutdown"]
+    assert conf["incremental"] and conf["live"]
+
+    management.set_backup_config(1, live=False)
+    conf = HelpersManagement.get_backup_config(1)
+    assert conf["incremental"] and not conf["live"]
+
+
+def test_excluded_dirs_keep_backup_mode(management):
+    management.set_backup_config(1, max_backups=0, incremental=True, live=True)
+    management.add_excluded_backup_dir(1, "world/region")
+    management.add_excluded_backup_dir(1, "logs")
+    management.del_excluded_backup_dir(1, "world/region")
+    assert HelpersManagement.get_excluded_backup_dirs(1) == ["logs"]
+    conf = HelpersManagement.get_backup_config(1)
+    assert conf["incremental"] and conf["live"]
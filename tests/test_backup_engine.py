@@ -0,0 +1,58 @@
+import os
+import zipfile
+
+import pytest
+
+from app.classes.shared.backup_engine import BackupEngine
+
+
+def write(path, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@pytest.fixture
+def server_dir(tmp_path):
+    root = str(tmp_path / "server")
+    # compressible data spanning several blocks, then random data
+    write(os.path.join(root, "world", "region", "r.0.0.mca"), b"chunk" * 3000)
+    write(os.path.join(root, "world", "level.dat"), os.urandom(10000))
+    write(os.path.join(root, "logs", "latest.log"), b"log line\n")
+    write(os.path.join(root, "server.properties"), b"motd=hi\n")
+    write(os.path.join(root, "empty.txt"), b"")
+    write(os.path.join(root, "crafty.sqlite"), b"db")
+    return root
+
+
+def test_scan(server_dir):
+    entries, total_bytes = BackupEngine.scan(
+        server_dir, excluded_dirs=[os.path.join(server_dir, "logs")]
+    )
+    assert [entry.arcname for entry in entries] == [
+        "empty.txt",
+        "server.properties",
+        "world/level.dat",
+        "world/region/r.0.0.mca",
+    ]
+    assert total_bytes == sum(entry.stat.st_size for entry in entries)
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_write_zip_round_trip(tmp_path, server_dir, monkeypatch, compress):
+    monkeypatch.setattr(BackupEngine, "block_size", 4096)
+    entries, total_bytes = BackupEngine.scan(server_dir)
+    progress = []
+    path = str(tmp_path / "backup.zip")
+
+    BackupEngine.write_zip(path, entries, compress, lambda *args: progress.append(args))
+
+    with zipfile.ZipFile(path) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.namelist() == [entry.arcname for entry in entries]
+        for entry in entries:
+            with open(entry.path, "rb") as f:
+                assert zip_file.read(entry.arcname) == f.read()
+            expected = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            assert zip_file.getinfo(entry.arcname).compress_type == expected
+    assert progress[-1] == (total_bytes, len(entries))
@@ -0,0 +1,101 @@
+import os
+import threading
+import zipfile
+
+from app.classes.shared.backup_engine import BackupEngine
+from app.classes.shared.backup_store import DedupStore
+
+
+def write(path, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def snapshot(store, server_dir, name):
+    entries, total_bytes = BackupEngine.scan(server_dir)
+    return store.create_snapshot(
+        os.path.join(store.backup_path, name), entries, total_bytes
+    )
+
+
+def chunk_count(store):
+    return sum(len(files) for _, _, files in os.walk(store.chunks_path))
+
+
+def test_restore_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(DedupStore, "chunk_size", 1024)
+    server_dir = str(tmp_path / "server")
+    write(os.path.join(server_dir, "world", "level.dat"), os.urandom(5000))
+    write(os.path.join(server_dir, "server.properties"), b"motd=hi\n")
+    write(os.path.join(server_dir, "empty.txt"), b"")
+    store = DedupStore(str(tmp_path / "backups"))
+
+    manifest = snapshot(store, server_dir, "first")
+    restored = tmp_path / "restored"
+    store.restore(manifest, str(restored))
+    for name in ("world/level.dat", "server.properties", "empty.txt"):
+        with open(os.path.join(server_dir, name), "rb") as original:
+            assert (restored / name).read_bytes() == original.read()
+
+
+def test_unchanged_data_is_stored_once(tmp_path):
+    server_dir = str(tmp_path / "server")
+    write(os.path.join(server_dir, "a.bin"), b"x" * 100)
+    write(os.path.join(server_dir, "b.bin"), b"x" * 100)
+    store = DedupStore(str(tmp_path / "backups"))
+
+    first = snapshot(store, server_dir, "first")
+    assert DedupStore.read_header(first)["files"] == 2
+    assert chunk_count(store) == 1
+    second = snapshot(store, server_dir, "second")
+    assert DedupStore.read_header(second)["new_bytes"] == 0
+    assert chunk_count(store) == 1
+
+
+def test_collect_garbage(tmp_path):
+    server_dir = str(tmp_path / "server")
+    write(os.path.join(server_dir, "a.bin"), b"old")
+    store = DedupStore(str(tmp_path / "backups"))
+    first = snapshot(store, server_dir, "first")
+    write(os.path.join(server_dir, "a.bin"), b"new data")
+    second = snapshot(store, server_dir, "second")
+    assert chunk_count(store) == 2
+
+    store.remove_snapshot(first)
+    assert chunk_count(store) == 1
+    assert store.collect_garbage() == 0
+    store.restore(second, str(tmp_path / "restored"))
+    assert (tmp_path / "restored" / "a.bin").read_bytes() == b"new data"
+
+
+def test_iter_zip(tmp_path, monkeypatch):
+    monkeypatch.setattr(DedupStore, "chunk_size", 1024)
+    server_dir = str(tmp_path / "server")
+    data = os.urandom(3000)
+    write(os.path.join(server_dir, "world", "level.dat"), data)
+    write(os.path.join(server_dir, "eula.txt"), b"eula=true\n")
+    store = DedupStore(str(tmp_path / "backups"))
+    manifest = snapshot(store, server_dir, "first")
+
+    pieces = store.iter_zip(manifest)
+    assert next(pieces)
+    # a backup on another thread doesn't wait for the zip to be sent
+    acquired = []
+
+    def backup():
+        acquired.append(store.lock.acquire(blocking=False))
+        store.lock.release()
+
+    thread = threading.Thread(target=backup)
+    thread.start()
+    thread.join()
+    assert acquired == [True]
+    pieces.close()
+
+    zip_path = tmp_path / "first.zip"
+    zip_path.write_bytes(b"".join(store.iter_zip(manifest)))
+    with zipfile.ZipFile(zip_path) as zip_file:
+        assert zip_file.testzip() is None
+        assert sorted(zip_file.namelist()) == ["eula.txt", "world/level.dat"]
+        assert zip_file.read("world/level.dat") == data
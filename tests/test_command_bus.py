@@ -0,0 +1,86 @@
+import datetime
+import threading
+import types
+
+import peewee
+import pytest
+
+from app.classes.models.base_model import database_proxy
+from app.classes.models.management import Commands, HelpersManagement
+from app.classes.models.servers import Servers
+from app.classes.models.users import Users
+from app.classes.shared.command_bus import CommandBus
+
+
+@pytest.fixture
+def commands_db(tmp_path):
+    # a file, as the bus workers use their own connections
+    db = peewee.SqliteDatabase(str(tmp_path / "crafty.sqlite"))
+    database_proxy.initialize(db)
+    db.create_tables([Servers, Users, Commands])
+    Servers.create(server_id=1)
+    Servers.create(server_id=2)
+    Users.create(user_id=1, username="admin")
+    yield db
+    db.close()
+
+
+class FakeServers:
+    def __init__(self):
+        self.sent = []
+        self.done = threading.Semaphore(0)
+
+    def get_server_instance_by_id(self, server_id):
+        def send_command(command):
+            self.sent.append((server_id, command))
+            self.done.release()
+
+        return types.SimpleNamespace(send_command=send_command)
+
+    def wait(self, count):
+        for _ in range(count):
+            assert self.done.acquire(timeout=5)
+
+
+def executed():
+    return [
+        cmd.command
+        for cmd in Commands.select()
+        .where(Commands.executed == 1)
+        .order_by(Commands.command_id)
+    ]
+
+
+def test_commands_run_in_order_per_server(commands_db):
+    servers = FakeServers()
+    bus = CommandBus(servers)
+    bus.start()
+    for i in range(5):
+        bus.add_command(1, 1, "127.0.0.1", f"say {i}")
+    bus.add_command(2, 1, "127.0.0.1", "say other")
+    servers.wait(6)
+
+    assert [cmd for sid, cmd in servers.sent if sid == 1] == [
+        f"say {i}" for i in range(5)
+    ]
+    assert (2, "say other") in servers.sent
+
+
+def test_replay(commands_db):
+    stale = datetime.datetime.now() - datetime.timedelta(
+        seconds=CommandBus.replay_max_age + 60
+    )
+    Commands.create(server_id=1, user=1, command="say stale", created=stale)
+    recent_id = HelpersManagement.add_command(1, 1, "127.0.0.1", "say recent")
+    servers = FakeServers()
+    bus = CommandBus(servers)
+
+    bus.replay()
+    # the stale command is dropped, and replaying again queues nothing twice
+    assert executed() == ["say stale"]
+    bus.replay()
+    assert [cmd.command_id for cmd in bus.queues[1]] == [recent_id]
+
+    bus.start()
+    servers.wait(1)
+    assert servers.sent == [(1, "say recent")]
@@ -0,0 +1,165 @@
+import io
+import os
+import shutil
+import tempfile
+import types
+import zipfile
+from unittest import mock
+
+import pytest
+import tornado.web
+from tornado.simple_httpclient import HTTPStreamClosedError
+from tornado.testing import AsyncHTTPTestCase
+
+from app.classes.shared.backup_engine import BackupEngine
+from app.classes.shared.backup_store import DedupStore
+from app.classes.shared.helpers import Helpers
+from app.classes.web import panel_handler
+from app.classes.web.panel_handler import PanelHandler
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-99", (0, 100)),
+        ("bytes=10-", (10, 1000)),
+        ("bytes=-100", (900, 1000)),
+        ("bytes=-5000", (0, 1000)),
+        ("bytes=990-5000", (990, 1000)),
+        ("bytes=5-4", None),
+        ("bytes=0-1,5-6", None),
+        ("items=0-1", None),
+        ("bytes=a-b", None),
+        ("bytes=-", None),
+    ],
+)
+def test_parse_byte_range(header, expected):
+    assert Helpers.parse_byte_range(header, 1000) == expected
+
+
+def test_parse_byte_range_unsatisfiable():
+    with pytest.raises(ValueError):
+        Helpers.parse_byte_range("bytes=1000-", 1000)
+
+
+class DownloadHandler(tornado.web.RequestHandler):
+    download_file = PanelHandler.download_file
+
+    def initialize(self, path):
+        self.path = path
+
+    async def get(self):
+        await self.download_file("file.bin", self.path)
+
+
+class TestDownloadFile(AsyncHTTPTestCase):
+    data = bytes(range(256)) * 64
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "file.bin")
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def get_app(self):
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+        return tornado.web.Application([(r"/", DownloadHandler, {"path": self.path})])
+
+    def test_whole_file(self):
+        response = self.fetch("/")
+        assert response.code == 200
+        assert response.body == self.data
+
+    def test_range(self):
+        response = self.fetch("/", headers={"Range": "bytes=100-199"})
+        assert response.code == 206
+        assert response.headers["Content-Range"] == f"bytes 100-199/{len(self.data)}"
+        assert response.body == self.data[100:200]
+
+    def test_stale_if_range_sends_everything(self):
+        response = self.fetch(
+            "/", headers={"Range": "bytes=100-199", "If-Range": '"stale"'}
+        )
+        assert response.code == 200
+        assert response.body == self.data
+
+    def test_unsatisfiable_range(self):
+        response = self.fetch("/", headers={"Range": "bytes=999999-"})
+        assert response.code == 416
+
+    def test_short_read_drops_the_connection(self):
+        real_stat = os.stat
+
+        def grown_stat(path):
+            result = real_stat(path)
+            return types.SimpleNamespace(
+                st_size=result.st_size + 10,
+                st_mtime=result.st_mtime,
+                st_mtime_ns=result.st_mtime_ns,
+            )
+
+        with mock.patch.object(panel_handler.os, "stat", grown_stat):
+            # closed by the handler, not by tornado failing the finish() call
+            with self.assertNoLogs("tornado.application", "ERROR"):
+                with pytest.raises(HTTPStreamClosedError):
+                    self.fetch("/")
+
+
+class BackupZipHandler(tornado.web.RequestHandler):
+    download_backup_zip = PanelHandler.download_backup_zip
+
+    def initialize(self, store, manifest):
+        self.store = store
+        self.manifest = manifest
+
+    async def get(self):
+        await self.download_backup_zip("backup.zip", self.store, self.manifest)
+
+
+class TestDownloadBackupZip(AsyncHTTPTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        server_dir = os.path.join(self.tmpdir, "server")
+        os.makedirs(os.path.join(server_dir, "world"))
+        self.data = os.urandom(3 * DedupStore.chunk_size + 10)
+        with open(os.path.join(server_dir, "world", "level.dat"), "wb") as f:
+            f.write(self.data)
+        self.store = DedupStore(os.path.join(self.tmpdir, "backups"))
+        entries, total_bytes = BackupEngine.scan(server_dir)
+        self.manifest = self.store.create_snapshot(
+            os.path.join(self.store.backup_path, "backup"), entries, total_bytes
+        )
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def get_app(self):
+        return tornado.web.Application(
+            [(r"/", BackupZipHandler, {"store": self.store, "manifest": self.manifest})]
+        )
+
+    def test_zip_is_streamed(self):
+        response = self.fetch("/")
+        assert response.code == 200
+        assert "Content-Length" not in response.headers
+        with zipfile.ZipFile(io.BytesIO(response.body)) as zip_file:
+            assert zip_file.testzip() is None
+            assert zip_file.read("world/level.dat") == self.data
+        # nothing was left next to the backups
+        assert sorted(os.listdir(self.store.backup_path)) == [
+            DedupStore.store_dir,
+            "backup" + DedupStore.manifest_suffix,
+        ]
+
+    def test_missing_chunk_drops_the_connection(self):
+        record = next(DedupStore.read_files(self.manifest))
+        os.remove(self.store.chunk_path(record["chunks"][-1]))
+        with self.assertNoLogs("tornado.application", "ERROR"):
+            with pytest.raises(HTTPStreamClosedError):
+                self.fetch("/")
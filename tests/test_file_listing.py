@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from app.classes.shared.file_listing import FileListing
+
+
+@pytest.fixture
+def directory(tmp_path):
+    FileListing.cache.clear()
+    for name in ("world", "Plugins", "logs"):
+        (tmp_path / name).mkdir()
+    for i, name in enumerate(("b.txt", "A.txt", "c.jar", "crafty.sqlite")):
+        path = tmp_path / name
+        path.write_bytes(b"x" * (10 - i))
+        os.utime(path, (1000 + i, 1000 + i))
+    return tmp_path
+
+
+def read_pages(path, **kwargs):
+    names = []
+    cursor = None
+    while True:
+        page = FileListing.list_dir(str(path), cursor=cursor, limit=2, **kwargs)
+        names.extend(entry.name for entry in page.entries)
+        cursor = page.next_cursor
+        if cursor is None:
+            return names
+
+
+def test_folders_first_then_files(directory):
+    page = FileListing.list_dir(str(directory))
+    assert [entry.name for entry in page.entries] == [
+        "logs",
+        "Plugins",
+        "world",
+        "A.txt",
+        "b.txt",
+        "c.jar",
+    ]
+    assert page.next_cursor is None and page.total == 6
+
+
+@pytest.mark.parametrize("sort", FileListing.SORTS)
+@pytest.mark.parametrize("reverse", [False, True])
+def test_pages_match_the_whole_listing(directory, sort, reverse):
+    whole = FileListing.list_dir(str(directory), sort=sort, reverse=reverse)
+    assert read_pages(directory, sort=sort, reverse=reverse) == [
+        entry.name for entry in whole.entries
+    ]
+
+
+def test_pages_survive_new_files(directory):
+    first = FileListing.list_dir(str(directory), limit=4)
+    (directory / "0_new.txt").write_bytes(b"")
+    rest = FileListing.list_dir(str(directory), cursor=first.next_cursor)
+    # the new file sorts before the cursor, so nothing is repeated or skipped
+    names = [entry.name for entry in first.entries + rest.entries]
+    assert names == ["logs", "Plugins", "world", "A.txt", "b.txt", "c.jar"]
+
+
+def test_bad_cursor(directory):
+    page = FileListing.list_dir(str(directory), limit=2)
+    with pytest.raises(ValueError):
+        FileListing.list_dir(str(directory), cursor="garbage")
+    with pytest.raises(ValueError):
+        FileListing.list_dir(str(directory), sort="size", cursor=page.next_cursor)
+    with pytest.raises(ValueError):
+        FileListing.list_dir(str(directory), sort="colour")
@@ -0,0 +1,90 @@
+import datetime
+import json
+import types
+from unittest import mock
+
+import peewee
+import tornado.web
+from tornado.testing import AsyncHTTPTestCase
+
+from app.classes.controllers.management_controller import ManagementController
+from app.classes.models.base_model import database_proxy
+from app.classes.models.management import HostStats, HostStatsHour, HostStatsMinute
+from app.classes.web.routes.api.crafty.stats.host import (
+    ApiCraftyStatsHostHistoryHandler,
+)
+
+
+def auth_data(superuser):
+    return [], [], {"user_id": 1}, superuser, {}
+
+
+class TestHostStatsHistory(AsyncHTTPTestCase):
+    def setUp(self):
+        self.database = peewee.SqliteDatabase(":memory:")
+        database_proxy.initialize(self.database)
+        self.database.create_tables([HostStats, HostStatsMinute, HostStatsHour])
+        self.now = datetime.datetime.now()
+        HostStats.create(
+            time=self.now - datetime.timedelta(minutes=5), cpu_usage=10, mem_percent=20
+        )
+        HostStatsHour.create(
+            period=self.now - datetime.timedelta(days=30),
+            samples=60,
+            cpu_usage_min=1,
+            cpu_usage_avg=2,
+            cpu_usage_max=3,
+        )
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.database.close()
+
+    def get_app(self):
+        handler_args = {
+            "helper": types.SimpleNamespace(get_setting=lambda key: 1),
+            "controller": types.SimpleNamespace(management=ManagementController),
+        }
+        return tornado.web.Application(
+            [
+                (
+                    r"/api/v2/crafty/stats/host/history/?",
+                    ApiCraftyStatsHostHistoryHandler,
+                    handler_args,
+                )
+            ]
+        )
+
+    def get_history(self, query="", superuser=True):
+        with mock.patch.object(
+            ApiCraftyStatsHostHistoryHandler,
+            "authenticate_user",
+            lambda handler: auth_data(superuser),
+        ):
+            response = self.fetch(f"/api/v2/crafty/stats/host/history{query}")
+        return response.code, json.loads(response.body)
+
+    def test_recent_history_is_raw(self):
+        start = (self.now - datetime.timedelta(hours=1)).timestamp()
+        code, body = self.get_history(f"?from={start}")
+        assert code == 200
+        assert [row["cpu_usage_avg"] for row in body["data"]] == [10]
+        assert [row["mem_percent_max"] for row in body["data"]] == [20]
+
+    def test_old_history_is_hourly(self):
+        start = (self.now - datetime.timedelta(days=60)).timestamp()
+        code, body = self.get_history(f"?from={start}")
+        assert code == 200
+        assert [row["samples"] for row in body["data"]] == [60]
+        assert body["data"][0]["cpu_usage_avg"] == 2
+
+    def test_bad_range(self):
+        assert self.get_history("?from=tomorrow")[0] == 400
+        now = self.now.timestamp()
+        assert self.get_history(f"?from={now}&to={now - 60}")[0] == 400
+
+    def test_superuser_only(self):
+        code, body = self.get_history(superuser=False)
+        assert code == 400
+        assert body["error"] == "NOT_AUTHORIZED"
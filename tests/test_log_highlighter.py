@@ -0,0 +1,52 @@
+from app.classes.shared.log_highlighter import LogHighlighter
+
+
+def test_levels_and_time():
+    line = "[12:00:00] [Server thread/WARN]: Can't keep up!"
+    assert LogHighlighter().highlight(line, []) == (
+        '<span class="mc-log-time">[12:00:00]</span> '
+        '<span class="mc-log-warn">[Server thread/WARN]</span>: Can\'t keep up!'
+    )
+
+
+def test_keywords():
+    assert LogHighlighter().highlight("Steve joined the game", ["steve"]) == (
+        '<span class="mc-log-keyword">Steve</span> joined the game'
+    )
+
+
+def test_wrapped_text_is_not_wrapped_again():
+    highlighted = LogHighlighter().highlight("[Server thread/INFO]", ["INFO"])
+    assert highlighted == '<span class="mc-log-info">[Server thread/INFO]</span>'
+
+
+def test_invalid_keyword_is_taken_literally():
+    assert LogHighlighter().highlight("a (b", ["(b"]) == (
+        'a <span class="mc-log-keyword">(b</span>'
+    )
+
+
+def test_keyword_that_breaks_the_alternation_is_taken_literally():
+    highlighter = LogHighlighter()
+    # each is a valid pattern on its own
+    keywords = ["(?i)foo", "(?P<level>bar)", "(?P<x>a)", "(?P<x>b)"]
+    assert highlighter.highlight("foo (?i)foo", keywords) == (
+        'foo <span class="mc-log-keyword">(?i)foo</span>'
+    )
+    assert highlighter.highlight("b", keywords) == "b"
+
+
+def test_highlight_lines_matches_highlight():
+    highlighter = LogHighlighter()
+    lines = ["[12:00:00] [Server thread/ERROR]: boom", "Steve left", ""]
+    assert highlighter.highlight_lines(lines, ["steve"]) == [
+        highlighter.highlight(line, ["steve"]) for line in lines
+    ]
+
+
+def test_keyword_matching_a_newline():
+    highlighter = LogHighlighter()
+    lines = ["a", "b"]
+    assert highlighter.highlight_lines(lines, [r"a\s*b?"]) == [
+        highlighter.highlight(line, [r"a\s*b?"]) for line in lines
+    ]
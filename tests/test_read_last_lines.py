@@ -0,0 +1,43 @@
+import pytest
+
+from app.classes.shared.helpers import Helpers
+
+CONTENTS = [
+    "",
+    "\n",
+    "one",
+    "one\n",
+    "one\ntwo\nthree",
+    "one\ntwo\nthree\n",
+    "\n\nblank lines\n\n",
+    "ünïcödé\nlines\n",
+    "\r\nwindows\r\nlines\r\n",
+]
+
+
+@pytest.fixture(params=[1, 3, 4096])
+def block_size(request, monkeypatch):
+    monkeypatch.setattr(Helpers, "tail_block_size", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("contents", CONTENTS)
+@pytest.mark.parametrize("number_lines", [0, 1, 2, 3, 10])
+def test_read_last_lines(tmp_path, block_size, contents, number_lines):
+    path = tmp_path / "log.txt"
+    path.write_bytes(contents.encode("utf-8"))
+
+    expected = contents.splitlines(keepends=True)
+    expected = expected[-number_lines:] if number_lines else []
+    assert Helpers.read_last_lines(str(path), number_lines) == expected
+
+
+def test_read_last_lines_stops_at_max_bytes(tmp_path, monkeypatch):
+    monkeypatch.setattr(Helpers, "tail_block_size", 4)
+    monkeypatch.setattr(Helpers, "tail_max_bytes", 8)
+    path = tmp_path / "log.txt"
+    path.write_text("a" * 100 + "\nlast\n")
+
+    lines = Helpers.read_last_lines(str(path), 2)
+    assert lines[-1] == "last\n"
+    assert sum(len(line) for line in lines) <= 8
@@ -0,0 +1,54 @@
+import pytest
+
+from app.classes.models.roles import HelperRoles, Roles
+from app.classes.models.server_permissions import PermissionsServers, RoleServers
+from app.classes.models.servers import Servers
+from app.classes.models.users import HelperUsers, UserRoles, Users
+
+
+@pytest.fixture
+def permissions_db(database):
+    database.create_tables([Servers, Users, Roles, UserRoles, RoleServers])
+    PermissionsServers.user_permissions.clear()
+    for server_id in (1, 2, 3):
+        Servers.create(server_id=server_id)
+    Users.create(user_id=1, username="user")
+    Users.create(user_id=2, username="admin", superuser=True)
+    role_id = HelperRoles.add_role("players")
+    HelperUsers.add_role_to_user(1, role_id)
+    PermissionsServers.get_or_create(role_id, 1, "10000000")
+    PermissionsServers.get_or_create(role_id, 2, "11000000")
+    return database
+
+
+@pytest.fixture
+def queries(permissions_db, monkeypatch):
+    executed = []
+    execute_sql = permissions_db.execute_sql
+
+    def counting_execute_sql(sql, *args, **kwargs):
+        executed.append(sql)
+        return execute_sql(sql, *args, **kwargs)
+
+    monkeypatch.setattr(permissions_db, "execute_sql", counting_execute_sql)
+    return executed
+
+
+def test_masks(permissions_db):
+    mask = PermissionsServers.get_user_id_permissions_mask
+    assert mask(1, "1") == "10000000"
+    assert mask(1, 2) == "11000000"
+    assert mask(1, 3) == "00000000"
+    assert mask(1, "not a server") == "00000000"
+    assert mask(2, 3) == "11111111"
+
+
+def test_cached_until_permissions_change(permissions_db, queries):
+    PermissionsServers.get_user_id_permissions_mask(1, 1)
+    assert queries
+    queries.clear()
+    PermissionsServers.get_user_id_permissions_mask(1, 2)
+    assert not queries
+
+    PermissionsServers.update_role_permission(1, 2, "11100000")
+    assert PermissionsServers.get_user_id_permissions_mask(1, 2) == "11100000"
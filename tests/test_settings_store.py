@@ -0,0 +1,43 @@
+import json
+import os
+
+from app.classes.shared.settings_store import SettingsStore
+
+
+def make_store(tmp_path, settings):
+    settings_file = tmp_path / "config.json"
+    settings_file.write_text(json.dumps(settings), encoding="utf-8")
+    return SettingsStore(str(settings_file)), settings_file
+
+
+def test_reads_are_served_from_memory(tmp_path):
+    store, _ = make_store(tmp_path, {"http_port": 8000, "keywords": ["a"]})
+    for _ in range(5):
+        assert store.get("http_port") == 8000
+    assert store.get_read_stats() == {"disk_reads": 1, "disk_reads_saved": 4}
+
+
+def test_returned_lists_are_copies(tmp_path):
+    store, _ = make_store(tmp_path, {"keywords": ["a"]})
+    store.get("keywords").append("b")
+    assert store.get("keywords") == ["a"]
+
+
+def test_set_writes_through(tmp_path):
+    store, settings_file = make_store(tmp_path, {"http_port": 8000})
+    assert store.set("http_port", 9000)
+    assert not store.set("missing", 1)
+    assert store.get("http_port") == 9000
+    assert json.loads(settings_file.read_text(encoding="utf-8"))["http_port"] == 9000
+    assert store.get_read_stats()["disk_reads"] == 1
+
+
+def test_reloads_when_the_file_changes(tmp_path):
+    store, settings_file = make_store(tmp_path, {"http_port": 8000})
+    assert store.get("http_port") == 8000
+    settings_file.write_text(json.dumps({"http_port": 8443}), encoding="utf-8")
+    # same size, so only the mtime tells the change apart
+    stat = os.stat(settings_file)
+    os.utime(settings_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert store.get("http_port") == 8443
+    assert store.get_read_stats()["disk_reads"] == 2
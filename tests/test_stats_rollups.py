@@ -0,0 +1,117 @@
+import datetime
+
+import peewee
+import pytest
+
+from app.classes.models.server_stats import (
+    HelperServerStats,
+    ServerStats,
+    ServerStatsHour,
+    ServerStatsMinute,
+)
+from app.classes.models.servers import Servers
+from app.classes.models.stats_rollups import StatsRollups
+
+METRICS = HelperServerStats.rollup_metrics
+
+
+@pytest.fixture
+def stats_db(database):
+    database.create_tables([Servers])
+    Servers.create(server_id=1)
+    db = peewee.SqliteDatabase(":memory:")
+    models = [ServerStats, ServerStatsMinute, ServerStatsHour]
+    db.bind(models, bind_refs=False, bind_backrefs=False)
+    db.create_tables(models)
+    yield db
+    for model in models:
+        model._meta.database = None
+
+
+@pytest.fixture
+def helper(stats_db, monkeypatch):
+    monkeypatch.setattr(HelperServerStats, "init_database", lambda self, _id: None)
+    stats_helper = HelperServerStats(1)
+    stats_helper.database = stats_db
+    return stats_helper
+
+
+def add_raw(when, cpu, online=0):
+    ServerStats.create(
+        created=when, server_id=1, cpu=cpu, mem_percent=cpu * 2, online=online
+    )
+
+
+def minutes(stats_db):
+    return list(ServerStatsMinute.select().order_by(ServerStatsMinute.period).dicts())
+
+
+def test_rollup_raw(stats_db):
+    start = StatsRollups.floor_time(
+        datetime.datetime.now() - datetime.timedelta(minutes=5),
+        datetime.timedelta(minutes=1),
+    )
+    add_raw(start, 10)
+    add_raw(start + datetime.timedelta(seconds=30), 30, online=2)
+    add_raw(start + datetime.timedelta(minutes=1, seconds=5), 50)
+    # the current minute isn't complete yet
+    add_raw(datetime.datetime.now(), 90)
+
+    StatsRollups.rollup_raw(
+        ServerStats, ServerStats.created, ServerStatsMinute, METRICS, stats_db
+    )
+    rows = minutes(stats_db)
+    assert [row["samples"] for row in rows] == [2, 1]
+    assert (rows[0]["cpu_min"], rows[0]["cpu_avg"], rows[0]["cpu_max"]) == (10, 20, 30)
+    assert rows[0]["online_max"] == 2
+
+    # minutes rolled up already are not rolled up again
+    StatsRollups.rollup_raw(
+        ServerStats, ServerStats.created, ServerStatsMinute, METRICS, stats_db
+    )
+    assert len(minutes(stats_db)) == 2
+
+
+def test_rollup_minutes_weights_by_samples(stats_db):
+    hour = StatsRollups.floor_time(
+        datetime.datetime.now() - datetime.timedelta(hours=3),
+        datetime.timedelta(hours=1),
+    )
+    for offset, samples, cpu in ((0, 3, 10), (1, 1, 50)):
+        ServerStatsMinute.create(
+            period=hour + datetime.timedelta(minutes=offset),
+            samples=samples,
+            cpu_min=cpu,
+            cpu_avg=cpu,
+            cpu_max=cpu,
+        )
+    StatsRollups.rollup_minutes(ServerStatsMinute, ServerStatsHour, METRICS, stats_db)
+    row = ServerStatsHour.select().dicts().get()
+    assert row["samples"] == 4
+    assert row["cpu_avg"] == 20
+    assert (row["cpu_min"], row["cpu_max"]) == (10, 50)
+
+
+def test_rollup_includes_buffered_rows(helper, stats_db):
+    helper.insert_server_stats({"id": 1, "cpu": 40})
+    # buffered, but from a minute that is over
+    helper.pending_stats[0][ServerStats.created] -= datetime.timedelta(minutes=2)
+
+    helper.rollup_server_stats()
+    assert helper.pending_stats == []
+    assert [row["cpu_max"] for row in minutes(stats_db)] == [40]
+
+
+def test_get_history_picks_the_tier(helper, stats_db):
+    now = datetime.datetime.now()
+    add_raw(now - datetime.timedelta(minutes=30), 10)
+    ServerStatsHour.create(period=now - datetime.timedelta(days=30), samples=60)
+
+    raw = helper.get_server_stats_history(
+        now - datetime.timedelta(hours=1), now, datetime.timedelta(days=1)
+    )
+    assert [row["cpu_avg"] for row in raw] == [10]
+    hours = helper.get_server_stats_history(
+        now - datetime.timedelta(days=60), now, datetime.timedelta(days=1)
+    )
+    assert [row["samples"] for row in hours] == [60]
@@ -0,0 +1,47 @@
+import re
+import threading
+
+import pytest
+
+from app.classes.shared.terminal_history import TerminalHistory
+
+
+@pytest.fixture(params=[False, True], ids=["str", "compact"])
+def history(request):
+    return TerminalHistory(3, compact=request.param)
+
+
+def test_lines_since(history):
+    for i in range(5):
+        assert history.append(f"line {i}\n") == i
+
+    assert len(history) == 3
+    # lines 0 and 1 were evicted
+    assert history.lines_since(0) == (["line 2\n", "line 3\n", "line 4\n"], 5)
+    assert history.lines_since(4) == (["line 4\n"], 5)
+    assert history.lines_since(3, until=4) == (["line 3\n"], 4)
+    assert history.lines_since(5) == ([], 5)
+
+
+def test_lines_since_cursor_ahead(history):
+    history.append("only\n")
+    # a client still holding a cursor from before a restart
+    assert history.lines_since(100) == ([], 1)
+
+
+def test_first_seq():
+    history = TerminalHistory(10, first_seq=42)
+    assert history.append("line\n") == 42
+    assert history.lines_since(0) == (["line\n"], 43)
+
+
+def test_wait_for_line(history):
+    seq = history.append("starting\n")
+    timer = threading.Timer(0.05, history.append, ["Done (1.0s)!\n"])
+    timer.start()
+    try:
+        line = history.wait_for_line(re.compile(r"Done \("), seq, 5)
+    finally:
+        timer.join()
+    assert line == "Done (1.0s)!\n"
+    assert history.wait_for_line(re.compile("never"), seq, 0.01) is None
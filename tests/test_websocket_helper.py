@@ -0,0 +1,47 @@
+import json
+
+from app.classes.web.websocket_helper import WebSocketHelper
+
+
+class FakeClient:
+    page = "/panel/server_detail"
+
+    def __init__(self, server_id):
+        self.page_query_params = {"id": server_id}
+        self.frames = []
+
+    def get_user_id(self):
+        return 1
+
+    def check_auth(self):
+        return True
+
+    def write_vterm_frame(self, message, _line_count, _sequenced):
+        self.frames.append(json.loads(message)["data"])
+
+
+def send(lines, total, first_line=None, next_line=None):
+    helper = WebSocketHelper(None)
+    client = FakeClient("1")
+    helper.add_client(client)
+    helper.send_vterm_frame("1", lines, total, first_line, next_line)
+    return client.frames[0]
+
+
+def test_whole_sequenced_frame():
+    frame = send(["a<br />", "b<br />"], 2, first_line=10, next_line=12)
+    assert frame == {"first_line": 10, "next_line": 12, "line": "a<br />b<br />"}
+
+
+def test_truncated_sequenced_frame_leaves_a_gap():
+    # 3 lines were sent, the first one was dropped from the frame
+    frame = send(["b<br />", "c<br />"], 3, first_line=10, next_line=13)
+    assert frame["first_line"] == 11
+    assert frame["next_line"] == 13
+    assert frame["line"] == "b<br />c<br />"
+
+
+def test_truncated_unsequenced_frame_says_so():
+    frame = send(["b<br />"], 3)
+    assert "first_line" not in frame
+    assert frame["line"] == WebSocketHelper.vterm_skipped_line(2) + "b<br />"